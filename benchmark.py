@@ -0,0 +1,405 @@
+"""
+离线基准测试 (不访问 YouTube)
+在本机启动一个可注入延迟、带宽限制和错误的 HTTP 服务器，提供合成的单文件 (progressive)
+或音视频分离 (DASH) 媒体，用桩提取器 (bench://) 让下载引擎按正常流程下载，测量：
+吞吐量、首字节时间、重试开销、合并耗时、界面事件频率和峰值内存。
+
+用法示例：
+    python benchmark.py                                   # 默认：1 / 10 / 500 个任务，单文件
+    python benchmark.py --mode dash --batches 1 10        # 音视频分离 + 合并 (需要 ffmpeg)
+    python benchmark.py --latency 0.2 --bandwidth 2M --error-rate 0.05
+    python benchmark.py -o new.json --baseline old.json   # 与上次结果对比
+
+每个场景在独立子进程中运行 (峰值内存互不影响)，结果写入 JSON 文件。
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+import engine
+from downloaders import MERGE_MODES, MERGE_PARALLEL, parse_rate
+from engine import DownloadEngine, DownloadOptions, EventQueue, JOB_DONE, JOB_FAILED
+from netpath import NETWORK_IPV4
+
+UI_TICK_SECONDS = 0.2      # 模拟界面的刷新间隔 (与 gui.UI_TICK_MS 一致)
+SERVER_CHUNK = 64 * 1024   # 服务器每次写出的块大小
+MEDIA_SECONDS = 4          # DASH 合成媒体的时长
+
+# --- 合成媒体 ---
+
+def make_media(media_dir, mode, size):
+    """生成基准测试用的媒体文件，返回 {格式名: 文件名}"""
+    os.makedirs(media_dir, exist_ok=True)
+    if mode == 'progressive':
+        # 单文件下载不检查内容，随机数据即可
+        with open(os.path.join(media_dir, 'p.mp4'), 'wb') as f:
+            f.write(random.Random(0).randbytes(size))
+        return {'p': 'p.mp4'}
+
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise SystemExit("DASH 模式需要 ffmpeg (用于生成媒体和合并)")
+    video_bitrate = max(64, size * 8 // MEDIA_SECONDS // 1000) # 让视频大小接近 size
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'lavfi',
+                    '-i', f'testsrc=size=640x360:rate=25:duration={MEDIA_SECONDS}',
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', f'{video_bitrate}k',
+                    '-an', os.path.join(media_dir, 'v.mp4')], check=True)
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'lavfi',
+                    '-i', f'sine=frequency=440:duration={MEDIA_SECONDS}',
+                    '-c:a', 'aac', '-b:a', '128k', os.path.join(media_dir, 'a.m4a')], check=True)
+    return {'v': 'v.mp4', 'a': 'a.m4a'}
+
+# --- 本地 HTTP 服务器 ---
+
+class MediaServer:
+    """支持 Range 的媒体服务器：每个请求先等待 latency 秒，每个连接限速 bandwidth 字节/秒，
+    按 error_rate 的概率注入错误 (503、403 或中途断开)"""
+
+    def __init__(self, media_dir, latency=0.0, bandwidth=0, error_rate=0.0, seed=0):
+        self.media_dir = media_dir
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.injected_errors = 0
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def pick_error(self):
+        with self.lock:
+            self.requests += 1
+            if self.random.random() >= self.error_rate:
+                return None
+            self.injected_errors += 1
+            return self.random.choice(('503', '403', 'truncate'))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                # 路径: /<任务 ID>/<文件名>，所有任务共用同一份媒体
+                path = os.path.join(server.media_dir, os.path.basename(self.path.split('?')[0]))
+                if not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                error = server.pick_error()
+                if error in ('503', '403'):
+                    self.send_error(int(error))
+                    return
+
+                size = os.path.getsize(path)
+                start, end = 0, size - 1
+                range_header = self.headers.get('Range')
+                if range_header and range_header.startswith('bytes='):
+                    first, _, last = range_header[6:].partition('-')
+                    start = int(first or 0)
+                    end = min(int(last), size - 1) if last else size - 1
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+                else:
+                    self.send_response(200)
+                length = end - start + 1
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(length))
+                self.send_header('Accept-Ranges', 'bytes')
+                self.end_headers()
+
+                # 中途断开：只发送一半数据
+                limit = length // 2 if error == 'truncate' else length
+                with open(path, 'rb') as f:
+                    f.seek(start)
+                    sent = 0
+                    started = time.monotonic()
+                    while sent < limit:
+                        block = f.read(min(SERVER_CHUNK, limit - sent))
+                        if not block:
+                            break
+                        try:
+                            self.wfile.write(block)
+                        except OSError:
+                            return
+                        sent += len(block)
+                        if server.bandwidth:
+                            delay = sent / server.bandwidth - (time.monotonic() - started)
+                            if delay > 0:
+                                time.sleep(delay)
+                if error == 'truncate':
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# --- 桩提取器 ---
+
+def make_extractor(base_url, media_dir, media):
+    """返回匹配 bench://<ID> 的提取器类，格式指向本地服务器上的合成媒体"""
+    sizes = {name: os.path.getsize(os.path.join(media_dir, filename)) for name, filename in media.items()}
+
+    class BenchIE(InfoExtractor):
+        _VALID_URL = r'bench://(?P<id>[\w-]+)'
+        IE_NAME = 'bench'
+
+        def _real_extract(self, url):
+            video_id = self._match_id(url)
+            formats = []
+            for name, filename in media.items():
+                fmt = {
+                    'format_id': name,
+                    'url': f'{base_url}/{video_id}/{filename}',
+                    'ext': filename.rsplit('.', 1)[1],
+                    'filesize': sizes[name],
+                    'protocol': 'http',
+                }
+                if name == 'v':
+                    fmt.update(vcodec='avc1', acodec='none', height=360)
+                elif name == 'a':
+                    fmt.update(vcodec='none', acodec='mp4a')
+                else:
+                    fmt.update(vcodec='avc1', acodec='mp4a', height=360)
+                formats.append(fmt)
+            return {'id': video_id, 'title': f'bench {video_id}', 'formats': formats}
+
+    return BenchIE
+
+# --- 单个场景 (在子进程中运行) ---
+
+class CountingEventQueue(EventQueue):
+    """统计引擎推送的事件数 (界面每次 drain 只拿到合并后的结果)"""
+
+    def __init__(self):
+        super().__init__()
+        self.pushed = 0
+
+    def log(self, message):
+        self.pushed += 1
+        super().log(message)
+
+    def progress(self, job_id, status):
+        self.pushed += 1
+        super().progress(job_id, status)
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def run_scenario(config):
+    """运行一个场景，返回结果字典"""
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    try:
+        media_dir = os.path.join(workdir, 'media')
+        media = make_media(media_dir, config['mode'], config['size'])
+        server = MediaServer(media_dir, config['latency'], config['bandwidth'], config['error_rate'], config['seed'])
+        engine.RETRY_BASE_DELAY = config['retry_base_delay'] # 错误注入时不必等真实的退避时间
+
+        events = CountingEventQueue()
+        done = threading.Event()
+        bench_engine = DownloadEngine(app_path=os.path.join(workdir, 'app'), events=events,
+                                      on_idle=lambda jobs: done.set(),
+                                      extractors=[make_extractor(server.base_url, media_dir, media)])
+        options = DownloadOptions(
+            quality='best',
+            output_dir=os.path.join(workdir, 'out'),
+            proxy=None,
+            network=NETWORK_IPV4, # 本地服务器只监听 IPv4，固定线路便于对比
+            quiet=True,
+            max_workers=config['workers'],
+            segments=config['segments'],
+            merge_mode=config['merge_mode'],
+            disk_info_cache=False,
+        )
+        urls = [f'bench://item{i:04d}' for i in range(config['batch'])]
+
+        delivered = 0
+        started = time.time()
+        bench_engine.start(urls, options)
+        # 模拟界面：每个 tick 取出一次事件
+        while not done.wait(UI_TICK_SECONDS):
+            logs, progress = events.drain()
+            delivered += len(logs) + len(progress)
+        logs, progress = events.drain()
+        delivered += len(logs) + len(progress)
+        elapsed = time.time() - started
+        server.close()
+
+        jobs = bench_engine.scheduler.jobs
+        records = []
+        metrics_path = bench_engine.metrics.path
+        if os.path.exists(metrics_path):
+            with open(metrics_path, encoding='utf-8') as f:
+                records = [json.loads(line) for line in f]
+
+        ttfb = [r['ttfb_seconds'] for r in records if r['ttfb_seconds'] is not None]
+        merge = [r['postprocess_seconds'].get('Merger', 0) for r in records if 'Merger' in r['postprocess_seconds']]
+        job_seconds = [r['total_seconds'] for r in records]
+        retries = [retry for r in records for retry in r['retries']]
+        bytes_written = sum(r['bytes_written'] for r in records)
+        rss_self, rss_children = peak_rss_mb()
+        return {
+            'config': config,
+            'elapsed_seconds': round(elapsed, 3),
+            'jobs_done': sum(1 for job in jobs if job.state == JOB_DONE),
+            'jobs_failed': sum(1 for job in jobs if job.state == JOB_FAILED),
+            'bytes_written': bytes_written,
+            'throughput_bytes_per_second': round(bytes_written / elapsed) if elapsed else None,
+            'jobs_per_second': round(len(jobs) / elapsed, 3) if elapsed else None,
+            'job_seconds_p50': percentile(job_seconds, 0.5),
+            'job_seconds_p95': percentile(job_seconds, 0.95),
+            'ttfb_seconds_p50': percentile(ttfb, 0.5),
+            'ttfb_seconds_p95': percentile(ttfb, 0.95),
+            'merge_seconds_p50': percentile(merge, 0.5),
+            'merge_seconds_total': round(sum(merge), 3),
+            'retries': len(retries),
+            'retry_delay_seconds': round(sum(retry['delay'] for retry in retries), 3),
+            'server_requests': server.requests,
+            # yt_dlp 内部的 HTTP 重试不经过引擎，只能从请求数看出来
+            'requests_per_job': round(server.requests / len(jobs), 2) if jobs else None,
+            'injected_errors': server.injected_errors,
+            'ui_events_pushed_per_second': round(events.pushed / elapsed, 1) if elapsed else None,
+            'ui_events_delivered_per_second': round(delivered / elapsed, 1) if elapsed else None,
+            'peak_rss_mb': rss_self,
+            'peak_child_rss_mb': rss_children,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def peak_rss_mb():
+    """本进程和子进程 (ffmpeg) 的峰值内存 MB；无法测量时为 None (resource 模块只在 Unix 上有)"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None, None
+        # Windows 上 peak_wset 是峰值工作集；已退出的子进程无从统计
+        memory = psutil.Process().memory_info()
+        return round(getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024), 1), None
+    # Linux 上 ru_maxrss 的单位是 KB (macOS 是字节)
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return (round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+            round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1))
+
+# --- 汇总 ---
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(results, baseline=None):
+    """打印结果摘要；给出基线时附上变化百分比"""
+    columns = [('elapsed_seconds', '耗时s'), ('throughput_bytes_per_second', '吞吐B/s'),
+               ('ttfb_seconds_p50', 'TTFB p50'), ('merge_seconds_p50', '合并 p50'),
+               ('retries', '重试'), ('ui_events_delivered_per_second', '事件/s'), ('peak_rss_mb', 'RSS MB')]
+    base = {}
+    for result in (baseline or {}).get('results', []):
+        base[result['name']] = result
+    print(f"{'场景':<28}" + ''.join(f"{title:>16}" for _, title in columns))
+    for result in results:
+        cells = []
+        for key, _ in columns:
+            value = result.get(key)
+            text = '-' if value is None else f"{value:g}" if isinstance(value, float) else str(value)
+            old = base.get(result['name'], {}).get(key)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                text += f" ({(value - old) / old * 100:+.0f}%)"
+            cells.append(f"{text:>16}")
+        print(f"{result['name']:<28}" + ''.join(cells))
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="下载流程的离线基准测试")
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 10, 500], help="每个场景的任务数 (默认 1 10 500)")
+    parser.add_argument("--mode", choices=["progressive", "dash"], default="progressive",
+                        help="progressive: 单文件；dash: 音视频分离，下载后合并 (需要 ffmpeg)")
+    parser.add_argument("--size", type=parse_rate, default=parse_rate("1M"), help="每个媒体文件的大小 (默认 1M)")
+    parser.add_argument("--latency", type=float, default=0.02, help="服务器每个请求的延迟秒数 (默认 0.02)")
+    parser.add_argument("--bandwidth", type=parse_rate, default=0, help="服务器每个连接的带宽，如 2M (默认不限)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的概率 (0-1)")
+    parser.add_argument("--retry-base-delay", type=float, default=0.05, help="重试退避的基准秒数 (默认 0.05)")
+    parser.add_argument("-j", "--workers", type=int, default=3, help="并行下载数 (默认 3)")
+    parser.add_argument("--segments", type=int, default=0, help="分段下载连接数 (默认 0)")
+    parser.add_argument("--merge-mode", choices=MERGE_MODES, default=MERGE_PARALLEL)
+    parser.add_argument("--seed", type=int, default=0, help="错误注入的随机种子")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="结果文件 (默认 bench_results.json)")
+    parser.add_argument("--baseline", help="对比的旧结果文件")
+    parser.add_argument("--child", help=argparse.SUPPRESS) # 内部使用：在子进程中运行单个场景
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.child:
+        print(json.dumps(run_scenario(json.loads(args.child))))
+        return 0
+
+    results = []
+    for batch in args.batches:
+        config = {
+            'batch': batch, 'mode': args.mode, 'size': args.size, 'latency': args.latency,
+            'bandwidth': args.bandwidth, 'error_rate': args.error_rate,
+            'retry_base_delay': args.retry_base_delay, 'workers': args.workers,
+            'segments': args.segments, 'merge_mode': args.merge_mode, 'seed': args.seed,
+        }
+        name = f"{args.mode}-{batch}"
+        print(f"▶️ {name} ...", flush=True)
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', json.dumps(config)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            return proc.returncode
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['name'] = name
+        results.append(result)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    print(f"📄 结果已保存: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+命令行 / 守护进程模式 (不加载 Tk，可在无桌面的服务器、cron 和容器中运行)
+
+用法示例：
+    python main.py --cli URL [URL ...]
+    python main.py --cli -i urls.txt -q 1080p -s zh -j 4
+    cat urls.txt | python main.py --cli
+    python main.py --daemon -i queue.txt     # 持续读取追加到文件中的链接
+    python main.py --cli --resume            # 继续上次中断时未完成的任务
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+
+import ingest
+from downloaders import DEFAULT_MAX_CONNECTIONS_PER_HOST, MERGE_MODES, MERGE_PARALLEL, parse_rate
+from engine import (
+    DownloadEngine, DownloadOptions, QUALITY_PRESETS, SUBFOLDER_PRESETS, SUBTITLE_PRESETS,
+    JOB_FAILED, JOB_PAUSED, expand_playlist, format_status, get_app_path,
+)
+from netpath import NETWORK_AUTO, NETWORK_IPV6, NETWORK_MODES
+from postprocess import DEFAULT_POSTPROCESS_WORKERS
+from transcripts import (
+    CONTENT_MODES, CORPUS_FORMATS, CORPUS_JSONL, CorpusExporter, default_corpus_path, open_corpus,
+)
+
+CLI_TICK_SECONDS = 1.0    # 刷新输出的间隔
+DAEMON_POLL_SECONDS = 2.0 # 守护模式下检查输入文件新增内容的间隔
+
+def rate_arg(value):
+    """argparse 的 type：无法识别的限速值给出用法错误，而不是在启动后抛出异常"""
+    try:
+        return parse_rate(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py --cli",
+        description="Universal Video Downloader 命令行模式"
+    )
+    parser.add_argument("urls", nargs="*", help="视频/播放列表链接")
+    parser.add_argument("-i", "--input", help="从文件读取链接 (txt 每行一个，或 csv；- 表示标准输入)")
+    parser.add_argument("--prefetch", action="store_true", help="下载前先并发解析所有视频 (提前发现失效链接)")
+    parser.add_argument("-q", "--quality", choices=list(QUALITY_PRESETS), default="best", help="画质预设 (默认 best)")
+    parser.add_argument("-s", "--subtitles", choices=list(SUBTITLE_PRESETS), default="none", help="字幕预设 (默认 none)")
+    parser.add_argument("--network", choices=NETWORK_MODES, default=NETWORK_AUTO,
+                        help="网络线路：auto 在 IPv4/IPv6/代理间测速选择并在变慢时切换 / ipv4 / ipv6 (默认 auto)")
+    parser.add_argument("--ipv6", dest="network", action="store_const", const=NETWORK_IPV6, help="同 --network ipv6")
+    parser.add_argument("--socket-timeout", type=int, default=30, help="连接/读取超时秒数 (默认 30)")
+    parser.add_argument("--segments", type=int, default=0, help="分段下载：每个大文件的并行连接数 (默认 0 不分段)")
+    parser.add_argument("--max-conn-per-host", type=int, default=DEFAULT_MAX_CONNECTIONS_PER_HOST,
+                        help=f"同一主机的连接上限 (默认 {DEFAULT_MAX_CONNECTIONS_PER_HOST})")
+    parser.add_argument("--merge-mode", choices=MERGE_MODES, default=MERGE_PARALLEL,
+                        help="视频+音频的合并方式：standard 顺序下载后合并 / parallel 同时下载后合并 / direct ffmpeg 边下边封装 "
+                             "(不支持暂停续传、限速和自动换线路) (默认 parallel)")
+    parser.add_argument("--limit-rate", type=rate_arg, help="全局限速，如 2M、500K (默认读取 config.json，否则不限速)")
+    parser.add_argument("--job-limit-rate", type=rate_arg, help="单任务限速，如 1M (默认读取 config.json，否则不限速)")
+    parser.add_argument("--metrics-port", type=int, help="在 127.0.0.1 的该端口上提供 Prometheus 格式的 /metrics")
+    parser.add_argument("--profile", metavar="FILE", help="用 cProfile 记录耗时分布并写入 FILE (.prof，另附 .txt 摘要)")
+    parser.add_argument("--no-disk-cache", action="store_true", help="解析结果只缓存在内存中，不写入 cache/info")
+    parser.add_argument("--pp-workers", type=int, default=DEFAULT_POSTPROCESS_WORKERS,
+                        help=f"同时进行的后处理 (合并/提取音频/转换字幕) 数，与下载并行 (默认 {DEFAULT_POSTPROCESS_WORKERS})")
+    parser.add_argument("-j", "--jobs", type=int, default=3, help="并行下载数 (默认 3)")
+    parser.add_argument("-o", "--output", help="保存目录 (默认读取 config.json，否则为程序目录)")
+    parser.add_argument("--temp-dir", help=".part 和中间文件的目录 (如高速 SSD)，完成后移到保存目录 (默认读取 config.json)")
+    parser.add_argument("--subfolder", help=f"按子文件夹保存：{' / '.join(SUBFOLDER_PRESETS)} 或 yt-dlp 输出模板，"
+                                            "如 \"%%(uploader)s/%%(upload_date>%%Y)s\" (默认读取 config.json，否则 none)")
+    parser.add_argument("--only", choices=CONTENT_MODES,
+                        help="不下载音视频：subtitles 导出字幕和元数据 (语言见 -s，none 表示全部) / metadata 只导出元数据")
+    parser.add_argument("--corpus-format", choices=CORPUS_FORMATS, default=CORPUS_JSONL,
+                        help="--only 的输出格式：jsonl 单个文件 / sqlite 数据库 / files 每个视频一个 JSON (默认 jsonl)")
+    parser.add_argument("--corpus", metavar="PATH", help="--only 的输出位置 (默认保存目录下的 transcripts.jsonl 等)")
+    parser.add_argument("--daemon", action="store_true", help="守护模式：持续读取新链接，直到收到终止信号")
+    parser.add_argument("--resume", action="store_true", help="先继续上次中断 (关闭/崩溃/断电) 时未完成的任务")
+    return parser
+
+def parse_url_lines(lines):
+    """去掉空行和 # 注释"""
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+def read_input_file(path):
+    """读取链接文件 (txt 每行一个，或 csv 中任意单元格)"""
+    return parse_url_lines(ingest.read_file(path).splitlines())
+
+def follow_lines(stream, stop_event):
+    """逐行读取输入；到达文件末尾后继续等待新内容 (守护模式)"""
+    while not stop_event.is_set():
+        line = stream.readline()
+        if line:
+            yield line
+        elif stream is sys.stdin:
+            return # 标准输入已关闭
+        else:
+            stop_event.wait(DAEMON_POLL_SECONDS)
+
+class CliRunner:
+    """把引擎事件打印到终端，并等待任务结束"""
+
+    def __init__(self, args):
+        self.args = args
+        self.idle = threading.Event()
+        self.stop_event = threading.Event()
+        self.engine = DownloadEngine(on_idle=lambda jobs: self.idle.set())
+        rate_limit, job_rate_limit = self.engine.configured_rate_limits()
+        output_dir, temp_dir, subfolder = self.engine.configured_storage()
+        if args.metrics_port:
+            port = self.engine.serve_metrics(args.metrics_port)
+            if port:
+                print(f"📈 指标: http://127.0.0.1:{port}/metrics", flush=True)
+        if args.profile:
+            self.engine.enable_profiling(os.path.abspath(args.profile))
+        self.options = DownloadOptions(
+            quality=args.quality,
+            subtitles=args.subtitles,
+            network=args.network,
+            socket_timeout=args.socket_timeout,
+            max_workers=args.jobs,
+            output_dir=os.path.abspath(args.output or output_dir or get_app_path()),
+            temp_dir=os.path.abspath(args.temp_dir or temp_dir) if (args.temp_dir or temp_dir) else '',
+            subfolder=args.subfolder or subfolder or 'none',
+            quiet=True,
+            segments=args.segments,
+            max_connections_per_host=args.max_conn_per_host,
+            merge_mode=args.merge_mode,
+            disk_info_cache=not args.no_disk_cache,
+            rate_limit=args.limit_rate if args.limit_rate is not None else rate_limit,
+            job_rate_limit=args.job_limit_rate if args.job_limit_rate is not None else job_rate_limit,
+            postprocess_workers=args.pp_workers,
+        )
+
+    def expand(self, urls):
+        """规范化、去重，并发展开播放列表/频道并预解析视频信息"""
+        result = ingest.parse_text("\n".join(urls))
+        for line in result.invalid:
+            print(f"⚠️ 无法识别的链接: {line}", file=sys.stderr)
+        if result.duplicates:
+            self.engine.log(f"🔁 忽略 {result.duplicates} 个重复链接")
+        if result.collections:
+            self.engine.log(f"📋 正在展开 {len(result.collections)} 个播放列表/频道...")
+        urls, failed = ingest.ingest(
+            result,
+            expand=lambda url: expand_playlist(url, self.engine.playlist_cache, info_cache=self.engine.info_cache,
+                                               collections=self.engine.collections),
+            prefetch=(lambda url: self.engine.prefetch_info(url, self.options)) if self.args.prefetch else None,
+            on_progress=self.engine.log,
+        )
+        for url, error in failed:
+            self.engine.log(f"❌ 跳过 {url}: {error}")
+        return urls
+
+    def submit(self, urls):
+        urls = self.expand(urls)
+        if not urls:
+            return
+        self.idle.clear()
+        if self.engine.scheduler is None:
+            jobs = self.engine.start(urls, self.options)
+        else:
+            jobs = self.engine.add(urls)
+        if not jobs and not self.engine.scheduler.count_active():
+            self.idle.set()
+
+    def print_events(self):
+        logs, progress = self.engine.events.drain()
+        for line in logs:
+            print(line, flush=True)
+        total = len(self.engine.scheduler.jobs) if self.engine.scheduler else '?'
+        for job_id, status in sorted(progress.items()):
+            if status is not None:
+                print(format_status(job_id, total, status), flush=True)
+
+    def wait(self):
+        """等待当前所有任务结束，期间定时打印事件"""
+        while not self.idle.wait(CLI_TICK_SECONDS):
+            self.print_events()
+            if not (self.engine.scheduler and self.engine.scheduler.count_active()):
+                break
+        self.print_events()
+
+    def read_daemon_input(self):
+        """守护模式：在后台持续读取输入并追加任务"""
+        stream = sys.stdin if self.args.input in (None, "-") else open(self.args.input, encoding="utf-8")
+        for line in follow_lines(stream, self.stop_event):
+            urls = parse_url_lines([line])
+            if urls:
+                self.submit(urls)
+
+    def restore(self):
+        """继续上次未完成的任务，返回恢复的任务数"""
+        if not self.args.resume:
+            pending = self.engine.store.count_unfinished()
+            if pending:
+                print(f"💾 有 {pending} 个上次未完成的任务，使用 --resume 继续下载。", flush=True)
+            return 0
+        jobs = self.engine.restore_unfinished(self.options)
+        if not jobs and not self.engine.scheduler.count_active():
+            self.idle.set()
+        return len(jobs)
+
+    def export(self, urls):
+        """仅字幕/仅元数据：不下载音视频，把结果写入语料库"""
+        urls = self.expand(urls)
+        path = self.args.corpus or default_corpus_path(self.options.output_dir, self.args.only, self.args.corpus_format)
+        result = {}
+
+        def worker():
+            corpus = open_corpus(self.args.corpus_format, path) # SQLite 连接只能在创建它的线程中使用
+            try:
+                exporter = CorpusExporter(self.engine, self.options, content=self.args.only)
+                result['exported'], result['failed'] = exporter.run(urls, corpus, self.stop_event)
+            except Exception as e:
+                result['error'] = e
+            finally:
+                corpus.close()
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        while thread.is_alive():
+            thread.join(CLI_TICK_SECONDS)
+            self.print_events()
+        if 'error' in result:
+            print(f"❌ 导出失败: {result['error']}", file=sys.stderr)
+            return 1
+        print(f"📄 已导出 {result['exported']} 个视频: {path}", flush=True)
+        return 1 if result['failed'] else 0
+
+    def run(self):
+        urls = list(self.args.urls)
+        restored = self.restore() if not self.args.only else 0
+        if not self.args.daemon:
+            if self.args.input == "-" or (self.args.input is None and not urls and not sys.stdin.isatty()):
+                urls += parse_url_lines(sys.stdin)
+            elif self.args.input:
+                urls += read_input_file(self.args.input)
+            if not urls and not restored:
+                print("❌ 没有要下载的链接。", file=sys.stderr)
+                return 2
+            if self.args.only:
+                return self.export(urls)
+
+        self.submit(urls)
+        if self.args.daemon:
+            threading.Thread(target=self.read_daemon_input, daemon=True).start()
+            print("🛰️ 守护模式已启动，等待新链接... (Ctrl+C 退出)", flush=True)
+            while not self.stop_event.wait(CLI_TICK_SECONDS):
+                self.print_events()
+            self.engine.pause()
+            self.wait()
+            return 0
+
+        self.wait()
+        jobs = self.engine.scheduler.jobs if self.engine.scheduler else []
+        return 1 if any(job.state == JOB_FAILED for job in jobs) else 0
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.only and args.daemon:
+        parser.error("--only 不能与 --daemon 同时使用")
+    runner = CliRunner(args)
+    try:
+        runner.options.to_ydl_opts() # 提前检查选项 (如自定义子文件夹模板)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def on_signal(signum, frame):
+        # 暂停正在下载的任务，保留 .part 文件以便下次续传
+        print("\n🛑 收到终止信号，正在停止...", flush=True)
+        runner.stop_event.set()
+        runner.engine.pause()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    code = runner.run()
+    jobs = runner.engine.scheduler.jobs if runner.engine.scheduler else []
+    if any(job.state == JOB_PAUSED for job in jobs):
+        return 130
+    return code
@@ -0,0 +1,584 @@
+"""
+对 yt_dlp 下载器的扩展 (不依赖界面)
+- BandwidthLimiter: 全局/单任务限速 (令牌桶)，活跃任务平分全局带宽，支持按时段切换限速
+- SegmentedHttpFD: 把已知大小的单个文件切成若干字节范围，用多个连接并行下载到预分配的文件中
+- EngineYoutubeDL: 在 yt_dlp.YoutubeDL 的基础上选择上面的下载器，并支持视频/音频流并行下载或直接封装；
+  下载前回调 (预留磁盘空间)，完成的文件从临时目录原子地移到最终目录
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import yt_dlp
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.external import FFmpegFD
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.postprocessor import MoveFilesAfterDownloadPP
+
+from storage import disk_id, is_disk_full_error, move_file, preallocate
+
+SEGMENT_SIZE = 4 * 1024 * 1024          # 每个分段的大小 (小于 YouTube 的 10MB 限速阈值)
+SEGMENTED_MIN_SIZE = 16 * 1024 * 1024   # 小于这个大小的文件不分段
+SEGMENT_RETRIES = 10                    # 单个分段的最大重试次数
+SEGMENT_BLOCK_SIZE = 256 * 1024         # 每次读取的块大小
+PROGRESS_INTERVAL = 0.5                 # 进度回调间隔 (秒)
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 8
+BANDWIDTH_BURST_SECONDS = 1.0           # 令牌桶容量 (相当于多少秒的限速流量)
+BANDWIDTH_ACTIVE_WINDOW = 3.0           # 最近这么多秒内有流量的任务才参与平分全局带宽
+BANDWIDTH_MAX_SLEEP = 0.5               # 单次等待上限，便于及时响应限速修改和暂停
+
+# bestvideo+bestaudio 的合并方式
+MERGE_STANDARD = 'standard'   # yt_dlp 默认：先视频后音频，再用 ffmpeg 合并
+MERGE_PARALLEL = 'parallel'   # 视频流和音频流同时下载，再用 ffmpeg 合并
+MERGE_DIRECT = 'direct'       # ffmpeg 同时读取两路流并直接封装成最终 MP4，不产生中间文件
+MERGE_MODES = (MERGE_STANDARD, MERGE_PARALLEL, MERGE_DIRECT)
+
+class HostConnectionLimiter:
+    """按主机限制同时打开的连接数 (所有任务共享)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def slot(self, url, limit):
+        host = urllib.parse.urlparse(url).hostname or ''
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None or semaphore.limit != limit:
+                semaphore = threading.BoundedSemaphore(limit)
+                semaphore.limit = limit
+                self._semaphores[host] = semaphore
+        return semaphore
+
+HOST_LIMITER = HostConnectionLimiter()
+
+def parse_rate(value):
+    """把 "2M"、"500K"、1048576 之类的限速值转换成 字节/秒；空值或 0 表示不限速"""
+    if value in (None, '', 0, '0'):
+        return 0
+    if isinstance(value, (int, float)):
+        return max(0, int(value))
+    rate = yt_dlp.utils.parse_bytes(str(value).strip())
+    if rate is None:
+        raise ValueError(f"无法识别的限速值: {value}")
+    return rate
+
+def parse_rate_profiles(profiles):
+    """解析按时段的限速配置 [{"from": "09:00", "to": "18:00", "limit": "2M"}, ...]
+    返回 [(开始分钟, 结束分钟, 字节/秒)]；结束早于开始表示跨越午夜"""
+    def minutes(text):
+        hour, _, minute = str(text).partition(':')
+        return (int(hour) * 60 + int(minute or 0)) % (24 * 60)
+
+    return [(minutes(p['from']), minutes(p['to']), parse_rate(p.get('limit'))) for p in profiles or []]
+
+class BandwidthLimiter:
+    """令牌桶限速 (所有任务共享)
+    - 全局限速：由最近有流量的任务平分，某个任务空闲时其余任务自动分到更多
+    - 单任务限速：每个任务分到的速度不超过这个值
+    - 按时段的全局限速 (如工作时间限速) 优先于默认的全局限速
+    修改限速后立即对正在下载的任务生效"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.global_limit = 0 # 字节/秒，0 表示不限速
+        self.job_limit = 0
+        self.profiles = []    # parse_rate_profiles 的结果
+        self._buckets = {}    # key -> {'tokens', 'refilled_at', 'active_at'}
+
+    def configure(self, global_limit=None, job_limit=None, profiles=None):
+        with self._lock:
+            if global_limit is not None:
+                self.global_limit = parse_rate(global_limit)
+            if job_limit is not None:
+                self.job_limit = parse_rate(job_limit)
+            if profiles is not None:
+                self.profiles = list(profiles)
+
+    def current_global_limit(self):
+        """当前生效的全局限速 (考虑时段配置)"""
+        now = time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        for start, end, limit in self.profiles:
+            if start <= minute < end or (end < start and (minute >= start or minute < end)):
+                return limit
+        return self.global_limit
+
+    def rate_for(self, key):
+        """某个任务当前分到的速度 (字节/秒)，0 表示不限速"""
+        with self._lock:
+            return self._rate_locked(key, time.monotonic())
+
+    def _rate_locked(self, key, now):
+        rates = []
+        global_limit = self.current_global_limit()
+        if global_limit:
+            active = sum(1 for k, b in self._buckets.items()
+                         if k == key or now - b['active_at'] < BANDWIDTH_ACTIVE_WINDOW)
+            rates.append(global_limit / max(1, active))
+        if self.job_limit:
+            rates.append(self.job_limit)
+        return min(rates) if rates else 0
+
+    def throttle(self, key, nbytes, stop_event=None):
+        """记入 nbytes 的流量，超出分到的速度时阻塞等待 (stop_event 被设置时立即返回)"""
+        if nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.setdefault(key, {'tokens': 0.0, 'refilled_at': now, 'active_at': now})
+            bucket['active_at'] = now
+            bucket['tokens'] -= nbytes
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                rate = self._rate_locked(key, now)
+                if not rate:
+                    bucket['tokens'] = 0.0 # 不限速时不累积欠账
+                    bucket['refilled_at'] = now
+                    return
+                capacity = rate * BANDWIDTH_BURST_SECONDS
+                bucket['tokens'] = min(capacity, bucket['tokens'] + rate * (now - bucket['refilled_at']))
+                bucket['refilled_at'] = now
+                if bucket['tokens'] >= 0:
+                    return
+                delay = min(BANDWIDTH_MAX_SLEEP, -bucket['tokens'] / rate)
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return
+            else:
+                time.sleep(delay)
+
+    def release(self, key):
+        """任务结束，不再参与平分带宽"""
+        with self._lock:
+            self._buckets.pop(key, None)
+
+BANDWIDTH_LIMITER = BandwidthLimiter()
+
+class SegmentedHttpFD(FileDownloader):
+    """多连接分段下载：预分配文件，各分段独立续传，进度保存在 <文件>.part.segments 中"""
+
+    @staticmethod
+    def can_download(info, params, name):
+        """只处理普通 HTTP(S) 单文件 (合并格式、直播和外部下载器交给 yt_dlp)"""
+        if name == '-' or info.get('requested_formats') or info.get('is_live'):
+            return False
+        if get_suitable_downloader(info, params) is not HttpFD:
+            return False
+        return info.get('protocol') in ('http', 'https')
+
+    def real_download(self, filename, info_dict):
+        url = info_dict['url']
+        headers = dict(info_dict.get('http_headers') or {})
+        total = info_dict.get('filesize') or self._probe_size(url, headers)
+        if not total or total < self.params.get('segmented_min_size', SEGMENTED_MIN_SIZE):
+            return self._fallback(filename, info_dict)
+
+        tmpfilename = self.temp_name(filename)
+        state_path = tmpfilename + '.segments'
+        done = self._load_state(tmpfilename, state_path, total)
+        if done is None:
+            return self._fallback(filename, info_dict)
+
+        # 待下载的分段 = 总范围减去已完成的范围
+        pending = queue.Queue()
+        for start, end in self._missing_ranges(done, total):
+            for seg_start in range(start, end, SEGMENT_SIZE):
+                pending.put((seg_start, min(seg_start + SEGMENT_SIZE, end)))
+
+        connections = max(1, int(self.params.get('segmented_connections') or 1))
+        limit = int(self.params.get('max_connections_per_host') or DEFAULT_MAX_CONNECTIONS_PER_HOST)
+        host_slot = HOST_LIMITER.slot(url, limit)
+        lock = threading.Lock()
+        stop = threading.Event()
+        errors = []
+        downloaded = [sum(end - start for start, end in done)]
+        resumed_bytes = downloaded[0]
+
+        def worker():
+            with open(tmpfilename, 'r+b') as f:
+                while not stop.is_set():
+                    try:
+                        start, end = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        self._download_range(f, url, headers, start, end, host_slot, stop, lock, downloaded)
+                    except Exception as e:
+                        errors.append(e)
+                        stop.set()
+                        return
+                    with lock:
+                        done.append([start, end])
+                        self._save_state(state_path, total, done)
+
+        self.report_destination(filename)
+        if resumed_bytes:
+            self.report_resuming_byte(resumed_bytes)
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(connections, pending.qsize()))]
+        for t in threads:
+            t.start()
+
+        start_time = time.time()
+        try:
+            while any(t.is_alive() for t in threads):
+                time.sleep(PROGRESS_INTERVAL)
+                elapsed = time.time() - start_time
+                speed = (downloaded[0] - resumed_bytes) / elapsed if elapsed > 0 else None
+                self._hook_progress({
+                    'status': 'downloading',
+                    'downloaded_bytes': downloaded[0],
+                    'total_bytes': total,
+                    'tmpfilename': tmpfilename,
+                    'filename': filename,
+                    'eta': (total - downloaded[0]) / speed if speed else None,
+                    'speed': speed,
+                    'elapsed': elapsed,
+                    'throttled': True, # 各连接已自行限速，进度钩子不必再限速
+                }, info_dict)
+        except BaseException:
+            # 暂停等情况：停止所有连接，已完成的分段保留在状态文件中
+            stop.set()
+            for t in threads:
+                t.join()
+            raise
+
+        if errors:
+            raise errors[0]
+
+        os.remove(state_path)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'filename': filename,
+            'elapsed': time.time() - start_time,
+        }, info_dict)
+        return True
+
+    def _download_range(self, f, url, headers, start, end, host_slot, stop, lock, downloaded):
+        """下载 [start, end) 并写入对应位置，失败时只重试这一段"""
+        bandwidth_key = self.params.get('bandwidth_key') # 限速在这里按块执行 (进度回调只是汇总)
+        for attempt in range(SEGMENT_RETRIES + 1):
+            written = 0
+            try:
+                with host_slot:
+                    response = self.ydl.urlopen(Request(url, headers={
+                        **headers, 'Range': f'bytes={start}-{end - 1}'}))
+                    if response.status != 206:
+                        raise yt_dlp.utils.DownloadError(f'server ignored Range request (HTTP {response.status})')
+                    position = start
+                    while position < end and not stop.is_set():
+                        block = response.read(min(SEGMENT_BLOCK_SIZE, end - position))
+                        if not block:
+                            raise yt_dlp.utils.ContentTooShortError(position - start, end - start)
+                        with lock:
+                            f.seek(position)
+                            f.write(block)
+                            downloaded[0] += len(block)
+                        position += len(block)
+                        written += len(block)
+                        if bandwidth_key is not None:
+                            BANDWIDTH_LIMITER.throttle(bandwidth_key, len(block), stop)
+                    if stop.is_set():
+                        raise yt_dlp.utils.DownloadCancelled('segment stopped')
+                    return
+            except yt_dlp.utils.DownloadCancelled:
+                with lock:
+                    downloaded[0] -= written
+                raise
+            except Exception as e:
+                with lock:
+                    downloaded[0] -= written # 这一段会整段重下
+                if attempt >= SEGMENT_RETRIES or stop.is_set() or is_disk_full_error(e):
+                    raise
+                self.report_retry(e, attempt + 1, SEGMENT_RETRIES)
+                stop.wait(min(30, 2 ** attempt))
+
+    def _probe_size(self, url, headers):
+        """用 Range: bytes=0-0 请求读取文件总大小"""
+        try:
+            response = self.ydl.urlopen(Request(url, headers={**headers, 'Range': 'bytes=0-0'}))
+            content_range = response.headers.get('Content-Range') or ''
+            response.close()
+            total = content_range.rpartition('/')[2]
+            return int(total) if total.isdigit() else None
+        except Exception:
+            return None
+
+    def _load_state(self, tmpfilename, state_path, total):
+        """返回已完成的范围列表并确保 .part 文件已预分配；无法续传时返回 None"""
+        done = []
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('total') == total:
+                    done = state['done']
+            except (OSError, ValueError, KeyError):
+                done = []
+        elif os.path.exists(tmpfilename):
+            # 普通单连接下载留下的 .part：开头这一段已经完整
+            size = os.path.getsize(tmpfilename)
+            if size > total:
+                return None
+            if size:
+                done = [[0, size]]
+
+        with open(tmpfilename, 'ab') as f:
+            preallocate(f, total) # 空间不足时在这里就会报错
+        self._save_state(state_path, total, done)
+        return done
+
+    @staticmethod
+    def _save_state(state_path, total, done):
+        with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'total': total, 'done': done}, f)
+        os.replace(state_path + '.tmp', state_path)
+
+    @classmethod
+    def discard_state(cls, tmpfilename):
+        """单连接下载之前调用：分段下载的 .part 已预分配到完整大小，单连接下载会从文件末尾续传 (HTTP 416)
+        并把全是空洞的文件当成已完成。截断到从开头起连续完成的部分并删除状态文件，单连接下载从这里续传"""
+        state_path = tmpfilename + '.segments'
+        if not os.path.exists(state_path):
+            return
+        try:
+            with open(state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            prefix = next(cls._missing_ranges(state['done'], state['total']), (state['total'],))[0]
+        except (OSError, ValueError, KeyError, TypeError):
+            prefix = 0
+        if os.path.exists(tmpfilename) and os.path.getsize(tmpfilename) > prefix:
+            with open(tmpfilename, 'r+b') as f:
+                f.truncate(prefix)
+        os.remove(state_path)
+
+    @staticmethod
+    def _missing_ranges(done, total):
+        position = 0
+        for start, end in sorted(done):
+            if start > position:
+                yield position, start
+            position = max(position, end)
+        if position < total:
+            yield position, total
+
+    def _fallback(self, filename, info_dict):
+        """大小未知或文件太小：交给 yt_dlp 自带的单连接下载器"""
+        self.discard_state(self.temp_name(filename))
+        fd = HttpFD(self.ydl, self.params)
+        fd._progress_hooks = self._progress_hooks
+        return fd.real_download(filename, info_dict)
+
+class StreamCancelled(yt_dlp.utils.DownloadCancelled):
+    """并行下载中另一路流已失败或被暂停，这一路也停下"""
+    pass
+
+class AtomicMoveFilesPP(MoveFilesAfterDownloadPP):
+    """把完成的文件从临时目录移到最终目录 (同 MoveFilesAfterDownloadPP，跨磁盘时用 storage.move_file 保证原子性)"""
+
+    def run(self, info):
+        dl_path, dl_name = os.path.split(info['filepath'])
+        finaldir = info.get('__finaldir', dl_path)
+        finalpath = os.path.join(finaldir, dl_name)
+        if self._downloaded:
+            info['__files_to_move'][info['filepath']] = finalpath
+
+        for oldfile, newfile in info['__files_to_move'].items():
+            newfile = newfile or os.path.join(finaldir, os.path.basename(oldfile))
+            if os.path.abspath(oldfile) == os.path.abspath(newfile):
+                continue
+            if not os.path.exists(oldfile):
+                self.report_warning(f'File "{oldfile}" cannot be found')
+                continue
+            if os.path.exists(newfile) and not self.get_param('overwrites', True):
+                self.report_warning(f'Cannot move file "{oldfile}" out of temporary directory since "{newfile}" already exists. ')
+                continue
+            try:
+                yt_dlp.utils.make_parent_dirs(newfile)
+            except OSError as e:
+                raise yt_dlp.utils.PostProcessingError(f'Unable to create directory: {e}') from e
+            self.to_screen(f'Moving file "{oldfile}" to "{newfile}"')
+            move_file(oldfile, newfile)
+
+        info['filepath'] = finalpath
+        return [], info
+
+class EngineYoutubeDL(yt_dlp.YoutubeDL):
+    """下载引擎使用的 YoutubeDL：按配置为大文件启用分段下载，并决定多路流的合并方式
+    params['defer_postprocess'] 为 True 时，下载完成后不在当前线程运行后处理器，
+    而是记录下来，由 run_deferred_postprocess() 在后处理池中运行
+    params['before_download'](info) 在选定格式之后、开始下载之前调用 (可抛出异常取消下载)"""
+
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init)
+        self._stream_futures = None # 并行下载中的各路流 (只在 process_info 期间存在)
+        self._stream_pool = None
+        self._stream_cancel = threading.Event() # 任一路流失败/暂停时设置，其他流在下一次进度回调时停止
+        self._stream_error = None               # 第一个失败的流的异常 (其他流的 StreamCancelled 不覆盖它)
+        self._stream_lock = threading.Lock()
+        self._shared_params = None # 直接封装期间 self.params 换成了副本，这里是原来的参数 (字幕用它下载)
+        self.add_progress_hook(self._check_stream_cancel)
+        self.deferred_postprocess = [] # [(文件名, info, files_to_move)]
+        # 额外的提取器类 (如基准测试的本地桩)，优先于内置提取器匹配
+        self._extra_extractors = [ie_class(self) for ie_class in self.params.get('extra_extractors') or ()]
+        for ie in self._extra_extractors:
+            self.add_info_extractor(ie)
+
+    def extract_info(self, url, *args, ie_key=None, **kwargs):
+        if ie_key is None:
+            ie_key = next((ie.ie_key() for ie in self._extra_extractors if ie.suitable(url)), None)
+        return super().extract_info(url, *args, ie_key=ie_key, **kwargs)
+
+    def process_info(self, info_dict):
+        before_download = self.params.get('before_download')
+        if before_download:
+            before_download(info_dict)
+        formats = info_dict.get('requested_formats') or []
+        mode = self.params.get('merge_mode', MERGE_STANDARD)
+        if len(formats) < 2 or mode == MERGE_STANDARD:
+            return super().process_info(info_dict)
+
+        if mode == MERGE_DIRECT and FFmpegFD.can_merge_formats(info_dict, self.params):
+            # 让 yt_dlp 选择 ffmpeg 下载器：两路流由 ffmpeg 同时读取并直接写入最终文件
+            # 只在这次调用中换用参数的副本，共享的参数字典 (其他线程、推迟的后处理也在读) 保持不变
+            self._shared_params = self.params
+            self.params = {**self._shared_params, 'external_downloader': {'default': 'ffmpeg'}}
+            try:
+                return super().process_info(info_dict)
+            finally:
+                self.params, self._shared_params = self._shared_params, None
+
+        # 并行模式 (ffmpeg 不可用于直接封装时也退回到这里)
+        self._stream_futures = []
+        self._stream_cancel.clear()
+        self._stream_error = None
+        try:
+            return super().process_info(info_dict)
+        finally:
+            futures, self._stream_futures = self._stream_futures, None
+            self._stream_cancel.set() # 提前退出 (出错/暂停) 时让仍在下载的流立即停下
+            for future in futures:
+                future.cancel()
+            for future in futures:
+                if not future.cancelled():
+                    future.exception() # 等待仍在运行的流结束，错误已在 post_process 中抛出
+
+    def _check_stream_cancel(self, d):
+        """进度钩子：并行下载中其他流已失败或暂停时停止这一路"""
+        if self._stream_futures is not None and self._stream_cancel.is_set() and d['status'] == 'downloading':
+            raise StreamCancelled('another stream failed or was paused')
+
+    def _stream_dl(self, name, info):
+        """在线程池中下载一路流；失败、暂停或下载器返回失败时通知其他流停止"""
+        try:
+            success, real_download = self._dl(name, info)
+        except BaseException as e:
+            with self._stream_lock:
+                if self._stream_error is None:
+                    self._stream_error = e
+            self._stream_cancel.set()
+            raise
+        if not success:
+            with self._stream_lock:
+                if self._stream_error is None:
+                    self._stream_error = yt_dlp.utils.DownloadError(f'Failed to download {name}')
+            self._stream_cancel.set()
+        return success, real_download
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if self._stream_futures is not None and not subtitle and not test:
+            # 各路流提交到线程池后立即返回，合并前在 post_process 中等待
+            if self._stream_pool is None:
+                self._stream_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='stream')
+            self._stream_futures.append(self._stream_pool.submit(self._stream_dl, name, info))
+            return True, True
+        if subtitle and not test and self._shared_params is not None:
+            # 直接封装模式只对音视频生效，字幕用原来的参数选择下载器
+            params = self._shared_params
+            return self._download_with(get_suitable_downloader(info, params, to_stdout=(name == '-')), params,
+                                       name, info, subtitle)
+        return self._dl(name, info, subtitle, test)
+
+    def _download_with(self, fd_class, params, name, info, subtitle=False):
+        """用指定的下载器和参数下载 (同 YoutubeDL.dl)"""
+        fd = fd_class(self, params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
+
+    def _dl(self, name, info, subtitle=False, test=False):
+        if (not subtitle and not test
+                and (self.params.get('segmented_connections') or 0) > 1
+                and SegmentedHttpFD.can_download(info, self.params, name)):
+            return self._download_with(SegmentedHttpFD, self.params, name, info, subtitle)
+        if not test and name != '-':
+            # 之前分段下载过 (之后关闭了分段或不再满足分段条件)：不能直接从预分配的 .part 续传
+            for tmpfilename in (name + '.part', name):
+                SegmentedHttpFD.discard_state(tmpfilename)
+        return super().dl(name, info, subtitle=subtitle, test=test)
+
+    def post_process(self, filename, info, files_to_move=None):
+        if self._stream_futures:
+            # 合并前等待所有流结束；抛出最先失败的流的异常 (暂停、换线路或下载错误)
+            results = []
+            for future in self._stream_futures:
+                try:
+                    results.append(future.result()[0])
+                except BaseException:
+                    results.append(False)
+            if self._stream_error is not None:
+                raise self._stream_error
+            if not all(results):
+                raise yt_dlp.utils.DownloadError(f'Failed to download {filename}')
+        if self.params.get('defer_postprocess'):
+            info['filepath'] = filename
+            self.deferred_postprocess.append((filename, info, files_to_move))
+            return info
+        return super().post_process(filename, info, files_to_move)
+
+    def run_pp(self, pp, infodict):
+        if type(pp) is MoveFilesAfterDownloadPP:
+            pp = AtomicMoveFilesPP(self, pp._downloaded)
+        return super().run_pp(pp, infodict)
+
+    def deferred_needs(self):
+        """排队中的后处理预计写入的字节数 {目录: 字节数}：合并/转封装的输出约等于输入文件之和，
+        写在输入文件所在的目录，完成后再移到最终目录 (跨磁盘时复制)"""
+        needs = {}
+        for filename, info, _ in self.deferred_postprocess:
+            inputs = info.get('__files_to_merge') or [filename]
+            size = sum(os.path.getsize(path) for path in inputs if path and os.path.exists(path))
+            directory = os.path.dirname(os.path.abspath(filename))
+            needs[directory] = needs.get(directory, 0) + size
+            finaldir = info.get('__finaldir')
+            if finaldir and disk_id(finaldir) != disk_id(directory):
+                needs[finaldir] = needs.get(finaldir, 0) + size
+        return needs
+
+    def run_deferred_postprocess(self):
+        """运行下载时推迟的后处理 (在后处理池的线程中调用)，结果原地更新到各自的 info"""
+        deferred, self.deferred_postprocess = self.deferred_postprocess, []
+        for filename, info, files_to_move in deferred:
+            result = super().post_process(filename, info, files_to_move)
+            if result is not info:
+                info.clear()
+                info.update(result)
+
+    def close(self):
+        if self._stream_pool is not None:
+            self._stream_pool.shutdown(wait=False)
+        super().close()
@@ -0,0 +1,1332 @@
+"""
+下载引擎 (不依赖任何界面库)
+图形界面 (gui.py) 和命令行模式 (cli.py) 共用：
+任务调度、逐个视频重试、下载记录、播放列表分页解析和事件推送
+"""
+
+import os
+import sys # Added for Frozen Path Fix
+import threading
+import queue
+import random
+import time
+import json
+import functools
+import hashlib
+import itertools
+import collections
+import copy
+import re
+import socket
+import urllib.parse
+from dataclasses import asdict, dataclass, field, fields
+from typing import Optional
+
+import yt_dlp
+
+from downloaders import (
+    EngineYoutubeDL, BANDWIDTH_LIMITER, DEFAULT_MAX_CONNECTIONS_PER_HOST, MERGE_DIRECT, MERGE_MODES, MERGE_PARALLEL,
+    parse_rate, parse_rate_profiles,
+)
+from metrics import MetricsRecorder, MetricsServer, Profiler
+from jobstore import JobStore, UNFINISHED_STATES
+from postprocess import DEFAULT_POSTPROCESS_WORKERS, PostProcessPool
+from netpath import (
+    DNS_CACHE, MAX_PATH_SWITCHES, NETWORK_AUTO, NETWORK_IPV4, NETWORK_IPV6, NETWORK_MODES, PATH_SELECTOR,
+    ThroughputMonitor, build_paths,
+)
+from storage import disk_id, is_disk_full_error
+
+
+def get_app_path():
+    """Returns the actual path of the executable (if frozen) or the script."""
+    if getattr(sys, 'frozen', False):
+        # If running as compiled .exe
+        return os.path.dirname(sys.executable)
+    else:
+        # If running as standard .py script
+        return os.path.dirname(os.path.abspath(__file__))
+
+CONFIG_FILE = "config.json"
+
+def load_config(app_path):
+    """读取程序目录下的 config.json (可选)，例如：
+    {"rate_limit": "5M", "job_rate_limit": "2M",
+     "rate_profiles": [{"from": "09:00", "to": "18:00", "limit": "1M"}],
+     "metrics_port": 9464, "profile": "logs/profile.prof",
+     "network": {"direct": ["ipv4", "ipv6"], "proxies": ["socks5://127.0.0.1:1080"],
+                 "min_speed": "200K", "probe_url": null},
+     "output_dir": "D:/Videos", "temp_dir": "C:/Temp/ytdl", "subfolder": "playlist"}"""
+    path = os.path.join(app_path, CONFIG_FILE)
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Config ignored ({path}): {e}")
+        return {}
+    return config if isinstance(config, dict) else {}
+
+class PauseException(yt_dlp.utils.DownloadCancelled):
+    """用于暂停下载的自定义异常 (继承 DownloadCancelled，ignoreerrors 不会吞掉它)"""
+    pass
+
+class SwitchPathException(yt_dlp.utils.DownloadCancelled):
+    """当前线路速度过低，停止这次下载并换一条线路续传 (不计入重试次数)"""
+    pass
+
+# 下载任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_PAUSED = "paused"
+JOB_PROCESSING = "processing" # 下载完成，等待/正在后处理 (合并、提取音频、转换字幕)
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# 单个视频的重试策略 (指数退避 + 随机抖动)
+RETRY_MAX_ATTEMPTS = 15
+RETRY_BASE_DELAY = 2    # 秒
+RETRY_MAX_DELAY = 120   # 秒
+
+def retry_delay(attempt):
+    """第 attempt 次重试前的等待时间 (指数退避，取 [d/2, d] 之间的随机值)"""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+def is_retryable_error(error):
+    """判断错误是否值得重试 (视频不存在/私有、磁盘已满等确定性错误不重试)"""
+    if is_disk_full_error(error):
+        return False
+    exc_info = getattr(error, 'exc_info', None)
+    cause = exc_info[1] if exc_info else None
+    if isinstance(cause, yt_dlp.utils.ExtractorError) and cause.expected:
+        return False
+    return True
+
+# 解析结果缓存 (解析、下载、重试和暂停后继续共用)
+RESOLVED_URL_MARGIN = 120        # 签名链接过期前预留的时间 (秒)
+RESOLVED_INFO_MAX_AGE = 30 * 60  # 无法得知过期时间时，解析结果最多复用多久 (秒)
+INFO_CACHE_MAX_ENTRIES = 256     # 内存中最多保留的解析结果数
+
+def media_urls_expire_at(info):
+    """从媒体直链中读取签名过期时间 (YouTube 的 expire、Bilibili 的 deadline)，未知时返回 None"""
+    expires = []
+    for fmt in info.get('requested_formats') or info.get('formats') or [info]:
+        url = fmt.get('url') or ''
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        value = (query.get('expire') or query.get('deadline') or [None])[0]
+        if value is None:
+            match = re.search(r'/expire/(\d+)', url)
+            value = match.group(1) if match else None
+        if value and value.isdigit():
+            expires.append(int(value))
+    return min(expires) if expires else None
+
+def is_expired_url_error(error):
+    """下载直链时被拒绝 (通常是签名链接已失效)"""
+    message = str(error)
+    return any(code in message for code in ('HTTP Error 403', 'HTTP Error 410', 'HTTP Error 404'))
+
+def is_network_error(error):
+    """与线路有关的错误：连接失败、超时、传输中断，或被限流 (HTTP 429)
+    磁盘已满、没有写入权限等文件系统错误与线路无关，不能让线路进入冷却"""
+    if is_disk_full_error(error):
+        return False
+    exc_info = getattr(error, 'exc_info', None)
+    cause = exc_info[1] if exc_info and exc_info[1] else error
+    cause = getattr(cause, 'cause', None) or cause # ExtractorError 包装的网络错误
+    if is_disk_full_error(cause):
+        return False
+    if 'Got error:' in str(cause) and 'Giving up after' in str(cause):
+        return True # 下载器用完重试次数 (只留下了错误信息)
+    if isinstance(cause, yt_dlp.networking.exceptions.HTTPError):
+        return cause.status == 429
+    return isinstance(cause, (yt_dlp.networking.exceptions.TransportError, yt_dlp.utils.ContentTooShortError,
+                              ConnectionError, TimeoutError, socket.gaierror))
+
+class DownloadJob:
+    """单个视频的下载任务"""
+
+    def __init__(self, job_id, url):
+        self.job_id = job_id
+        self.url = url
+        self.state = JOB_QUEUED
+        self.error = None
+        self.enqueued = False # 是否还在调度队列中 (暂停后继续时不重复入队)
+        self.attempts = 0 # 已重试次数
+        # 暂停时保留的进度 (解析结果保存在 InfoCache 中)
+        self.downloaded_bytes = 0
+        self.tmpfilename = None
+        self.stream_bytes = {} # 每路流已记入限速的字节数 (按临时文件名)
+        self.store_id = None   # 在 JobStore 中的行 ID
+        self.ydl_opts = None   # 从 JobStore 恢复的任务使用当时保存的选项
+        self.netpath = None      # 自动线路模式下当前使用的线路
+        self.switch_path = None  # 下载中决定切换到的线路
+        self.path_switches = 0
+        self.path_monitor = None # 当前线路上的下载速度统计
+        self.collection = None   # 所属播放列表 ({'playlist_title': ..., 'playlist_index': ...})，用于子文件夹模板
+        self.space_reservation = None # 下载期间预留的磁盘空间 (见 PostProcessPool.reserve_space)
+        self.stop_event = threading.Event() # 每个任务独立的暂停标志
+        self.lock = threading.Lock() # 并行下载时两路流的进度回调会同时更新上面的字段
+
+class DownloadScheduler:
+    """有界并发的下载调度器 (固定数量的工作线程从队列中取任务)"""
+
+    def __init__(self, run_job, max_workers=3, on_state_change=None, on_idle=None, finished=None):
+        # run_job(job): 执行单个任务，暂停时抛出 PauseException；
+        # 返回 Future 时表示下载已完成、后处理在后处理池中进行，任务在 Future 完成时结束
+        self.run_job = run_job
+        self.max_workers = max(1, int(max_workers))
+        self.on_state_change = on_state_change  # on_state_change(job): 任务状态变化回调
+        self.on_idle = on_idle                  # on_idle(jobs): 所有工作线程退出后回调
+        self.finished = finished if finished is not None else set() # 已完成的 URL，不再重复下载
+        self.jobs = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._active_workers = 0
+        self._processing = 0 # 后处理中的任务数 (不占用工作线程)
+
+    def submit(self, urls, setup=None):
+        """添加任务并启动工作线程 (已完成的 URL 会被跳过)
+        setup(job, index): 入队前调用，index 为链接在 urls 中的位置 (用于持久化/恢复任务状态)"""
+        new_jobs = []
+        with self._lock:
+            for index, url in enumerate(urls):
+                if url in self.finished:
+                    continue
+                job = DownloadJob(len(self.jobs) + 1, url)
+                if setup:
+                    setup(job, index)
+                self.jobs.append(job)
+                new_jobs.append(job)
+                self._enqueue_locked(job)
+        self._spawn_workers()
+        return new_jobs
+
+    def pause_all(self):
+        """暂停所有未完成的任务 (运行中的任务在下一次进度回调时停止；排队中的任务留在队列中，取出时跳过)"""
+        paused = []
+        with self._lock:
+            for job in self.jobs:
+                if job.state in (JOB_QUEUED, JOB_RUNNING):
+                    job.stop_event.set()
+                    if job.state == JOB_QUEUED:
+                        job.state = JOB_PAUSED
+                        paused.append(job)
+        for job in paused:
+            self._set_state(job, JOB_PAUSED)
+
+    def resume_all(self):
+        """把已暂停的任务重新放回队列 (仍在队列中的任务只恢复状态，不重复入队)"""
+        resumed = []
+        with self._lock:
+            for job in self.jobs:
+                if job.state == JOB_PAUSED:
+                    job.stop_event.clear()
+                    job.state = JOB_QUEUED
+                    self._enqueue_locked(job)
+                    resumed.append(job)
+        for job in resumed:
+            self._set_state(job, JOB_QUEUED)
+        self._spawn_workers()
+
+    def count(self, state):
+        return sum(1 for job in self.jobs if job.state == state)
+
+    def count_active(self):
+        """排队中、运行中或后处理中的任务数"""
+        return sum(1 for job in self.jobs if job.state in (JOB_QUEUED, JOB_RUNNING, JOB_PROCESSING))
+
+    def _set_state(self, job, state, error=None):
+        job.state = state
+        job.error = error
+        if self.on_state_change:
+            self.on_state_change(job)
+
+    def _enqueue_locked(self, job):
+        if not job.enqueued:
+            job.enqueued = True
+            self._queue.put(job)
+
+    def _spawn_workers(self):
+        with self._lock:
+            missing = min(self.max_workers, self._queue.qsize()) - self._active_workers
+            self._active_workers += max(0, missing)
+        for _ in range(missing):
+            threading.Thread(target=self._worker_loop, daemon=True).start()
+
+    def _worker_loop(self):
+        while True:
+            # 取任务和退出在同一把锁内完成：submit/resume_all 要么让这个线程取到新任务，
+            # 要么在 _spawn_workers 中看到它已经退出并补上新的工作线程
+            # 认领任务 (QUEUED -> RUNNING) 也在锁内：同一个任务不会被两个工作线程同时运行
+            with self._lock:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    self._active_workers -= 1
+                    break
+                job.enqueued = False
+                if job.state != JOB_QUEUED:
+                    continue # 排队期间已被暂停
+                job.state = JOB_RUNNING
+            self._set_state(job, JOB_RUNNING)
+            try:
+                postprocess = self.run_job(job)
+            except PauseException:
+                self._set_state(job, JOB_PAUSED)
+                continue
+            except Exception as e:
+                self._set_state(job, JOB_FAILED, str(e))
+                continue
+            if postprocess is None:
+                self.finished.add(job.url)
+                self._set_state(job, JOB_DONE)
+            else:
+                # 工作线程立即去下载下一个任务，后处理结束时再完成这个任务
+                with self._lock:
+                    self._processing += 1
+                self._set_state(job, JOB_PROCESSING)
+                postprocess.add_done_callback(lambda future, job=job: self._on_postprocess_done(job, future))
+
+        self._check_idle()
+
+    def _on_postprocess_done(self, job, future):
+        error = future.exception()
+        if error is None:
+            self.finished.add(job.url)
+            self._set_state(job, JOB_DONE)
+        else:
+            self._set_state(job, JOB_FAILED, f"后处理失败: {error}")
+        with self._lock:
+            self._processing -= 1
+        self._check_idle()
+
+    def _check_idle(self):
+        with self._lock:
+            idle = self._active_workers == 0 and self._processing == 0 and self._queue.empty()
+        if idle and self.on_idle:
+            self.on_idle(list(self.jobs))
+
+def archive_key(extractor, video_id):
+    """归档键 "<extractor> <id>"：下载前从链接推断的键和下载后从解析结果得到的键都经过这里，必须一致。
+    Bilibili 的第 1 P 与不带分 P 的链接是同一个视频 (解析结果的 ID 为 BV..._p1 或 BV...)"""
+    name = extractor if isinstance(extractor, str) else extractor.ie_key()
+    if name.lower() == 'bilibili':
+        video_id = re.sub(r'_p1$', '', video_id)
+    return yt_dlp.utils.make_archive_id(name, video_id)
+
+def normalize_archive_key(key):
+    """旧版本写入的归档键 -> archive_key 的格式"""
+    extractor, _, video_id = key.partition(' ')
+    return archive_key(extractor, video_id) if video_id else key
+
+def bilibili_video_id(ie, url):
+    """Bilibili 链接中的视频 ID 与解析结果一致：get_temp_id 去掉了 BV 前缀，分 P 链接带 _pN 后缀"""
+    match = ie._match_valid_url(url)
+    prefix, video_id = match.group('prefix'), match.group('id')
+    if prefix.upper() == 'BV':
+        video_id = 'BV' + video_id
+    page = (urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get('p') or [None])[-1]
+    return f"{video_id}_p{page}" if page and page.isdigit() else video_id
+
+@functools.lru_cache(maxsize=4096)
+def video_key_from_url(url):
+    """不联网地从链接推断归档键 ("<extractor> <id>")，无法识别时返回 None"""
+    for ie in yt_dlp.extractor.gen_extractor_classes():
+        if ie.ie_key() == 'Generic' or not ie.suitable(url):
+            continue
+        video_id = bilibili_video_id(ie, url) if ie.ie_key() == 'BiliBili' else ie.get_temp_id(url)
+        return archive_key(ie, video_id) if video_id else None
+    return None
+
+def video_key_from_entry(entry):
+    """从播放列表扁平解析的条目得到归档键"""
+    if entry.get('ie_key') and entry.get('id'):
+        return archive_key(entry['ie_key'], entry['id'])
+    url = entry.get('url')
+    return video_key_from_url(url) if url else None
+
+class DownloadArchive:
+    """持久化的下载记录 (按 extractor + 视频 ID 索引)，用于跳过已下载的视频"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._entries = {normalize_archive_key(key): record for key, record in json.load(f).items()}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Download archive ignored ({path}): {e}")
+
+    def get(self, key):
+        """返回记录；输出文件已被删除时视为未下载"""
+        if not key:
+            return None
+        with self._lock:
+            record = self._entries.get(key)
+        if record and not os.path.exists(record.get('path', '')):
+            return None
+        return record
+
+    def contains(self, key):
+        return self.get(key) is not None
+
+    def add_info(self, info):
+        """根据 yt_dlp 下载完成后的 info 记录一条或多条 (播放列表) 下载"""
+        for entry in info.get('entries') or [info]:
+            if not entry:
+                continue
+            downloads = entry.get('requested_downloads') or []
+            path = downloads[0].get('filepath') if downloads else entry.get('filepath')
+            if not path or not os.path.exists(path) or not entry.get('id'):
+                continue
+            key = archive_key(entry.get('extractor_key') or entry.get('ie_key'), entry['id'])
+            self.add(key, {
+                'title': entry.get('title'),
+                'url': entry.get('webpage_url'),
+                'path': path,
+                'size': os.path.getsize(path),
+                'format': entry.get('format_id'),
+                'completed_at': int(time.time()),
+            })
+
+    def add(self, key, record):
+        with self._lock:
+            self._entries[key] = record
+            self._save()
+
+    def _save(self):
+        # 先写临时文件再替换，避免中途退出损坏归档
+        tmp_path = self.path + '.tmp'
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+class InfoCache:
+    """单个视频解析结果 (extract_info) 的缓存：内存 LRU + 可选的磁盘缓存
+    按 extractor + 视频 ID 索引，有效期跟随媒体直链的签名过期时间
+    内存中保存原始的解析结果 (可能含有函数、LazyList 等对象，格式选择和下载会用到)；
+    只有能原样写成 JSON 的结果才写入磁盘"""
+
+    def __init__(self, cache_dir=None, max_entries=INFO_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir # None 表示只缓存在内存中
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict() # key -> (expires_at, info)
+
+    @staticmethod
+    def key_for(url):
+        return video_key_from_url(url) or url
+
+    @staticmethod
+    def expires_at(info):
+        """解析结果可以复用到什么时候"""
+        expire_at = media_urls_expire_at(info)
+        if expire_at is not None:
+            return expire_at - RESOLVED_URL_MARGIN
+        return time.time() + RESOLVED_INFO_MAX_AGE
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, url):
+        """返回解析结果的副本；不存在或直链已过期时返回 None"""
+        key = self.key_for(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.cache_dir:
+            entry = self._load(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None:
+            return None
+        expires_at, info = entry
+        if time.time() >= expires_at:
+            self.invalidate(url)
+            return None
+        return copy.deepcopy(info)
+
+    def put(self, url, info):
+        """保存 extract_info(process=False) 的原始结果 (只缓存单个视频)"""
+        if not info or info.get('_type', 'video') != 'video':
+            return
+        key = self.key_for(url)
+        try:
+            entry = (self.expires_at(info), copy.deepcopy(info))
+        except TypeError: # 含有无法复制的对象 (如生成器)，不缓存
+            return
+        self._remember(key, entry)
+        if self.cache_dir and is_json_safe(info):
+            self._store(key, entry)
+
+    def invalidate(self, url):
+        """直链已失效，下次重新解析"""
+        key = self.key_for(url)
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.cache_dir:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                data = json.load(f)
+            return data['expires_at'], data['info']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store(self, key, entry):
+        expires_at, info = entry
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': expires_at, 'info': info}, f, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Info cache write failed: {e}")
+
+    def prune(self):
+        """删除磁盘上已过期的缓存文件"""
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    expired = json.load(f).get('expires_at', 0) <= now
+            except (OSError, ValueError, AttributeError):
+                expired = True
+            if expired:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+def is_json_safe(value):
+    """value 能否写成 JSON 再原样读回 (sanitize_info 会把其他对象变成 repr 字符串，读回后无法用于下载)"""
+    if isinstance(value, dict):
+        return all(isinstance(key, str) and is_json_safe(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return all(is_json_safe(item) for item in value)
+    return value is None or isinstance(value, (str, int, float, bool))
+
+# 播放列表分页解析
+PLAYLIST_PAGE_SIZE = 50          # 每页条目数
+PLAYLIST_STREAM_CHUNK = 10       # 每解析到这么多条就推送给界面
+PLAYLIST_CACHE_TTL = 6 * 3600    # 扁平解析结果的磁盘缓存有效期 (秒)
+
+def compact_playlist_entry(entry):
+    """只保留选择窗口和下载需要的字段"""
+    url = entry.get('url') or entry.get('id')
+    # 如果 url 只是 ID，补全它
+    if url and not url.startswith('http'):
+        url = f"https://www.youtube.com/watch?v={url}"
+    return {
+        'id': entry.get('id'),
+        'ie_key': entry.get('ie_key'),
+        'title': entry.get('title') or 'Unknown Title',
+        'url': url,
+        'duration': entry.get('duration'),
+    }
+
+class PlaylistCache:
+    """扁平播放列表解析结果的磁盘缓存 (按链接和页码存储，带过期时间)"""
+
+    def __init__(self, cache_dir, ttl=PLAYLIST_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, url, page):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}_{page}.json")
+
+    def get(self, url, page):
+        """返回 {'title', 'entries', 'has_more'}；不存在或已过期时返回 None"""
+        try:
+            with open(self._path(url, page), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - data.get('created', 0) > self.ttl:
+            return None
+        return data
+
+    def put(self, url, page, title, entries, has_more):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(url, page)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'created': time.time(), 'title': title,
+                           'entries': entries, 'has_more': has_more}, f, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Playlist cache write failed: {e}")
+
+class PlaylistPager:
+    """按页流式读取播放列表 (fetch_next 在后台线程中调用)"""
+
+    def __init__(self, url, cache, page_size=PLAYLIST_PAGE_SIZE, info_cache=None, collections=None):
+        self.url = url
+        self.cache = cache
+        self.info_cache = info_cache # 链接是单个视频时，把完整解析结果留给下载复用
+        self.collections = collections # 归档键 -> 所属播放列表 (DownloadEngine.collections)
+        self.page_size = page_size
+        self.page = 0            # 已加载的页数
+        self.title = None
+        self.is_playlist = True
+        self.has_more = True
+        self._entries = None     # 惰性条目迭代器 (只在缓存未命中时创建)
+        self._position = 0       # 迭代器当前位置
+        self._ydl = None
+
+    def fetch_next(self, on_chunk):
+        """加载下一页，每解析到一小批条目就调用 on_chunk(entries)；返回本页条目"""
+        cached = self.cache.get(self.url, self.page)
+        if cached is not None:
+            self.title = cached.get('title')
+            self.has_more = cached['has_more']
+            self._remember(cached['entries'])
+            self.page += 1
+            on_chunk(cached['entries'])
+            return cached['entries']
+
+        entries = self._open_entries(skip=self.page * self.page_size)
+        if entries is None:
+            self.is_playlist = False
+            self.has_more = False
+            return []
+
+        page_entries = []
+        chunk = []
+        for entry in itertools.islice(entries, self.page_size):
+            self._position += 1
+            if not entry:
+                continue
+            chunk.append(compact_playlist_entry(entry))
+            if len(chunk) >= PLAYLIST_STREAM_CHUNK:
+                on_chunk(chunk)
+                page_entries.extend(chunk)
+                chunk = []
+        if chunk:
+            on_chunk(chunk)
+            page_entries.extend(chunk)
+
+        # 预读一条判断是否还有下一页
+        lookahead = next(entries, None)
+        self.has_more = lookahead is not None
+        if self.has_more:
+            self._entries = itertools.chain([lookahead], entries)
+        self.cache.put(self.url, self.page, self.title, page_entries, self.has_more)
+        self._remember(page_entries)
+        self.page += 1
+        return page_entries
+
+    def _remember(self, entries):
+        """记录本页条目所属的播放列表和序号 (下载时填入 playlist_title 等字段，供子文件夹模板使用)"""
+        if self.collections is None or not self.title:
+            return
+        for index, entry in enumerate(entries, self.page * self.page_size + 1):
+            key = video_key_from_entry(entry) or entry.get('url')
+            if key:
+                self.collections[key] = {'playlist': self.title, 'playlist_title': self.title, 'playlist_index': index}
+
+    def _open_entries(self, skip):
+        """返回从第 skip 条开始的条目迭代器；不是播放列表时返回 None"""
+        if self._entries is not None and self._position == skip:
+            return self._entries
+
+        self._ydl = yt_dlp.YoutubeDL({
+            'extract_flat': True,  # 只获取元数据，不下载
+            'quiet': True,
+            'no_warnings': True,
+            **PATH_SELECTOR.choose().ydl_params(), # 当前最快的线路
+        })
+        # process=False 时 entries 是惰性的，翻页时才会继续请求
+        info = self._ydl.extract_info(self.url, download=False, process=False)
+        for _ in range(3):
+            if not info or 'entries' in info or info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = self._ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        if not info or 'entries' not in info:
+            if info and self.info_cache is not None:
+                self.info_cache.put(self.url, info)
+            return None
+
+        self.title = info.get('title')
+        self._entries = itertools.islice(iter(info['entries']), skip, None)
+        self._position = skip
+        return self._entries
+
+class EventQueue:
+    """工作线程 -> 界面/命令行的事件队列 (定时批量取出，进度事件按任务合并)"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def log(self, message):
+        self._queue.put(('log', None, message))
+
+    def progress(self, job_id, status):
+        """status 为 dict (进度字段)；None 表示该任务已结束，清除其状态"""
+        self._queue.put(('progress', job_id, status))
+
+    def drain(self):
+        """取出当前所有事件：返回 (日志行列表, {job_id: 最新状态})"""
+        logs = []
+        progress = {}
+        while True:
+            try:
+                kind, job_id, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'log':
+                logs.append(payload)
+            else:
+                progress[job_id] = payload # 只保留每个任务的最后一条
+        return logs, progress
+
+def format_status(job_id, total, status):
+    """把进度事件格式化为一行文字"""
+    prefix = f"[{job_id}/{total}]"
+    if status['status'] == 'finished':
+        return f"{prefix} 📦 分片下载完成，准备处理..."
+    if status['status'] == 'processing':
+        return f"{prefix} ⚙️ 后处理中 (合并/转换)..."
+    line = f"{prefix} ⬇️ {status['percent']} | 速度: {status['speed']} | 剩余: {status['eta']}"
+    if status.get('limit'):
+        line += f" | 限速: {status['limit']}"
+    return line
+
+def format_rate(rate):
+    """字节/秒 -> "2.00MiB/s"，不限速时返回空字符串"""
+    return f"{yt_dlp.utils.format_bytes(rate)}/s" if rate else ''
+
+# 画质预设 (图形界面和命令行共用)
+QUALITY_PRESETS = {
+    'best': "bestvideo+bestaudio/best",
+    '1080p': "bestvideo[height<=1080]+bestaudio/best[height<=1080]/best[height<=1080]",
+    '720p': "bestvideo[height<=720]+bestaudio/best[height<=720]/best[height<=720]",
+    'audio': "bestaudio/best",
+}
+
+AUDIO_EXTRACT_CODEC = 'm4a'      # "仅音频" 预设提取出的音频格式 (AAC 音源直接复制，不重新编码)
+SUBTITLE_CONVERT_FORMAT = 'srt'  # 字幕统一转换成的格式 (播放器兼容性最好)
+
+# 字幕预设 (None 表示不下载字幕)
+SUBTITLE_PRESETS = {
+    'none': None,
+    'zh': ['zh-Hans', 'zh-CN', 'zh-TW', 'zh'],
+    'en': ['en'],
+    'ja': ['ja'],
+    'all': ['all'],
+}
+
+# 子文件夹预设 (yt_dlp 输出模板，相对于保存目录)；也可以直接使用自定义模板
+SUBFOLDER_PRESETS = {
+    'none': '',
+    'playlist': '%(playlist_title,channel,uploader|未分类)s', # 不属于播放列表的视频按频道
+    'channel': '%(channel,uploader|未分类)s',
+    'date': '%(upload_date>%Y-%m|未知日期)s',
+}
+
+@dataclass
+class DownloadOptions:
+    """一次下载任务的全部选项 (界面控件或命令行参数都转换成它)"""
+    quality: str = 'best'       # QUALITY_PRESETS 的键
+    subtitles: str = 'none'     # SUBTITLE_PRESETS 的键
+    network: str = NETWORK_AUTO # 网络线路，见 netpath.NETWORK_MODES (auto 自动选择并在速度过低时切换)
+    socket_timeout: int = 30    # 连接/读取超时 (秒)
+    max_workers: int = 3        # 并行下载数
+    output_dir: str = field(default_factory=get_app_path)
+    temp_dir: str = ''          # .part 和合并前中间文件的目录 (如高速 SSD)，完成后移到 output_dir；为空时直接写入 output_dir
+    subfolder: str = 'none'     # SUBFOLDER_PRESETS 的键，或自定义的 yt_dlp 输出模板 (如 "%(uploader)s/%(upload_date>%Y)s")
+    proxy: Optional[str] = field(default_factory=lambda: os.environ.get("http_proxy"))
+    quiet: bool = False         # 不输出 yt_dlp 自己的控制台日志 (命令行模式自行打印进度)
+    segments: int = 0           # 分段下载的并行连接数 (0/1 表示不分段)
+    max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST # 同一主机的连接上限 (所有任务共享)
+    merge_mode: str = MERGE_PARALLEL # 视频+音频的合并方式，见 downloaders.MERGE_MODES
+    disk_info_cache: bool = True  # 解析结果是否同时缓存到磁盘 (重启后仍可复用未过期的直链)
+    rate_limit: int = 0         # 全局限速 (字节/秒，0 不限速)，由活跃任务平分
+    job_rate_limit: int = 0     # 单任务限速 (字节/秒，0 不限速)
+    postprocess_workers: int = DEFAULT_POSTPROCESS_WORKERS # 同时进行的后处理 (ffmpeg) 数，与下载并行
+
+    def to_ydl_opts(self):
+        """生成 yt_dlp 配置 (不含进度钩子)"""
+        if self.quality not in QUALITY_PRESETS:
+            raise ValueError(f"未知画质: {self.quality}")
+        if self.subtitles not in SUBTITLE_PRESETS:
+            raise ValueError(f"未知字幕选项: {self.subtitles}")
+        if self.rate_limit < 0 or self.job_rate_limit < 0:
+            raise ValueError("限速值不能为负数")
+        if self.merge_mode not in MERGE_MODES:
+            raise ValueError(f"未知合并方式: {self.merge_mode}")
+        if self.network not in NETWORK_MODES:
+            raise ValueError(f"未知网络线路: {self.network}")
+        subfolder = SUBFOLDER_PRESETS.get(self.subfolder, self.subfolder)
+        if subfolder and yt_dlp.YoutubeDL.validate_outtmpl(subfolder) is not None:
+            raise ValueError(f"无效的子文件夹模板: {self.subfolder}")
+
+        # ffmpeg 检查
+        ffmpeg_location = None
+        current_dir = get_app_path() # Reuse get_app_path for ffmpeg check
+        if os.path.exists(os.path.join(current_dir, "ffmpeg.exe")):
+            ffmpeg_location = current_dir
+
+        ydl_opts = {
+            'format': QUALITY_PRESETS[self.quality],
+            'merge_output_format': 'mp4',
+            'merge_mode': self.merge_mode,    # 由 EngineYoutubeDL 读取
+            'network_mode': self.network,     # 由下载引擎读取 (auto 时每次尝试选择线路)
+            'paths': {'home': self.output_dir}, # Correct path for EXE
+            'outtmpl': f'{subfolder}/%(title)s.%(ext)s' if subfolder else '%(title)s.%(ext)s',
+            'no_warnings': True,
+            'quiet': self.quiet,
+            'noprogress': self.quiet,
+
+            # === NETWORK STABILITY FIXES (CRITICAL) ===
+            'proxy': self.proxy,
+            'retries': float('inf'),           # Infinite retries for HTTP errors
+            'fragment_retries': float('inf'),  # Infinite retries for segment errors
+            'skip_unavailable_fragments': False, # Never skip parts (keep trying)
+            'socket_timeout': self.socket_timeout, # Seconds before considering connection dead
+            'force_ipv4': self.network == NETWORK_IPV4, # Default fix for 10054
+            'force_ipv6': self.network == NETWORK_IPV6,
+            'ignoreerrors': False,             # Each job runs alone, so surface its error for per-video retry
+            'continuedl': True,                # Keep resume support
+            # ==========================================
+        }
+
+        if ffmpeg_location:
+            ydl_opts['ffmpeg_location'] = ffmpeg_location
+        if self.temp_dir:
+            ydl_opts['paths']['temp'] = self.temp_dir # 完成后 (后处理池中) 移到保存目录
+
+        # 分段多连接下载 (由 EngineYoutubeDL 读取)
+        if self.segments > 1:
+            ydl_opts['segmented_connections'] = self.segments
+            ydl_opts['max_connections_per_host'] = self.max_connections_per_host
+
+        # 字幕逻辑处理
+        langs = SUBTITLE_PRESETS[self.subtitles]
+        ydl_opts['writesubtitles'] = bool(langs)
+        if langs:
+            ydl_opts['subtitleslangs'] = langs
+
+        # 后处理器 (与合并一起在后处理池中运行)
+        postprocessors = []
+        if self.quality == 'audio':
+            postprocessors.append({'key': 'FFmpegExtractAudio', 'preferredcodec': AUDIO_EXTRACT_CODEC})
+        if langs:
+            postprocessors.append({'key': 'FFmpegSubtitlesConvertor', 'format': SUBTITLE_CONVERT_FORMAT,
+                                   'when': 'post_process'})
+        if postprocessors:
+            ydl_opts['postprocessors'] = postprocessors
+
+        return ydl_opts
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 JobStore 中保存的字典还原 (忽略未知字段，缺少的字段用默认值)"""
+        names = {f.name for f in fields(cls)}
+        if 'ipv6' in data and 'network' not in data: # 旧版本的 IPv6 开关
+            data = {**data, 'network': NETWORK_IPV6 if data['ipv6'] else NETWORK_IPV4}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+def expand_playlist(url, cache, on_page=None, info_cache=None, collections=None):
+    """读取播放列表的全部分页，返回视频链接；不是播放列表时返回 [url]"""
+    pager = PlaylistPager(url, cache, info_cache=info_cache, collections=collections)
+    urls = []
+    while pager.has_more:
+        entries = pager.fetch_next(lambda chunk: None)
+        urls.extend(entry['url'] for entry in entries if entry.get('url'))
+        if on_page:
+            on_page(pager)
+    return urls if pager.is_playlist else [url]
+
+class DownloadEngine:
+    """下载引擎：把链接交给调度器，负责单个视频的下载、重试和下载记录"""
+
+    def __init__(self, app_path=None, events=None, on_idle=None, extractors=()):
+        app_path = app_path or get_app_path()
+        self.extractors = list(extractors) # 额外的 yt_dlp 提取器类 (基准测试的本地桩等)
+        self.events = events or EventQueue() # 日志/进度事件，由界面或命令行取出显示
+        self.on_idle = on_idle               # on_idle(jobs): 一批任务全部结束或暂停后回调 (工作线程)
+        self.archive = DownloadArchive(os.path.join(app_path, "download_archive.json"))
+        self.playlist_cache = PlaylistCache(os.path.join(app_path, "cache", "playlists"))
+        self.info_cache_dir = os.path.join(app_path, "cache", "info")
+        self.info_cache = InfoCache(self.info_cache_dir) # 单个视频的解析结果，解析/下载/重试共用
+        self.config = load_config(app_path)
+        self.bandwidth = BANDWIDTH_LIMITER
+        try:
+            self.bandwidth.configure(profiles=parse_rate_profiles(self.config.get('rate_profiles')))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Rate profiles ignored: {e}")
+        # 指标：每个任务结束时追加一行 JSON，可选 Prometheus 端点和性能剖析
+        self.metrics = MetricsRecorder(os.path.join(app_path, "logs", "metrics.jsonl"))
+        self.metrics_server = None
+        self.profiler = None
+        if self.config.get('metrics_port'):
+            self.serve_metrics(int(self.config['metrics_port']))
+        if self.config.get('profile'):
+            self.enable_profiling(os.path.join(app_path, self.config['profile']))
+        # 网络线路：所有任务共享测速结果和 yt_dlp 连接使用的 DNS 缓存
+        DNS_CACHE.install()
+        self.netpaths = PATH_SELECTOR
+        self.netpaths_state = os.path.join(app_path, "cache", "netpaths.json")
+        self.configure_network(os.environ.get("http_proxy"))
+        # 后处理池：合并/转换与下载并行，临时目录空间不足时让新的下载等待
+        self.postprocess = PostProcessPool()
+        try:
+            if self.config.get('postprocess_min_free'):
+                self.postprocess.configure(min_free_bytes=parse_rate(self.config['postprocess_min_free']))
+        except ValueError as e:
+            print(f"Postprocess config ignored: {e}")
+        self.collections = {}      # 归档键 -> 所属播放列表 (展开播放列表时记录，下载时用于子文件夹模板)
+        self.finished_urls = set() # 本次运行中已完成的 URL
+        self.scheduler = None      # 当前批次的下载调度器
+        self.options = None
+        self.ydl_opts = None
+        os.makedirs(app_path, exist_ok=True)
+        self.store = JobStore(os.path.join(app_path, "jobs.db")) # 持久化的任务队列，重启后可恢复
+
+    def log(self, message):
+        self.events.log(message)
+
+    def start(self, urls, options):
+        """开始新一批下载，返回实际排队的任务 (已下载过的链接会被跳过)"""
+        self.options = options
+        self.ydl_opts = self.build_ydl_opts(options)
+        self.store.purge_finished()
+        self.info_cache.cache_dir = self.info_cache_dir if options.disk_info_cache else None
+        self.info_cache.prune()
+        self.set_rate_limits(options.rate_limit, options.job_rate_limit)
+        self.postprocess.configure(workers=options.postprocess_workers)
+        if options.merge_mode == MERGE_DIRECT:
+            # ffmpeg 自己读取两路流，yt_dlp 收不到进度回调
+            self.log("ℹ️ 边下边封装模式：需要合并的视频不能暂停续传，也不受限速和自动换线路控制")
+        if options.network == NETWORK_AUTO:
+            self.configure_network(options.proxy)
+            self.log(f"🌐 网络线路: {self.netpaths.describe()}")
+            if self.netpaths.needs_probe():
+                threading.Thread(target=self.netpaths.probe, args=({'socket_timeout': options.socket_timeout},),
+                                 daemon=True).start()
+        self.scheduler = DownloadScheduler(
+            run_job=self.run_job,
+            max_workers=options.max_workers,
+            on_state_change=self._on_job_state_change,
+            on_idle=self._on_scheduler_idle,
+            finished=self.finished_urls
+        )
+        return self.add(urls)
+
+    def build_ydl_opts(self, options):
+        ydl_opts = options.to_ydl_opts()
+        if self.extractors:
+            ydl_opts['extra_extractors'] = self.extractors
+        return ydl_opts
+
+    def add(self, urls):
+        """向当前批次追加链接 (命令行守护模式持续追加)"""
+        # 联网解析前先按下载记录过滤
+        pending_urls = [url for url in urls
+                        if not self.archive.contains(video_key_from_url(url))]
+        options = asdict(self.options)
+        def persist(job, index):
+            job.collection = self.collections.get(video_key_from_url(job.url) or job.url)
+            # 所属播放列表与选项一起保存，恢复的任务仍然进入同一个子文件夹
+            job.store_id = self.store.add(job.url, {**options, 'collection': job.collection} if job.collection else options)
+
+        jobs = self.scheduler.submit(pending_urls, setup=persist)
+        skipped = len(urls) - len(jobs)
+        if skipped:
+            self.log(f"⏭️ 跳过 {skipped} 个已下载过的视频。")
+        if jobs:
+            self.log(f"🚀 开始下载 {len(jobs)} 个任务 (并行 {self.scheduler.max_workers} 个)...")
+        return jobs
+
+    def restore_unfinished(self, options):
+        """继续上次未完成的任务 (不重新解析播放列表)。每个任务使用当时保存的下载选项，
+        options 只决定并行数、限速等本次运行的设置；返回恢复的任务"""
+        if self.scheduler is None:
+            self.start([], options)
+        rows = []
+        for row in self.store.unfinished():
+            if self.archive.contains(video_key_from_url(row['url'])):
+                self.store.remove(row['id']) # 上次已下载完成，只是没来得及删除记录
+            else:
+                rows.append(row)
+        if not rows:
+            return []
+
+        opts_cache = {}
+        def restore(job, index):
+            row = rows[index]
+            options = dict(row['options'])
+            job.collection = options.pop('collection', None)
+            key = json.dumps(options, sort_keys=True)
+            if key not in opts_cache:
+                opts_cache[key] = self.build_ydl_opts(DownloadOptions.from_dict(options))
+            job.ydl_opts = opts_cache[key]
+            job.store_id = row['id']
+            job.tmpfilename = row['tmpfilename']
+            job.downloaded_bytes = row['downloaded_bytes']
+            self.store.transition(row['id'], UNFINISHED_STATES, JOB_QUEUED)
+
+        jobs = self.scheduler.submit([row['url'] for row in rows], setup=restore)
+        if jobs:
+            self.log(f"♻️ 恢复 {len(jobs)} 个未完成的任务 (并行 {self.scheduler.max_workers} 个)...")
+        return jobs
+
+    def configured_storage(self):
+        """config.json 中的存储位置：(保存目录, 临时目录, 子文件夹)，未设置的为 None"""
+        return self.config.get('output_dir'), self.config.get('temp_dir'), self.config.get('subfolder')
+
+    def configured_rate_limits(self):
+        """config.json 中的默认限速 (全局, 单任务)，单位 字节/秒"""
+        try:
+            return parse_rate(self.config.get('rate_limit')), parse_rate(self.config.get('job_rate_limit'))
+        except ValueError as e:
+            print(f"Rate limit config ignored: {e}")
+            return 0, 0
+
+    def set_rate_limits(self, rate_limit, job_rate_limit):
+        """修改限速 (可在下载过程中调用，立即生效)"""
+        self.bandwidth.configure(global_limit=rate_limit, job_limit=job_rate_limit)
+
+    def configure_network(self, proxy):
+        """按 config.json 的 network 配置和下载选项中的代理设置候选线路"""
+        config = self.config.get('network') or {}
+        try:
+            paths = build_paths(config, proxy)
+            min_speed = parse_rate(config['min_speed']) if config.get('min_speed') else None
+        except (TypeError, ValueError) as e:
+            print(f"Network config ignored: {e}")
+            paths, min_speed = build_paths(proxy=proxy), None
+        self.netpaths.configure(paths, min_speed=min_speed, probe_url=config.get('probe_url', ''),
+                                state_path=self.netpaths_state)
+
+    def serve_metrics(self, port):
+        """在 127.0.0.1:port 上提供 /metrics (Prometheus 格式)"""
+        if self.metrics_server is not None:
+            return self.metrics_server.port
+        try:
+            self.metrics_server = MetricsServer(self.metrics, port)
+        except OSError as e:
+            print(f"Metrics endpoint disabled (port {port}): {e}")
+            return None
+        return self.metrics_server.port
+
+    def enable_profiling(self, path):
+        """用 cProfile 记录每个任务的耗时分布，一批任务结束后写入 path"""
+        self.profiler = Profiler(path)
+
+    def pause(self):
+        if self.scheduler:
+            self.scheduler.pause_all() # 设置每个任务的停止标志
+
+    def resume(self):
+        if self.scheduler:
+            self.scheduler.resume_all() # 只重新排队已暂停的任务
+
+    def progress_hook(self, job, d):
+        """yt_dlp 进度钩子 (在此处检查暂停，进度只推入事件队列)"""
+        self.metrics.progress(job, d)
+        with job.lock:
+            if d.get('tmpfilename') and d['tmpfilename'] != job.tmpfilename:
+                job.tmpfilename = d['tmpfilename']
+                self.store.update(job.store_id, tmpfilename=job.tmpfilename) # 记录 .part 文件位置
+            if d.get('downloaded_bytes'):
+                job.downloaded_bytes = d['downloaded_bytes']
+
+        if d['status'] == 'downloading' and not d.get('throttled'):
+            self.throttle(job, d)
+
+        if job.stop_event.is_set():
+            raise PauseException("User paused the download")
+
+        if d['status'] == 'downloading' and job.path_monitor is not None:
+            self.check_network_path(job, d)
+
+        if d['status'] == 'downloading':
+            self.events.progress(job.job_id, {
+                'status': 'downloading',
+                'percent': d.get('_percent_str', '').replace('\x1b[0;94m', '').replace('\x1b[0m', '').strip(),
+                'speed': d.get('_speed_str', 'N/A').strip(),
+                'eta': d.get('_eta_str', 'N/A').strip(),
+                'limit': format_rate(self.bandwidth.rate_for(job.job_id)),
+            })
+        elif d['status'] == 'finished':
+            self.events.progress(job.job_id, {'status': 'finished'})
+
+    def throttle(self, job, d):
+        """按这一路流新增的字节数限速 (阻塞当前下载线程，暂停时立即返回)"""
+        stream = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        with job.lock:
+            previous = job.stream_bytes.get(stream)
+            job.stream_bytes[stream] = downloaded
+        if previous is not None and downloaded > previous: # 第一次回调只记录续传起点
+            self.bandwidth.throttle(job.job_id, downloaded - previous, job.stop_event)
+
+    def check_network_path(self, job, d):
+        """自动线路：每个统计窗口记录一次线路速度，速度低于阈值且有更快的线路时切换"""
+        with job.lock: # 两路流只由一路决定是否切换
+            self._check_network_path_locked(job, d)
+
+    def _check_network_path_locked(self, job, d):
+        if job.switch_path is not None:
+            raise SwitchPathException(f"Switching to {job.switch_path.name}") # 多路流中的其他流也停下
+        stream = d.get('tmpfilename') or d.get('filename')
+        speed = job.path_monitor.update(stream, d.get('downloaded_bytes') or 0)
+        if speed is None:
+            return
+        limit = self.bandwidth.rate_for(job.job_id)
+        if limit and speed >= limit * 0.8:
+            return # 速度受限速约束，不代表线路的能力
+        self.netpaths.report_speed(job.netpath, speed)
+        if speed >= self.netpaths.min_speed or job.path_switches >= MAX_PATH_SWITCHES:
+            return
+        alternative = self.netpaths.alternative(job.netpath, speed)
+        if alternative is not None:
+            job.switch_path = alternative
+            raise SwitchPathException(f"{job.netpath.name} {format_rate(speed)}")
+
+    def _on_job_state_change(self, job):
+        """任务状态变化 (在工作线程中调用)"""
+        prefix = f"[{job.job_id}/{len(self.scheduler.jobs)}]"
+        if job.state != JOB_RUNNING:
+            # 后处理中的任务显示状态，其余从进度区移除
+            self.events.progress(job.job_id, {'status': 'processing'} if job.state == JOB_PROCESSING else None)
+            self.bandwidth.release(job.job_id)
+        if job.state == JOB_DONE:
+            self.store.remove(job.store_id) # 已记入下载记录
+        else:
+            self.store.update(job.store_id, state=job.state, error=job.error, attempts=job.attempts,
+                              downloaded_bytes=job.downloaded_bytes)
+        if job.state == JOB_RUNNING:
+            self.metrics.job_started(job)
+        elif job.state in (JOB_DONE, JOB_FAILED, JOB_PAUSED):
+            self.metrics.job_finished(job)
+        if job.state == JOB_RUNNING:
+            self.log(f"{prefix} ▶️ 开始: {job.url}")
+        elif job.state == JOB_DONE:
+            self.log(f"{prefix} ✅ 完成")
+        elif job.state == JOB_FAILED:
+            self.log(f"{prefix} ❌ 失败: {job.error}")
+        elif job.state == JOB_PAUSED and job.downloaded_bytes:
+            self.log(f"{prefix} ⏸️ 已暂停于 {job.downloaded_bytes / 1024 / 1024:.1f} MB")
+
+    def _on_scheduler_idle(self, jobs):
+        """所有工作线程都已退出 (在工作线程中调用)"""
+        if any(job.state == JOB_PAUSED for job in jobs):
+            self.log("🛑 下载已暂停。点击'继续下载'可恢复。")
+        else:
+            failed = [job for job in jobs if job.state == JOB_FAILED]
+            if failed:
+                # 失败报告：逐个列出失败的链接及原因
+                self.log(f"⚠️ 完成 {len(jobs) - len(failed)} 个，失败 {len(failed)} 个：")
+                for job in failed:
+                    self.log(f"  ❌ {job.url} (重试 {job.attempts} 次) - {job.error}")
+            else:
+                self.log("🎉 所有任务已全部完成！")
+        if self.profiler:
+            summary_path = self.profiler.dump()
+            if summary_path:
+                self.log(f"📊 性能剖析已保存: {summary_path}")
+        if self.on_idle:
+            self.on_idle(jobs)
+
+    def run_job(self, job):
+        """调度器调用的入口 (开启性能剖析时由 Profiler 包装)"""
+        if self.profiler:
+            return self.profiler.run(self.download_job, job)
+        return self.download_job(job)
+
+    def download_job(self, job):
+        """下载单个任务 (在调度器的工作线程中运行)"""
+        job_opts = dict(job.ydl_opts or self.ydl_opts)
+        job_opts['progress_hooks'] = [lambda d: self.progress_hook(job, d)] # 绑定钩子
+        job_opts['postprocessor_hooks'] = [lambda d: self.metrics.postprocessor(job, d)]
+        job_opts['bandwidth_key'] = job.job_id # 分段下载的各连接按任务限速
+        job_opts['defer_postprocess'] = True   # 后处理交给后处理池，不占用下载线程
+        job_opts['before_download'] = lambda info: self.reserve_space(job, job_opts, info)
+        auto_network = job_opts.get('network_mode') == NETWORK_AUTO
+
+        # === AUTO-RETRY LOGIC (per video) ===
+        while True:
+            attempt_opts = job_opts
+            if auto_network:
+                # 每次尝试 (包括重试和切换) 都重新选择线路
+                job.netpath = job.switch_path or self.netpaths.choose()
+                job.switch_path = None
+                job.path_monitor = ThroughputMonitor()
+                self.netpaths.acquire(job.netpath)
+                attempt_opts = {**job_opts, **job.netpath.ydl_params(failover=len(self.netpaths.paths) > 1)}
+            ydl = None
+            try:
+                ydl = EngineYoutubeDL(attempt_opts)
+                info = self.resolve_job(job, ydl)
+                if job.collection:
+                    info = {**info, **job.collection} # 播放列表字段 (子文件夹模板)
+                self.metrics.download_started(job)
+                # 用已解析的结果选择格式并下载 (.part 文件从已下载的位置续传)
+                info = ydl.process_ie_result(info, download=True)
+                if auto_network:
+                    self.record_path_speed(job)
+                if ydl.deferred_postprocess:
+                    handed_over, ydl = ydl, None # 由后处理池负责关闭
+                    return self.queue_postprocess(job, handed_over, info)
+                self.finish_download(job, ydl, info)
+                return # If we get here, download finished successfully!
+
+            except PauseException:
+                raise # Rethrow pause exception to be handled by the scheduler
+
+            except SwitchPathException as e:
+                job.path_switches += 1
+                self.info_cache.invalidate(job.url) # 直链可能绑定了原线路的 IP，在新线路上重新解析
+                self.log(f"[{job.job_id}] 🔀 线路速度过低 ({e})，切换到 {job.switch_path.name} 继续下载")
+                continue
+
+            except Exception as e:
+                failover = False
+                if is_expired_url_error(e):
+                    self.info_cache.invalidate(job.url) # 直链已失效，下次重新解析
+                elif auto_network and is_network_error(e):
+                    self.netpaths.report_failure(job.netpath) # 线路冷却，下次尝试换一条
+                    DNS_CACHE.clear() # 失败可能是因为缓存的地址已失效
+                    failover = self.netpaths.alternative(job.netpath, 0) is not None
+                if not is_retryable_error(e) or job.attempts >= RETRY_MAX_ATTEMPTS:
+                    raise
+
+                job.attempts += 1
+                delay = 0 if failover else retry_delay(job.attempts) # 还有健康的线路时立即换线路重试
+                self.metrics.retry(job, job.attempts, e, delay)
+                self.store.update(job.store_id, attempts=job.attempts, error=str(e))
+
+                # Update Log UI
+                if failover:
+                    self.log(f"[{job.job_id}] 🔀 线路 {job.netpath.name} 连接失败，第 {job.attempts} 次重试换用其他线路...")
+                else:
+                    self.log(f"[{job.job_id}] ⚠️ 网络不稳定，第 {job.attempts} 次重试中... ({delay:.0f}秒后继续)")
+
+                # Wait before retrying to let network recover (pause interrupts the wait)
+                if job.stop_event.wait(delay):
+                    raise PauseException("User paused the download")
+
+            finally:
+                if ydl is not None:
+                    ydl.close()
+                if auto_network:
+                    self.netpaths.release(job.netpath)
+                self.postprocess.release_space(job.space_reservation) # 已下载的部分由剩余空间体现
+                job.space_reservation = None
+        # ========================
+
+    def reserve_space(self, job, job_opts, info):
+        """选定格式之后、开始下载之前：按格式大小预留临时目录 (和不在同一磁盘的保存目录) 的空间。
+        空间不足时等待后处理释放空间，没有可等待的任务时抛出 DiskSpaceError (不重试)"""
+        formats = info.get('requested_formats') or [info]
+        total = sum(fmt.get('filesize') or fmt.get('filesize_approx') or 0 for fmt in formats)
+        home = job_opts['paths']['home']
+        temp = job_opts['paths'].get('temp') or home
+        merge = len(formats) > 1 and job_opts.get('merge_mode') != MERGE_DIRECT
+        # 合并时中间文件和合并后的文件同时存在；断点续传时只需要剩余部分
+        needs = {temp: max(0, total - job.downloaded_bytes) + (total if merge else 0)}
+        if disk_id(home) != disk_id(temp):
+            needs[home] = total # 完成后复制到另一块磁盘
+        def on_wait(path, needed, free):
+            self.log(f"[{job.job_id}] 💽 {path} 剩余空间不足 (需要 {yt_dlp.utils.format_bytes(needed)}，"
+                     f"可用 {yt_dlp.utils.format_bytes(max(0, free))}，保留 "
+                     f"{yt_dlp.utils.format_bytes(self.postprocess.min_free_bytes)})，等待其他任务释放空间...")
+        self.postprocess.release_space(job.space_reservation)
+        job.space_reservation = self.postprocess.reserve_space(needs, job.stop_event, on_wait)
+        if job.space_reservation is None:
+            raise PauseException("User paused the download")
+
+    def queue_postprocess(self, job, ydl, info):
+        """把下载时推迟的后处理提交到后处理池 (队列已满时阻塞)，返回 Future"""
+        def run():
+            try:
+                ydl.run_deferred_postprocess()
+                self.finish_download(job, ydl, info)
+            finally:
+                ydl.close()
+
+        postprocess = self.postprocess.submit(run, ydl.deferred_needs(), job.stop_event)
+        if postprocess is None:
+            ydl.close()
+            raise PauseException("User paused the download") # 继续时文件已下载完成，直接进行后处理
+        return postprocess
+
+    def finish_download(self, job, ydl, info):
+        """下载和后处理都已完成：写入下载记录，统计输出大小"""
+        if info:
+            info = ydl.sanitize_info(info)
+            self.archive.add_info(info)
+            self.record_output_size(job, info)
+
+    def record_path_speed(self, job):
+        """下载完成：用整个下载过程的平均速度更新线路统计 (受限速约束时不记录)"""
+        speed = job.path_monitor.average_speed()
+        limit = self.bandwidth.rate_for(job.job_id)
+        if speed and not (limit and speed >= limit * 0.8):
+            self.netpaths.report_speed(job.netpath, speed)
+        self.netpaths.save()
+
+    def resolve_job(self, job, ydl):
+        """返回未选择格式的解析结果：直链仍有效时复用缓存 (解析窗口、重试、暂停前)，否则重新解析"""
+        info = self.info_cache.get(job.url)
+        if info is not None:
+            self.metrics.extraction(job, 0, cached=True)
+            if job.downloaded_bytes:
+                self.log(f"[{job.job_id}] ♻️ 复用已解析的格式，从 {job.downloaded_bytes / 1024 / 1024:.1f} MB 处继续")
+            return info
+
+        # process=False：只运行提取器，格式选择留给 process_ie_result，缓存与画质设置无关
+        started = time.time()
+        info = ydl.extract_info(job.url, download=False, process=False)
+        self.metrics.extraction(job, time.time() - started)
+        self.info_cache.put(job.url, info)
+        return info
+
+    def prefetch_info(self, url, options):
+        """提前解析单个视频并放入 InfoCache (批量导入时并发调用)，返回标题"""
+        info = self.info_cache.get(url)
+        if info is None:
+            ydl_opts = {**self.build_ydl_opts(options), 'quiet': True, 'no_warnings': True}
+            if options.network == NETWORK_AUTO:
+                ydl_opts.update(self.netpaths.choose().ydl_params())
+            with EngineYoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False, process=False)
+                self.info_cache.put(url, info)
+        return info.get('title')
+
+    def record_output_size(self, job, info):
+        """记录最终写入磁盘的字节数"""
+        for entry in info.get('entries') or [info]:
+            for download in (entry or {}).get('requested_downloads') or []:
+                path = download.get('filepath')
+                if path and os.path.exists(path):
+                    self.metrics.bytes_written(job, os.path.getsize(path))
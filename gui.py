@@ -0,0 +1,1040 @@
+"""
+YouTube 4K 视频下载器 (升级版)
+功能：
+1. 支持播放列表分页解析与选择下载 (可按需加载更多)
+2. 支持暂停/继续下载
+3. 现代化深色 UI
+4. 多视频并行下载 (可配置并行数)
+"""
+
+import os
+# 👇👇👇 必须保留的代理配置 👇👇👇
+#os.environ["http_proxy"] = "http://127.0.0.1:7890"
+#os.environ["https_proxy"] = "http://127.0.0.1:7890"
+
+import customtkinter as ctk
+import threading
+from tkinter import filedialog, messagebox
+
+import ingest
+
+from downloaders import DEFAULT_MAX_CONNECTIONS_PER_HOST, MERGE_DIRECT, MERGE_PARALLEL, MERGE_STANDARD
+from engine import (
+    DownloadEngine, DownloadOptions, PlaylistPager, PLAYLIST_PAGE_SIZE, expand_playlist,
+    JOB_FAILED, JOB_PAUSED, format_rate, format_status, get_app_path, video_key_from_entry,
+)
+from netpath import NETWORK_AUTO, NETWORK_IPV4, NETWORK_IPV6
+from transcripts import (
+    CONTENT_METADATA, CONTENT_SUBTITLES, CORPUS_JSONL, CorpusExporter, default_corpus_path, open_corpus,
+)
+
+# 设置 customtkinter 外观
+ctk.set_appearance_mode("System")  # 系统模式
+ctk.set_default_color_theme("blue")  # 蓝色主题
+
+# 界面事件管道
+UI_TICK_MS = 200        # 界面刷新间隔 (毫秒)
+LOG_MAX_LINES = 500     # 日志框最多保留的行数
+
+# 界面选项 -> 引擎预设
+QUALITY_LABELS = {
+    "最高画质 (4K/8K)": 'best',
+    "1080p": '1080p',
+    "720p": '720p',
+    "仅音频": 'audio',
+}
+MERGE_LABELS = {
+    "音视频同时下载后合并": MERGE_PARALLEL,
+    "边下边封装 (省空间，不能暂停/限速/换线路)": MERGE_DIRECT,
+    "顺序下载后合并": MERGE_STANDARD,
+}
+NETWORK_LABELS = {
+    "自动选择 (测速并在变慢时切换)": NETWORK_AUTO,
+    "强制 IPv4": NETWORK_IPV4,
+    "强制 IPv6": NETWORK_IPV6,
+}
+RATE_LABELS = {
+    "不限速": 0,
+    "512 KB/s": 512 * 1024,
+    "1 MB/s": 1024 * 1024,
+    "2 MB/s": 2 * 1024 * 1024,
+    "5 MB/s": 5 * 1024 * 1024,
+    "10 MB/s": 10 * 1024 * 1024,
+    "20 MB/s": 20 * 1024 * 1024,
+}
+SUBTITLE_LABELS = {
+    '不下载 (None)': 'none',
+    '中文 (Chinese)': 'zh',
+    '英语 (English)': 'en',
+    '日语 (Japanese)': 'ja',
+    '所有 (All)': 'all',
+}
+
+SUBFOLDER_LABELS = {
+    '不分文件夹': 'none',
+    '按播放列表': 'playlist',
+    '按频道': 'channel',
+    '按上传月份': 'date',
+}
+
+CONTENT_LABELS = {
+    '音视频': None,
+    '仅字幕 (导出 JSONL 语料)': CONTENT_SUBTITLES,
+    '仅元数据 (导出 JSONL 语料)': CONTENT_METADATA,
+}
+
+class PlaylistSelectionWindow(ctk.CTkToplevel):
+    """播放列表选择窗口 (虚拟列表：只渲染可见行，条目分页流式加入)"""
+
+    VISIBLE_ROWS = 15
+
+    def __init__(self, app, pager):
+        super().__init__(app)
+        self.app = app
+        self.pager = pager
+        self.loading = False
+        self.closed = False
+
+        # 选择模型：条目列表 + 按位置对齐的字节数组，避免每个条目一个控件
+        self.entries = []
+        self.titles_lower = []
+        self.selectable = bytearray() # 1 = 可选择 (未下载过)
+        self.selected = bytearray()   # 1 = 已选中
+        self.view = []                # 当前过滤结果 (entries 的下标)
+        self.filter_text = ""
+        self.top = 0                  # 第一个可见行对应 view 中的位置
+        self.anchor = None            # Shift 范围选择的起点 (view 中的位置)
+
+        self.title("选择要下载的视频")
+        self.geometry("500x640")
+        self.attributes("-topmost", True) # 置顶
+        self.grab_set() # 模态窗口
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        # 1. 标题
+        self.title_label = ctk.CTkLabel(self, text="⏳ 正在解析播放列表...", font=("Arial", 16, "bold"))
+        self.title_label.pack(pady=10)
+
+        # 2. 底部按钮 (关键：先 Pack 底部按钮，确保窗口缩小时按钮不被遮挡)
+        ctk.CTkButton(
+            self,
+            text="确认下载 (Confirm Download)",
+            command=self.confirm,
+            height=50
+        ).pack(side="bottom", fill="x", padx=20, pady=10)
+
+        self.load_more_btn = ctk.CTkButton(
+            self,
+            text="加载更多 (Load More)",
+            command=self.load_more,
+            height=35,
+            fg_color="#5D6D7E", hover_color="#34495E"
+        )
+        self.load_more_btn.pack(side="bottom", fill="x", padx=20)
+
+        # 3. 过滤框 + 全选开关 (放在列表上方)
+        self.filter_var = ctk.StringVar()
+        self.filter_var.trace_add("write", lambda *_: self._schedule_filter())
+        self._filter_job = None
+        ctk.CTkEntry(self, textvariable=self.filter_var, placeholder_text="按标题过滤 (Filter)").pack(fill="x", padx=10, pady=(0, 5))
+
+        self.select_all_var = ctk.BooleanVar(value=True)
+        ctk.CTkSwitch(self, text="全选 (Select All)", variable=self.select_all_var, command=self.toggle_all).pack(pady=5)
+        ctk.CTkLabel(self, text="提示：按住 Shift 点击可范围选择", font=ctk.CTkFont(size=11), text_color="gray").pack()
+
+        # 4. 列表区域 (固定数量的行控件 + 滚动条，最后 Pack 占据剩余空间)
+        list_frame = ctk.CTkFrame(self)
+        list_frame.pack(side="top", fill="both", expand=True, padx=10, pady=(0, 5))
+        self.scrollbar = ctk.CTkScrollbar(list_frame, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        rows_frame = ctk.CTkFrame(list_frame, fg_color="transparent")
+        rows_frame.pack(side="left", fill="both", expand=True)
+
+        self.rows = []
+        for row in range(self.VISIBLE_ROWS):
+            chk = ctk.CTkCheckBox(rows_frame, text="", command=lambda row=row: self.on_row_click(row))
+            chk.pack(anchor="w", pady=2, padx=5)
+            chk.bind("<Shift-Button-1>", lambda e, row=row: self.on_row_shift_click(row))
+            self.rows.append(chk)
+        for widget in [rows_frame] + self.rows:
+            widget.bind("<MouseWheel>", self.on_mousewheel)
+            widget.bind("<Button-4>", lambda e: self.scroll_by(-3))
+            widget.bind("<Button-5>", lambda e: self.scroll_by(3))
+
+        self.render()
+        self.load_more()
+
+    def load_more(self):
+        """在后台线程加载下一页"""
+        if self.loading or not self.pager.has_more:
+            return
+        self.loading = True
+        self.load_more_btn.configure(state="disabled", text="⏳ 正在加载...")
+        threading.Thread(target=self._load_thread, daemon=True).start()
+
+    def _load_thread(self):
+        try:
+            page_entries = self.pager.fetch_next(lambda chunk: self._call_in_ui(self.add_entries, chunk))
+            self.app.log_message(f"✅ 已加载第 {self.pager.page} 页，本页 {len(page_entries)} 个视频。")
+            self._call_in_ui(self._on_page_loaded)
+        except Exception as e:
+            self.app.log_message(f"❌ 解析失败: {str(e)}")
+            self._call_in_ui(self._on_page_loaded, True)
+
+    def _call_in_ui(self, func, *args):
+        if not self.closed:
+            self.after(0, lambda: func(*args))
+
+    def _on_page_loaded(self, error=False):
+        self.loading = False
+        if self.closed:
+            return
+        if not self.pager.is_playlist:
+            # 不是播放列表，直接下载原链接
+            self.closed = True
+            self.destroy()
+            self.app.log_message("⚠️ 未找到视频或解析失败，尝试直接下载...")
+            self.app.current_download_urls = [self.pager.url]
+            self.app.start_download_process()
+            return
+        if error and not self.entries:
+            self.cancel()
+            return
+
+        self.update_title()
+        if self.pager.has_more:
+            self.load_more_btn.configure(state="normal", text=f"加载更多 (下 {self.pager.page_size} 个)")
+        else:
+            self.load_more_btn.configure(state="disabled", text="已全部加载")
+
+    def add_entries(self, entries):
+        """追加一批条目 (主线程，只在新条目可见时重绘)"""
+        if self.closed:
+            return
+        select = 1 if self.select_all_var.get() else 0 # 跟随全选开关
+        for entry in entries:
+            index = len(self.entries)
+            can_select = 0 if self.app.engine.archive.contains(video_key_from_entry(entry)) else 1
+            self.entries.append(entry)
+            self.titles_lower.append(entry['title'].lower())
+            self.selectable.append(can_select)
+            self.selected.append(select & can_select)
+            if self.filter_text in self.titles_lower[index]:
+                self.view.append(index)
+        self.render()
+        self.update_title()
+
+    def update_title(self):
+        total = len(self.entries)
+        text = f"请选择视频 (已选 {self.selected.count(1)} / 已加载 {total} 个)"
+        if self.filter_text:
+            text += f" · 匹配 {len(self.view)}"
+        self.title_label.configure(text=text)
+
+    # --- 渲染与滚动 ---
+    def render(self):
+        """只刷新可见的行控件"""
+        self.top = max(0, min(self.top, len(self.view) - self.VISIBLE_ROWS))
+        for row, chk in enumerate(self.rows):
+            pos = self.top + row
+            if pos >= len(self.view):
+                chk.configure(text="", state="disabled")
+                chk.deselect()
+                continue
+            index = self.view[pos]
+            title = self.entries[index]['title']
+            if self.selectable[index]:
+                chk.configure(text=f"{index + 1}. {title}", state="normal")
+            else:
+                # 已下载过的视频置灰且不选中
+                chk.configure(text=f"{index + 1}. ✔ (已下载) {title}", state="disabled")
+            if self.selected[index]:
+                chk.select()
+            else:
+                chk.deselect()
+
+        count = len(self.view)
+        if count <= self.VISIBLE_ROWS:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.top / count, (self.top + self.VISIBLE_ROWS) / count)
+
+    def scroll_by(self, rows):
+        self.top += rows
+        self.render()
+
+    def on_mousewheel(self, event):
+        self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.view))
+            self.render()
+        elif args[0] == "scroll":
+            step = self.VISIBLE_ROWS if args[2] == "pages" else 1
+            self.scroll_by(int(args[1]) * step)
+
+    # --- 选择 ---
+    def on_row_click(self, row):
+        pos = self.top + row
+        if pos >= len(self.view):
+            return
+        index = self.view[pos]
+        self.selected[index] = 1 if self.rows[row].get() else 0
+        self.anchor = pos
+        self.update_title()
+
+    def on_row_shift_click(self, row):
+        """把锚点到当前行之间的条目设为锚点的选中状态"""
+        pos = self.top + row
+        if pos >= len(self.view):
+            return "break"
+        if self.anchor is None or self.anchor >= len(self.view) or self.anchor == pos:
+            # 没有起点时相当于普通点击
+            self.anchor = pos
+            value = not self.selected[self.view[pos]]
+        else:
+            value = self.selected[self.view[self.anchor]]
+        for p in range(min(self.anchor, pos), max(self.anchor, pos) + 1):
+            index = self.view[p]
+            self.selected[index] = 1 if value and self.selectable[index] else 0
+        self.render()
+        self.update_title()
+        return "break"
+
+    def toggle_all(self):
+        """全选/全不选 (作用于当前过滤结果)"""
+        new_state = self.select_all_var.get()
+        if not self.filter_text:
+            self.selected[:] = self.selectable if new_state else bytes(len(self.selected))
+        else:
+            for index in self.view:
+                self.selected[index] = self.selectable[index] if new_state else 0
+        self.render()
+        self.update_title()
+
+    # --- 过滤 ---
+    def _schedule_filter(self):
+        # 输入时防抖，停顿 150ms 后再过滤
+        if self._filter_job:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(150, self.apply_filter)
+
+    def apply_filter(self):
+        self._filter_job = None
+        text = self.filter_var.get().strip().lower()
+        if text == self.filter_text:
+            return
+        if self.filter_text and text.startswith(self.filter_text):
+            # 增量过滤：新关键字更长时只需在当前结果中筛选
+            candidates = self.view
+        else:
+            candidates = range(len(self.entries))
+        self.view = [index for index in candidates if text in self.titles_lower[index]]
+        self.filter_text = text
+        self.top = 0
+        self.anchor = None
+        self.render()
+        self.update_title()
+
+    def confirm(self):
+        selected_urls = [entry['url'] for entry, flag in zip(self.entries, self.selected) if flag]
+
+        if not selected_urls:
+            messagebox.showwarning("提示", "请至少选择一个视频！")
+            return
+
+        self.closed = True
+        self.destroy()
+        self.app.log_message(f"📝 用户已选择 {len(selected_urls)} 个视频，开始任务...")
+        self.app.current_download_urls = selected_urls
+        self.app.start_download_process()
+
+    def cancel(self):
+        """关闭窗口且不下载"""
+        self.closed = True
+        self.destroy()
+        self.app.log_message("ℹ️ 已取消选择。")
+        self.app.set_ui_state(processing=False)
+
+class BulkImportDialog(ctk.CTkToplevel):
+    """批量导入窗口：粘贴多行链接，或从 txt/csv 文件、剪贴板读取"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.title("批量导入链接")
+        self.geometry("560x480")
+        self.attributes("-topmost", True)
+        self.grab_set()
+
+        ctk.CTkLabel(self, text="每行一个链接 (也可以直接粘贴表格内容，自动识别其中的链接)",
+                     font=ctk.CTkFont(size=13)).pack(anchor="w", padx=15, pady=(15, 5))
+
+        # 底部按钮先 Pack，保证窗口缩小时不被遮挡
+        ctk.CTkButton(self, text="开始导入并下载", command=self.confirm, height=45).pack(
+            side="bottom", fill="x", padx=15, pady=(5, 15))
+        button_row = ctk.CTkFrame(self, fg_color="transparent")
+        button_row.pack(side="bottom", fill="x", padx=15)
+        ctk.CTkButton(button_row, text="从文件导入...", command=self.load_file,
+                      fg_color="#5D6D7E", hover_color="#34495E").pack(side="left", expand=True, fill="x", padx=(0, 5))
+        ctk.CTkButton(button_row, text="粘贴剪贴板", command=self.paste_clipboard,
+                      fg_color="#5D6D7E", hover_color="#34495E").pack(side="left", expand=True, fill="x", padx=(5, 0))
+        self.summary_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=12), text_color="gray")
+        self.summary_label.pack(side="bottom", anchor="w", padx=15, pady=5)
+
+        self.textbox = ctk.CTkTextbox(self, font=("Consolas", 12))
+        self.textbox.pack(fill="both", expand=True, padx=15)
+        self.textbox.bind("<KeyRelease>", lambda e: self._schedule_summary())
+        self._summary_job = None
+
+    def _schedule_summary(self):
+        # 输入停顿后再统计，避免每次按键都解析整段文本
+        if self._summary_job:
+            self.after_cancel(self._summary_job)
+        self._summary_job = self.after(300, self.update_summary)
+
+    def update_summary(self):
+        self._summary_job = None
+        result = ingest.parse_text(self.textbox.get("1.0", "end"))
+        text = f"识别到 {len(result.videos)} 个视频，{len(result.collections)} 个播放列表/频道"
+        if result.duplicates:
+            text += f"，{result.duplicates} 个重复"
+        if result.invalid:
+            text += f"，{len(result.invalid)} 行无法识别"
+        self.summary_label.configure(text=text)
+        return result
+
+    def append_text(self, text):
+        current = self.textbox.get("1.0", "end").strip()
+        self.textbox.insert("end", ("\n" if current else "") + text.strip() + "\n")
+        self.update_summary()
+
+    def load_file(self):
+        path = filedialog.askopenfilename(parent=self, title="选择链接文件",
+                                          filetypes=[("链接列表", "*.txt *.csv"), ("所有文件", "*.*")])
+        if not path:
+            return
+        try:
+            self.append_text(ingest.read_file(path))
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("错误", f"无法读取文件：{e}", parent=self)
+
+    def paste_clipboard(self):
+        try:
+            self.append_text(self.clipboard_get())
+        except Exception:
+            messagebox.showwarning("提示", "剪贴板中没有文本。", parent=self)
+
+    def confirm(self):
+        result = self.update_summary()
+        if not result.items:
+            messagebox.showwarning("提示", "没有识别到有效的链接。", parent=self)
+            return
+        self.destroy()
+        self.app.start_bulk_import(result)
+
+class YouTubeDownloader(ctk.CTk):
+    """YouTube 下载器主窗口类"""
+    
+    def __init__(self):
+        super().__init__()
+        
+        # 窗口基本配置
+        self.title("Universal Video Downloader (YouTube & Bilibili)")
+        self.geometry("700x830")
+        
+        # 状态控制变量
+        self.is_downloading = False
+        self.is_paused = False
+        self.current_download_urls = [] # 当前待下载的 URL 列表
+        self.export_stop = None # 正在导出语料时的停止信号
+        self.current_app_state = "idle" # idle, downloading, paused
+        self.job_status = {} # job_id -> 最新进度 (只显示正在下载的任务)
+        self.engine = DownloadEngine(on_idle=self.on_scheduler_idle) # 下载引擎 (调度、重试、下载记录)
+        # 存储位置 (config.json 中的 output_dir / temp_dir / subfolder 为默认值)
+        output_dir, temp_dir, subfolder = self.engine.configured_storage()
+        self.output_dir = output_dir or get_app_path()
+        self.temp_dir = temp_dir or ''
+        self.default_subfolder = subfolder if subfolder in SUBFOLDER_LABELS.values() else 'none'
+        
+        # 初始化 UI
+        self.setup_ui()
+        self.after(UI_TICK_MS, self.drain_events)
+        self.after(500, self.offer_restore) # 上次关闭/崩溃时未完成的任务
+        
+    def setup_ui(self):
+        """设置用户界面"""
+        
+        # 配置 grid 布局权重
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        # 主容器
+        main_frame = ctk.CTkFrame(self, fg_color="transparent")
+        main_frame.grid(row=0, column=0, sticky="nsew", padx=30, pady=30)
+        
+        # 标题
+        title_label = ctk.CTkLabel(
+            main_frame,
+            text="🎬 Universal Video Downloader",
+            font=ctk.CTkFont(size=26, weight="bold")
+        )
+        title_label.pack(pady=(0, 20))
+        
+        # URL 输入框
+        url_label = ctk.CTkLabel(main_frame, text="视频/播放列表链接：", font=ctk.CTkFont(size=14))
+        url_label.pack(anchor="w", pady=(5, 5))
+        
+        url_row = ctk.CTkFrame(main_frame, fg_color="transparent")
+        url_row.pack(fill="x", pady=(0, 15))
+        self.bulk_btn = ctk.CTkButton(
+            url_row,
+            text="批量导入",
+            command=self.open_bulk_import,
+            width=90,
+            height=40,
+            fg_color="#5D6D7E", hover_color="#34495E"
+        )
+        self.bulk_btn.pack(side="right", padx=(10, 0))
+        self.url_entry = ctk.CTkEntry(
+            url_row,
+            placeholder_text="请在此粘贴 YouTube 链接 (支持播放列表、频道)",
+            height=40,
+            font=ctk.CTkFont(size=13)
+        )
+        self.url_entry.pack(side="left", fill="x", expand=True)
+        
+        # 画质选择
+        quality_label = ctk.CTkLabel(main_frame, text="视频画质：", font=ctk.CTkFont(size=14))
+        quality_label.pack(anchor="w", pady=(5, 5))
+        
+        self.quality_combo = ctk.CTkComboBox(
+            main_frame,
+            values=list(QUALITY_LABELS),
+            state="readonly",
+            height=35,
+            font=ctk.CTkFont(size=13)
+        )
+        self.quality_combo.set("最高画质 (4K/8K)")
+        self.quality_combo.pack(fill="x", pady=(0, 15))
+        
+        # 字幕选项
+        subtitle_label = ctk.CTkLabel(main_frame, text="字幕设置：", font=ctk.CTkFont(size=14))
+        subtitle_label.pack(anchor="w", pady=(5, 5))
+
+        self.subtitle_menu = ctk.CTkOptionMenu(
+            main_frame,
+            values=list(SUBTITLE_LABELS),
+            font=ctk.CTkFont(size=13)
+        )
+        self.subtitle_menu.set('不下载 (None)')
+        self.subtitle_menu.pack(fill="x", pady=(0, 10))
+
+        # 下载内容 (仅字幕/仅元数据时不下载音视频，结果写入语料库)
+        content_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        content_frame.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(content_frame, text="下载内容：", font=ctk.CTkFont(size=14)).pack(side="left")
+        self.content_menu = ctk.CTkOptionMenu(
+            content_frame,
+            values=list(CONTENT_LABELS),
+            width=240,
+            font=ctk.CTkFont(size=13)
+        )
+        self.content_menu.set(next(iter(CONTENT_LABELS)))
+        self.content_menu.pack(side="left", padx=(10, 0))
+
+        # 网络线路 (IPv4 / IPv6 / 代理)
+        network_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        network_frame.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(network_frame, text="网络线路：", font=ctk.CTkFont(size=14)).pack(side="left")
+        self.network_menu = ctk.CTkOptionMenu(
+            network_frame,
+            values=list(NETWORK_LABELS),
+            width=240,
+            font=ctk.CTkFont(size=13)
+        )
+        self.network_menu.set(next(iter(NETWORK_LABELS)))
+        self.network_menu.pack(side="left", padx=(10, 0))
+
+        # 保存位置和子文件夹 (临时目录在 config.json 中设置)
+        storage_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        storage_frame.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(storage_frame, text="保存位置：", font=ctk.CTkFont(size=14)).pack(side="left")
+        self.output_btn = ctk.CTkButton(
+            storage_frame,
+            text=self.output_dir,
+            command=self.choose_output_dir,
+            width=240,
+            fg_color="#5D6D7E", hover_color="#34495E"
+        )
+        self.output_btn.pack(side="left", padx=(10, 0))
+        self.subfolder_menu = ctk.CTkOptionMenu(
+            storage_frame,
+            values=list(SUBFOLDER_LABELS),
+            width=120,
+            font=ctk.CTkFont(size=13)
+        )
+        self.subfolder_menu.set(next(label for label, key in SUBFOLDER_LABELS.items() if key == self.default_subfolder))
+        self.subfolder_menu.pack(side="left", padx=(10, 0))
+
+        # 分段多连接下载 (大文件拆成多个字节范围并行下载)
+        segments_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        segments_frame.pack(fill="x", pady=(0, 10))
+        self.segments_switch = ctk.CTkSwitch(
+            segments_frame,
+            text="分段多连接下载",
+            font=ctk.CTkFont(size=13)
+        )
+        self.segments_switch.pack(side="left")
+        ctk.CTkLabel(segments_frame, text="连接数：", font=ctk.CTkFont(size=13)).pack(side="left", padx=(15, 0))
+        self.segments_menu = ctk.CTkOptionMenu(segments_frame, values=["4", "8", "16"], width=70)
+        self.segments_menu.set("8")
+        self.segments_menu.pack(side="left", padx=(5, 0))
+        ctk.CTkLabel(segments_frame, text="每主机上限：", font=ctk.CTkFont(size=13)).pack(side="left", padx=(15, 0))
+        self.host_limit_menu = ctk.CTkOptionMenu(segments_frame, values=["4", "8", "16", "32"], width=70)
+        self.host_limit_menu.set(str(DEFAULT_MAX_CONNECTIONS_PER_HOST))
+        self.host_limit_menu.pack(side="left", padx=(5, 0))
+
+        # 视频+音频的合并方式
+        merge_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        merge_frame.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(merge_frame, text="合并方式：", font=ctk.CTkFont(size=14)).pack(side="left")
+        self.merge_menu = ctk.CTkOptionMenu(
+            merge_frame,
+            values=list(MERGE_LABELS),
+            width=240,
+            font=ctk.CTkFont(size=13)
+        )
+        self.merge_menu.set(next(iter(MERGE_LABELS)))
+        self.merge_menu.pack(side="left", padx=(10, 0))
+
+        # 并行下载数
+        workers_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        workers_frame.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(workers_frame, text="并行下载数：", font=ctk.CTkFont(size=14)).pack(side="left")
+        self.workers_menu = ctk.CTkOptionMenu(
+            workers_frame,
+            values=["1", "2", "3", "4", "6", "8"],
+            width=80,
+            font=ctk.CTkFont(size=13)
+        )
+        self.workers_menu.set("3")
+        self.workers_menu.pack(side="left", padx=(10, 0))
+
+        # 限速 (下载过程中也可修改，立即生效；默认值来自 config.json)
+        self.rate_labels = dict(RATE_LABELS)
+        rate_limit, job_rate_limit = self.engine.configured_rate_limits()
+        for rate in (rate_limit, job_rate_limit):
+            if rate not in self.rate_labels.values():
+                self.rate_labels[format_rate(rate)] = rate
+        rate_names = {rate: label for label, rate in self.rate_labels.items()}
+
+        rate_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        rate_frame.pack(fill="x", pady=(0, 20))
+        ctk.CTkLabel(rate_frame, text="总限速：", font=ctk.CTkFont(size=14)).pack(side="left")
+        self.rate_menu = ctk.CTkOptionMenu(
+            rate_frame,
+            values=list(self.rate_labels),
+            width=110,
+            font=ctk.CTkFont(size=13),
+            command=lambda _: self.apply_rate_limits()
+        )
+        self.rate_menu.set(rate_names[rate_limit])
+        self.rate_menu.pack(side="left", padx=(10, 0))
+        ctk.CTkLabel(rate_frame, text="单任务：", font=ctk.CTkFont(size=14)).pack(side="left", padx=(20, 0))
+        self.job_rate_menu = ctk.CTkOptionMenu(
+            rate_frame,
+            values=list(self.rate_labels),
+            width=110,
+            font=ctk.CTkFont(size=13),
+            command=lambda _: self.apply_rate_limits()
+        )
+        self.job_rate_menu.set(rate_names[job_rate_limit])
+        self.job_rate_menu.pack(side="left", padx=(10, 0))
+        
+        # --- 底部按钮区域 (Footer) ---
+        # 关键修改：先 Pack 底部容器，确保它固定在底部
+        self.footer_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        self.footer_frame.pack(side="bottom", fill="x", pady=(10, 0))
+
+        # 解析/下载按钮 (默认显示)
+        self.parse_btn = ctk.CTkButton(
+            self.footer_frame,
+            text="解析并下载",
+            command=self.on_parse_click,
+            height=50,
+            font=ctk.CTkFont(size=16, weight="bold"),
+            corner_radius=10
+        )
+        self.parse_btn.pack(fill="x")
+
+        # 暂停/继续 按钮 (默认隐藏)
+        self.pause_btn = ctk.CTkButton(
+            self.footer_frame,
+            text="⏸️ 暂停下载",
+            command=self.pause_download,
+            fg_color="#D35400", hover_color="#A04000",
+            height=40
+        )
+        # self.pause_btn.pack(...) managed by set_ui_state
+
+        self.resume_btn = ctk.CTkButton(
+            self.footer_frame,
+            text="▶️ 继续下载",
+            command=self.resume_download,
+            fg_color="#27AE60", hover_color="#1E8449",
+            state="disabled",
+            height=40
+        )
+        # self.resume_btn.pack(...) managed by set_ui_state
+
+        # 打开文件夹按钮
+        self.open_dir_btn = ctk.CTkButton(
+            self.footer_frame,
+            text="📂 打开下载位置 (Open Folder)",
+            command=lambda: os.startfile(self.output_dir),
+            height=35,
+            fg_color="#5D6D7E", hover_color="#34495E"
+        )
+        self.open_dir_btn.pack(fill="x", pady=(5, 0))
+
+        # --- 日志区域 (填充剩余空间) ---
+        log_label = ctk.CTkLabel(main_frame, text="实时日志/进度：", font=ctk.CTkFont(size=14))
+        log_label.pack(anchor="w", pady=(5, 5))
+
+        # 每个正在下载的任务一行最新进度
+        self.status_label = ctk.CTkLabel(
+            main_frame,
+            text="",
+            justify="left",
+            anchor="w",
+            font=ctk.CTkFont(size=12, family="Consolas")
+        )
+        self.status_label.pack(fill="x")
+        
+        self.log_textbox = ctk.CTkTextbox(
+            main_frame,
+            height=150,
+            font=ctk.CTkFont(size=12, family="Consolas"),
+            wrap="word"
+        )
+        self.log_textbox.pack(fill="both", expand=True)
+        self.log_textbox.insert("1.0", "等待任务...\n")
+        self.log_textbox.configure(state="disabled")
+
+    def log_message(self, message):
+        """线程安全的日志记录 (放入事件队列，由界面定时刷新)"""
+        self.engine.log(message)
+
+    def drain_events(self):
+        """定时取出事件队列：一次性追加日志，并刷新每个任务的最新进度"""
+        try:
+            logs, progress = self.engine.events.drain()
+            if logs:
+                self.log_textbox.configure(state="normal")
+                self.log_textbox.insert("end", "".join(f"{line}\n" for line in logs))
+                # 环形缓冲：超过上限时删除最早的行
+                line_count = int(self.log_textbox.index("end-1c").split(".")[0])
+                if line_count > LOG_MAX_LINES:
+                    self.log_textbox.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
+                self.log_textbox.see("end")
+                self.log_textbox.configure(state="disabled")
+
+            if progress:
+                for job_id, status in progress.items():
+                    if status is None:
+                        self.job_status.pop(job_id, None)
+                    else:
+                        self.job_status[job_id] = status
+                self.status_label.configure(text="\n".join(
+                    self.format_status(job_id, status) for job_id, status in sorted(self.job_status.items())))
+        finally:
+            self.after(UI_TICK_MS, self.drain_events)
+
+    def format_status(self, job_id, status):
+        """把进度事件格式化为一行文字"""
+        scheduler = self.engine.scheduler
+        return format_status(job_id, len(scheduler.jobs) if scheduler else '?', status)
+
+    def on_parse_click(self):
+        """点击解析按钮"""
+        if self.is_downloading:
+            return
+            
+        text = self.url_entry.get().strip()
+        if not text:
+            messagebox.showerror("错误", "请输入有效的 YouTube 链接！")
+            return
+
+        result = ingest.parse_text(text)
+        if not result.items:
+            messagebox.showerror("错误", "未识别到有效的链接！")
+            return
+        if len(result.items) > 1:
+            # 一次粘贴了多个链接
+            self.start_bulk_import(result)
+            return
+
+        self.clear_log()
+        item = result.items[0]
+        if item.kind != ingest.KIND_VIDEO:
+            kind = "频道" if item.kind == ingest.KIND_CHANNEL else "播放列表"
+            self.log_message(f"📋 检测到{kind}，正在解析 (每页 {PLAYLIST_PAGE_SIZE} 个视频)...")
+            self.set_ui_state(processing=True)
+            self.open_selection_window(item.url)
+        else:
+            self.log_message("🎥 检测到单视频，准备下载...")
+            self.current_download_urls = [item.url]
+            self.start_download_process()
+
+    def clear_log(self):
+        self.log_textbox.configure(state="normal")
+        self.log_textbox.delete("1.0", "end")
+        self.log_textbox.configure(state="disabled")
+        self.job_status.clear()
+        self.status_label.configure(text="")
+
+    def open_bulk_import(self):
+        if not self.is_downloading:
+            BulkImportDialog(self)
+
+    def start_bulk_import(self, result):
+        """批量导入：后台并发展开播放列表/频道并预解析视频，完成后全部排队下载"""
+        self.clear_log()
+        summary = f"📥 批量导入：{len(result.videos)} 个视频，{len(result.collections)} 个播放列表/频道"
+        if result.duplicates:
+            summary += f"，忽略 {result.duplicates} 个重复链接"
+        self.log_message(summary)
+        for line in result.invalid[:20]:
+            self.log_message(f"⚠️ 无法识别: {line}")
+        self.set_ui_state(processing=True)
+        options = self.get_download_options() # 在主线程读取控件状态
+
+        def worker():
+            try:
+                urls, failed = ingest.ingest(
+                    result,
+                    expand=lambda url: expand_playlist(url, self.engine.playlist_cache, info_cache=self.engine.info_cache,
+                                                       collections=self.engine.collections),
+                    prefetch=lambda url: self.engine.prefetch_info(url, options),
+                    on_progress=self.log_message,
+                )
+            except Exception as e:
+                self.log_message(f"❌ 批量导入失败: {str(e)}")
+                self.after(0, lambda: self.set_ui_state(downloading=False))
+                return
+            for url, error in failed:
+                self.log_message(f"❌ 跳过 {url}: {error}")
+            self.after(0, lambda: self._on_bulk_ready(urls))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_bulk_ready(self, urls):
+        if not urls:
+            self.log_message("⚠️ 没有可下载的视频。")
+            self.set_ui_state(downloading=False)
+            return
+        self.current_download_urls = urls
+        self.start_download_process()
+
+    def open_selection_window(self, url):
+        """打开播放列表选择窗口 (窗口自行分页加载条目)"""
+        pager = PlaylistPager(url, self.engine.playlist_cache, info_cache=self.engine.info_cache,
+                              collections=self.engine.collections)
+        PlaylistSelectionWindow(self, pager)
+
+    def start_download_process(self):
+        """启动下载流程 (设置 UI 并把任务交给下载引擎)"""
+        self.is_paused = False
+        self.set_ui_state(downloading=True)
+
+        content = CONTENT_LABELS[self.content_menu.get()]
+        if content:
+            self.start_export(content, self.get_download_options())
+            return
+
+        try:
+            # 在主线程读取控件状态，工作线程只使用这份配置
+            jobs = self.engine.start(self.current_download_urls, self.get_download_options())
+        except Exception as e:
+            self.log_message(f"❌ 发生错误: {str(e)}")
+            self.set_ui_state(downloading=False)
+            return
+
+        if not jobs:
+            self.log_message("🎉 所有视频均已下载过。")
+            self.set_ui_state(downloading=False)
+
+    def start_export(self, content, options):
+        """仅字幕/仅元数据：在后台线程中导出到程序目录下的语料库 (暂停按钮用于停止导出)"""
+        urls = list(self.current_download_urls)
+        path = default_corpus_path(options.output_dir, content, CORPUS_JSONL)
+        self.export_stop = threading.Event()
+        stop_event = self.export_stop
+
+        def worker():
+            failed = []
+            try:
+                corpus = open_corpus(CORPUS_JSONL, path)
+                try:
+                    exporter = CorpusExporter(self.engine, options, content=content)
+                    exported, failed = exporter.run(urls, corpus, stop_event)
+                finally:
+                    corpus.close()
+                self.engine.log(f"📄 已导出 {exported} 个视频: {path}")
+            except Exception as e:
+                self.engine.log(f"❌ 导出失败: {str(e)}")
+            self.export_stop = None
+            if failed:
+                self.after(0, lambda: messagebox.showwarning("完成", f"{len(failed)} 个视频导出失败，详情见日志。"))
+            self.after(0, lambda: self.set_ui_state(downloading=False))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def offer_restore(self):
+        """启动时询问是否继续上次未完成的任务 (不需要重新解析和选择)"""
+        pending = self.engine.store.count_unfinished()
+        if not pending:
+            return
+        if not messagebox.askyesno("继续下载", f"发现 {pending} 个上次未完成的下载任务，是否继续下载？"):
+            self.engine.store.discard_unfinished()
+            return
+
+        self.is_paused = False
+        self.set_ui_state(downloading=True)
+        try:
+            jobs = self.engine.restore_unfinished(self.get_download_options())
+        except Exception as e:
+            self.log_message(f"❌ 发生错误: {str(e)}")
+            self.set_ui_state(downloading=False)
+            return
+        if not jobs:
+            self.log_message("🎉 所有视频均已下载过。")
+            self.set_ui_state(downloading=False)
+
+    def get_download_options(self):
+        """把界面选项转换为引擎的 DownloadOptions"""
+        return DownloadOptions(
+            quality=QUALITY_LABELS[self.quality_combo.get()],
+            subtitles=SUBTITLE_LABELS[self.subtitle_menu.get()],
+            network=NETWORK_LABELS[self.network_menu.get()],
+            max_workers=int(self.workers_menu.get()),
+            output_dir=self.output_dir,
+            temp_dir=self.temp_dir,
+            subfolder=SUBFOLDER_LABELS[self.subfolder_menu.get()],
+            segments=int(self.segments_menu.get()) if self.segments_switch.get() else 0,
+            max_connections_per_host=int(self.host_limit_menu.get()),
+            merge_mode=MERGE_LABELS[self.merge_menu.get()],
+            rate_limit=self.rate_labels[self.rate_menu.get()],
+            job_rate_limit=self.rate_labels[self.job_rate_menu.get()],
+        )
+
+    def choose_output_dir(self):
+        """选择保存位置"""
+        path = filedialog.askdirectory(initialdir=self.output_dir, title="选择保存位置")
+        if path:
+            self.output_dir = os.path.abspath(path)
+            self.output_btn.configure(text=self.output_dir)
+
+    def apply_rate_limits(self):
+        """限速菜单变化：立即应用到正在下载的任务"""
+        self.engine.set_rate_limits(self.rate_labels[self.rate_menu.get()],
+                                    self.rate_labels[self.job_rate_menu.get()])
+        if self.is_downloading:
+            self.log_message(f"🚦 限速已调整：总 {self.rate_menu.get()}，单任务 {self.job_rate_menu.get()}")
+
+    def set_ui_state(self, processing=False, downloading=False, paused=False):
+        """统一管理 UI 状态"""
+        # 恢复状态
+        if not processing and not downloading:
+            self.parse_btn.configure(state="normal", text="解析并下载")
+            # 恢复大按钮显示
+            self.pause_btn.pack_forget()
+            self.resume_btn.pack_forget()
+            self.parse_btn.pack(fill="x")
+            self.url_entry.configure(state="normal")
+            self.bulk_btn.configure(state="normal")
+            self.quality_combo.configure(state="normal")
+            self.subtitle_menu.configure(state="normal")
+            self.content_menu.configure(state="normal")
+            self.network_menu.configure(state="normal")
+            self.output_btn.configure(state="normal")
+            self.subfolder_menu.configure(state="normal")
+            self.segments_switch.configure(state="normal")
+            self.segments_menu.configure(state="normal")
+            self.host_limit_menu.configure(state="normal")
+            self.merge_menu.configure(state="normal")
+            self.workers_menu.configure(state="normal")
+            self.is_downloading = False
+            return
+
+        # 正在处理/下载
+        # 正在处理/下载
+        self.is_downloading = True
+        
+        # 隐藏大按钮
+        self.parse_btn.pack_forget() 
+        
+        # 显示控制按钮 (在 Footer 中并排显示)
+        self.pause_btn.pack(side="left", padx=5, fill="x", expand=True)
+        self.resume_btn.pack(side="right", padx=5, fill="x", expand=True)
+        
+        self.url_entry.configure(state="disabled")
+        self.bulk_btn.configure(state="disabled")
+        self.quality_combo.configure(state="disabled")
+        self.subtitle_menu.configure(state="disabled")
+        self.content_menu.configure(state="disabled")
+        self.network_menu.configure(state="disabled")
+        self.output_btn.configure(state="disabled")
+        self.subfolder_menu.configure(state="disabled")
+        self.segments_switch.configure(state="disabled")
+        self.segments_menu.configure(state="disabled")
+        self.host_limit_menu.configure(state="disabled")
+        self.merge_menu.configure(state="disabled")
+        self.workers_menu.configure(state="disabled")
+        
+        if paused:
+            self.pause_btn.configure(state="disabled", fg_color="gray")
+            self.resume_btn.configure(state="normal", fg_color="#27AE60")
+        else:
+            self.pause_btn.configure(state="normal", text="⏸️ 暂停下载", fg_color="#D35400")
+            self.resume_btn.configure(state="disabled", fg_color="gray")
+
+    def pause_download(self):
+        """暂停动作"""
+        if self.export_stop is not None:
+            self.log_message("🛑 正在停止导出... (已导出的视频会保留)")
+            self.export_stop.set()
+            self.pause_btn.configure(state="disabled", fg_color="gray")
+            return
+        if self.is_downloading and not self.is_paused and self.engine.scheduler:
+            self.log_message("⏸️ 正在请求暂停... (将在当前分片完成后停止)")
+            self.engine.pause()
+            self.is_paused = True
+            self.set_ui_state(downloading=True, paused=True)
+
+    def resume_download(self):
+        """继续动作"""
+        if self.is_paused and self.engine.scheduler:
+            self.log_message("▶️ 正在恢复下载...")
+            self.is_paused = False
+            self.set_ui_state(downloading=True)
+            self.engine.resume()
+
+    def on_scheduler_idle(self, jobs):
+        """一批任务全部结束或暂停 (在工作线程中调用，日志由引擎输出)"""
+        if any(job.state == JOB_PAUSED for job in jobs):
+            # 不需要恢复 UI 到 idle，因为它现在处于 paused 状态 (由 set_ui_state(paused=True) 处理)
+            return
+
+        failed = [job for job in jobs if job.state == JOB_FAILED]
+        if failed:
+            self.after(0, lambda: messagebox.showwarning("完成", f"{len(failed)} 个任务下载失败，详情见日志。"))
+        else:
+            self.after(0, lambda: messagebox.showinfo("成功", "所有下载任务已完成！"))
+        self.after(0, lambda: self.set_ui_state(downloading=False)) # 恢复初始状态
+
+def main():
+    app = YouTubeDownloader()
+    app.mainloop()
@@ -0,0 +1,203 @@
+"""
+批量导入链接 (不依赖界面)
+- 从粘贴的多行文本、txt/csv 文件或剪贴板内容中找出链接 (以及单独的 Bilibili BV 号)
+- 规范化 youtu.be / shorts / live / embed / watch?v= / m. / music. 以及 Bilibili 视频链接，按视频 ID 去重
+- 按链接结构识别单视频、播放列表和频道 (不再用 "list=" 子串判断)
+- 并发展开播放列表/频道，并发预解析视频信息 (写入 InfoCache，下载时直接复用)
+"""
+
+import csv
+import io
+import re
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import yt_dlp
+
+from engine import archive_key, video_key_from_url
+
+INGEST_WORKERS = 8 # 并发解析的线程数
+
+KIND_VIDEO = 'video'
+KIND_PLAYLIST = 'playlist'
+KIND_CHANNEL = 'channel'
+
+URL_RE = re.compile(r'https?://[^\s<>"\'，。、；]+', re.IGNORECASE)
+BV_RE = re.compile(r'(?<![\w/])(BV[0-9A-Za-z]{10})(?![\w])')
+YOUTUBE_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+YOUTUBE_HOSTS = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com', 'youtube-nocookie.com',
+                 'www.youtube-nocookie.com')
+CHANNEL_TABS = ('videos', 'shorts', 'streams', 'playlists', 'featured', 'live')
+
+@dataclass
+class IngestItem:
+    url: str    # 规范化后的链接
+    key: str    # 去重用的键 (单视频与下载记录的归档键一致)
+    kind: str   # KIND_VIDEO / KIND_PLAYLIST / KIND_CHANNEL
+
+@dataclass
+class IngestResult:
+    items: List[IngestItem] = field(default_factory=list)
+    duplicates: int = 0
+    invalid: List[str] = field(default_factory=list)
+
+    @property
+    def videos(self):
+        return [item for item in self.items if item.kind == KIND_VIDEO]
+
+    @property
+    def collections(self):
+        """需要展开的播放列表和频道"""
+        return [item for item in self.items if item.kind != KIND_VIDEO]
+
+def youtube_video(video_id):
+    return IngestItem(f"https://www.youtube.com/watch?v={video_id}",
+                      archive_key('Youtube', video_id), KIND_VIDEO)
+
+def classify_url(url) -> Optional[IngestItem]:
+    """规范化单个链接；无法识别为链接时返回 None"""
+    url = url.strip().rstrip('.,;)]}>')
+    if BV_RE.fullmatch(url):
+        url = f"https://www.bilibili.com/video/{url}"
+    if not re.match(r'https?://', url, re.IGNORECASE):
+        return None
+    parsed = urllib.parse.urlparse(url)
+    host = (parsed.hostname or '').lower()
+    path = parsed.path.rstrip('/')
+    query = urllib.parse.parse_qs(parsed.query)
+
+    if host in ('youtu.be', 'www.youtu.be'):
+        video_id = path.lstrip('/').split('/')[0]
+        if YOUTUBE_ID_RE.match(video_id):
+            if query.get('list'):
+                return classify_url(f"https://www.youtube.com/watch?v={video_id}&list={query['list'][0]}")
+            return youtube_video(video_id)
+    elif host in YOUTUBE_HOSTS:
+        parts = path.lstrip('/').split('/')
+        list_id = (query.get('list') or [None])[0]
+        # 自动生成的合辑 (RD...) 没有固定内容，按单视频处理
+        if list_id and not list_id.startswith('RD') and parts[0] in ('watch', 'playlist'):
+            return IngestItem(f"https://www.youtube.com/playlist?list={list_id}", f"playlist:{list_id}", KIND_PLAYLIST)
+        if parts[0] == 'watch' and query.get('v') and YOUTUBE_ID_RE.match(query['v'][0]):
+            return youtube_video(query['v'][0])
+        if parts[0] in ('shorts', 'live', 'embed', 'v') and len(parts) > 1 and YOUTUBE_ID_RE.match(parts[1]):
+            return youtube_video(parts[1])
+        if parts[0].startswith('@') or (parts[0] in ('channel', 'c', 'user') and len(parts) > 1):
+            # @handle 不区分大小写；channel/UC... 的频道 ID 区分大小写，原样保留
+            base = [parts[0].lower()] if parts[0].startswith('@') else parts[:2]
+            tab = parts[len(base)] if len(parts) > len(base) and parts[len(base)] in CHANNEL_TABS else 'videos'
+            channel_url = f"https://www.youtube.com/{'/'.join(base)}/{tab}"
+            return IngestItem(channel_url, channel_url, KIND_CHANNEL)
+    elif host.endswith('bilibili.com'):
+        match = re.search(r'/video/(BV[0-9A-Za-z]{10})', path)
+        if match:
+            page = (query.get('p') or ['1'])[0]
+            # 多 P 视频的其他分 P 单独下载
+            video_url = f"https://www.bilibili.com/video/{match.group(1)}" + (f"?p={page}" if page != '1' else '')
+            return IngestItem(video_url, video_key_from_url(video_url) or video_url, KIND_VIDEO)
+        if host == 'space.bilibili.com' and path.lstrip('/').split('/')[0].isdigit():
+            channel_url = f"https://space.bilibili.com/{path.lstrip('/').split('/')[0]}/video"
+            return IngestItem(channel_url, channel_url, KIND_CHANNEL)
+
+    # 其他网站：交给 yt_dlp 的提取器识别；能推断出视频 ID 时按 ID 去重
+    return IngestItem(url, video_key_from_url(url) or url, KIND_VIDEO)
+
+def find_urls(text):
+    """从任意文本中找出链接和单独的 BV 号 (保持出现顺序)"""
+    found = []
+    for line in text.splitlines():
+        if line.lstrip().startswith('#'):
+            continue # 注释行
+        urls = URL_RE.findall(line)
+        found.extend(urls)
+        remainder = URL_RE.sub(' ', line)
+        found.extend(BV_RE.findall(remainder))
+    return found
+
+def parse_text(text) -> IngestResult:
+    """解析粘贴的文本，返回去重后的条目"""
+    result = IngestResult()
+    seen = set()
+    for raw in find_urls(text):
+        item = classify_url(raw)
+        if item is None:
+            result.invalid.append(raw)
+            continue
+        if item.key in seen:
+            result.duplicates += 1
+            continue
+        seen.add(item.key)
+        result.items.append(item)
+    # 整行都不像链接的非空内容也算无效，方便用户发现拼写错误 (csv 文件由 read_file 只保留含链接的单元格)
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#') and not URL_RE.search(line) and not BV_RE.search(line):
+            result.invalid.append(line)
+    return result
+
+def read_file(path):
+    """读取 txt/csv 文件，返回可交给 parse_text 的文本"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        content = f.read()
+    if path.lower().endswith('.csv'):
+        # 每个单元格单独一行，表头和其他列里的文字不会被当成链接
+        rows = csv.reader(io.StringIO(content))
+        return '\n'.join(cell for row in rows for cell in row if URL_RE.search(cell) or BV_RE.search(cell))
+    return content
+
+def ingest(result, expand, prefetch=None, workers=INGEST_WORKERS, on_progress=None):
+    """并发展开播放列表/频道，并发预解析单个视频
+    - expand(url) -> [视频链接]
+    - prefetch(url) -> 标题 (解析结果由调用者缓存)；为 None 时不预解析
+    - on_progress(message) 报告进度 (在工作线程中调用)
+    返回 (按原顺序去重后的视频链接, [(链接, 错误)])"""
+    report = on_progress or (lambda message: None)
+    failed = []
+    expanded = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(expand, item.url): item for item in result.collections}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                expanded[item.key] = future.result()
+                report(f"📋 {item.url}: {len(expanded[item.key])} 个视频")
+            except Exception as e:
+                failed.append((item.url, str(e)))
+                report(f"❌ 无法展开 {item.url}: {e}")
+
+        # 按原顺序合并，并按视频 ID 再去重一次 (播放列表之间、与单独粘贴的视频之间可能重复)
+        urls = []
+        seen = set()
+        for item in result.items:
+            candidates = [item.url] if item.kind == KIND_VIDEO else expanded.get(item.key, [])
+            for url in candidates:
+                video = classify_url(url)
+                key = video.key if video else url
+                if key not in seen:
+                    seen.add(key)
+                    urls.append(video.url if video else url)
+
+        if prefetch is None or not urls:
+            return urls, failed
+
+        ok = set(urls)
+        done = 0
+        futures = {pool.submit(prefetch, url): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            done += 1
+            try:
+                future.result()
+            except yt_dlp.utils.DownloadError as e:
+                cause = e.exc_info[1] if e.exc_info else None
+                if isinstance(cause, yt_dlp.utils.ExtractorError) and cause.expected:
+                    ok.discard(url) # 视频不存在/私有等，不必排队
+                    failed.append((url, str(e)))
+            except Exception:
+                pass # 其他错误留给下载时的重试处理
+            if done % 10 == 0 or done == len(futures):
+                report(f"🔎 已解析 {done}/{len(futures)} 个视频")
+    return [url for url in urls if url in ok], failed
@@ -0,0 +1,110 @@
+"""
+持久化的下载队列 (SQLite，WAL 模式)
+每个任务一行：链接、下载选项、状态、错误、重试次数和 .part 文件路径。
+每次状态变化都是一条 UPDATE 语句的事务，程序崩溃或断电后最多丢失正在写的那一次更新；
+下次启动时把未完成的任务 (排队中/下载中/已暂停/后处理中) 读出来继续下载。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+UNFINISHED_STATES = ('queued', 'running', 'paused', 'processing')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    options TEXT NOT NULL,
+    state TEXT NOT NULL,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    tmpfilename TEXT,
+    downloaded_bytes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+class JobStore:
+    """下载任务表 (线程安全：所有工作线程共用一个连接，由锁串行化)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL") # WAL 下 NORMAL 仍保证崩溃后数据库一致
+        self._conn.executescript(SCHEMA)
+
+    def add(self, url, options, state='queued'):
+        """记录一个新任务，返回任务行 ID；options 为可 JSON 序列化的字典"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (url, options, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (url, json.dumps(options, ensure_ascii=False), state, now, now))
+            return cursor.lastrowid
+
+    def update(self, store_id, **fields):
+        """原子地更新一个任务的若干字段 (state / error / attempts / tmpfilename / downloaded_bytes)"""
+        if store_id is None or not fields:
+            return
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns}, updated_at = ? WHERE id = ?",
+                               (*fields.values(), time.time(), store_id))
+
+    def transition(self, store_id, from_states, to_state):
+        """只有当前状态属于 from_states 时才改为 to_state，返回是否成功"""
+        placeholders = ', '.join('?' * len(from_states))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET state = ?, updated_at = ? WHERE id = ? AND state IN ({placeholders})",
+                (to_state, time.time(), store_id, *from_states))
+            return cursor.rowcount == 1
+
+    def remove(self, store_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (store_id,))
+
+    def unfinished(self):
+        """返回未完成的任务 (按加入顺序)，每项为字典，options 已解析"""
+        placeholders = ', '.join('?' * len(UNFINISHED_STATES))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE state IN ({placeholders}) ORDER BY id", UNFINISHED_STATES).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            try:
+                job['options'] = json.loads(job['options'])
+            except ValueError:
+                job['options'] = {}
+            jobs.append(job)
+        return jobs
+
+    def count_unfinished(self):
+        placeholders = ', '.join('?' * len(UNFINISHED_STATES))
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE state IN ({placeholders})", UNFINISHED_STATES).fetchone()[0]
+
+    def discard_unfinished(self):
+        """放弃上次未完成的任务 (用户选择不恢复时)"""
+        placeholders = ', '.join('?' * len(UNFINISHED_STATES))
+        with self._lock:
+            self._conn.execute(f"DELETE FROM jobs WHERE state IN ({placeholders})", UNFINISHED_STATES)
+
+    def purge_finished(self):
+        """删除已结束 (失败) 的旧记录；完成的任务在完成时即已删除，由下载记录负责"""
+        placeholders = ', '.join('?' * len(UNFINISHED_STATES))
+        with self._lock:
+            self._conn.execute(f"DELETE FROM jobs WHERE state NOT IN ({placeholders})", UNFINISHED_STATES)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
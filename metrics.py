@@ -0,0 +1,279 @@
+"""
+下载指标 (不依赖界面)
+- MetricsRecorder: 记录每个任务的解析耗时、首字节时间、吞吐量采样、重试次数和原因、后处理耗时、写入字节数，
+  任务结束时以 JSON Lines 追加到文件，并汇总成 Prometheus 文本格式的计数器
+- MetricsServer: 在本机端口上提供 /metrics (可选)
+- Profiler: 可选的 cProfile 采样，按任务收集，结束时合并输出 .prof 和文字摘要
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_INTERVAL = 1.0      # 吞吐量采样间隔 (秒)
+MAX_SAMPLES = 600          # 每个任务最多保留的采样数 (超出后两两合并)
+PROFILE_TOP_LINES = 40     # 文字摘要中列出的函数数
+
+class JobMetrics:
+    """单个任务的指标"""
+
+    def __init__(self, job_id, url):
+        self.job_id = job_id
+        self.url = url
+        self.started_at = time.time()
+        self.state = None
+        self.error = None
+        self.extract_seconds = 0.0
+        self.extract_cached = 0     # 复用缓存解析结果的次数
+        self.extractions = 0        # 实际联网解析的次数
+        self.download_started = None
+        self.ttfb_seconds = None    # 开始下载到收到第一块数据
+        self.samples = []           # [(距开始的秒数, 已下载字节, 速度)]，多路流时为各路之和
+        self.streams = {}           # 临时文件名 -> (已下载字节, 速度)
+        self.last_sample = 0.0
+        self.retries = []           # [{'attempt', 'reason', 'delay'}]
+        self.postprocess = {}       # 后处理器名 -> 累计秒数
+        self.postprocess_started = {}
+        self.bytes_downloaded = 0   # 各路流下载完成的字节数
+        self.bytes_written = 0      # 最终文件大小
+
+    def to_record(self):
+        finished_at = time.time()
+        return {
+            'job_id': self.job_id,
+            'url': self.url,
+            'state': self.state,
+            'error': self.error,
+            'started_at': round(self.started_at, 3),
+            'total_seconds': round(finished_at - self.started_at, 3),
+            'extract_seconds': round(self.extract_seconds, 3),
+            'extractions': self.extractions,
+            'extract_cached': self.extract_cached,
+            'ttfb_seconds': None if self.ttfb_seconds is None else round(self.ttfb_seconds, 3),
+            'retries': self.retries,
+            'postprocess_seconds': {name: round(seconds, 3) for name, seconds in self.postprocess.items()},
+            'bytes_downloaded': self.bytes_downloaded,
+            'bytes_written': self.bytes_written,
+            'throughput': [[round(t, 1), downloaded, speed and round(speed)] for t, downloaded, speed in self.samples],
+        }
+
+class MetricsRecorder:
+    """收集所有任务的指标 (线程安全，由下载引擎在工作线程中调用)"""
+
+    def __init__(self, path=None):
+        self.path = path # JSON Lines 输出文件，None 表示只保留汇总计数
+        self._lock = threading.Lock()
+        self._jobs = {}
+        # 汇总计数 (Prometheus)
+        self.jobs_total = {}
+        self.retries_total = {}
+        self.bytes_total = 0
+        self.extract_seconds_total = 0.0
+        self.extractions_total = 0
+        self.extract_cache_hits_total = 0
+        self.ttfb_seconds_total = 0.0
+        self.ttfb_count = 0
+        self.postprocess_seconds_total = {}
+
+    def _job(self, job):
+        metrics = self._jobs.get(job.job_id)
+        if metrics is None or metrics.url != job.url:
+            metrics = self._jobs[job.job_id] = JobMetrics(job.job_id, job.url)
+        return metrics
+
+    def job_started(self, job):
+        with self._lock:
+            self._job(job)
+
+    def extraction(self, job, seconds, cached=False):
+        with self._lock:
+            metrics = self._job(job)
+            if cached:
+                metrics.extract_cached += 1
+                self.extract_cache_hits_total += 1
+            else:
+                metrics.extractions += 1
+                metrics.extract_seconds += seconds
+                self.extractions_total += 1
+                self.extract_seconds_total += seconds
+
+    def download_started(self, job):
+        with self._lock:
+            metrics = self._job(job)
+            metrics.download_started = time.time()
+
+    def progress(self, job, d):
+        """yt_dlp 进度回调：首字节时间、吞吐量采样、已下载字节"""
+        now = time.time()
+        with self._lock:
+            metrics = self._job(job)
+            if d['status'] == 'finished':
+                metrics.bytes_downloaded += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                return
+            if d['status'] != 'downloading':
+                return
+            if metrics.ttfb_seconds is None and d.get('downloaded_bytes'):
+                metrics.ttfb_seconds = now - (metrics.download_started or metrics.started_at)
+                self.ttfb_seconds_total += metrics.ttfb_seconds
+                self.ttfb_count += 1
+            stream = d.get('tmpfilename') or d.get('filename')
+            metrics.streams[stream] = (d.get('downloaded_bytes') or 0, d.get('speed') or 0)
+            if now - metrics.last_sample >= SAMPLE_INTERVAL:
+                metrics.last_sample = now
+                metrics.samples.append((now - metrics.started_at,
+                                        sum(downloaded for downloaded, _ in metrics.streams.values()),
+                                        sum(speed for _, speed in metrics.streams.values())))
+                if len(metrics.samples) > MAX_SAMPLES:
+                    metrics.samples = metrics.samples[::2]
+
+    def postprocessor(self, job, d):
+        """yt_dlp 后处理回调：按后处理器累计耗时 (合并、转码等)"""
+        name = d.get('postprocessor') or 'unknown'
+        now = time.time()
+        with self._lock:
+            metrics = self._job(job)
+            if d['status'] == 'started':
+                metrics.postprocess_started[name] = now
+            elif d['status'] == 'finished' and name in metrics.postprocess_started:
+                seconds = now - metrics.postprocess_started.pop(name)
+                metrics.postprocess[name] = metrics.postprocess.get(name, 0.0) + seconds
+                self.postprocess_seconds_total[name] = self.postprocess_seconds_total.get(name, 0.0) + seconds
+
+    def retry(self, job, attempt, error, delay):
+        reason = type(error).__name__
+        with self._lock:
+            self._job(job).retries.append({'attempt': attempt, 'reason': reason,
+                                           'message': str(error)[:300], 'delay': round(delay, 1)})
+            self.retries_total[reason] = self.retries_total.get(reason, 0) + 1
+
+    def bytes_written(self, job, nbytes):
+        with self._lock:
+            self._job(job).bytes_written += nbytes
+            self.bytes_total += nbytes
+
+    def job_finished(self, job):
+        """任务结束 (完成/失败/暂停)：写出一行 JSON"""
+        with self._lock:
+            metrics = self._jobs.pop(job.job_id, None)
+            if metrics is None:
+                return
+            metrics.state = job.state
+            metrics.error = job.error
+            self.jobs_total[job.state] = self.jobs_total.get(job.state, 0) + 1
+            record = metrics.to_record()
+            if not self.path:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            except OSError as e:
+                print(f"Metrics write failed: {e}")
+
+    def prometheus_text(self):
+        """Prometheus 文本格式的汇总指标"""
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+        with self._lock:
+            lines = [
+                '# TYPE downloader_jobs_total counter',
+                *(f'downloader_jobs_total{{state="{escape(state)}"}} {count}' for state, count in self.jobs_total.items()),
+                '# TYPE downloader_jobs_active gauge',
+                f'downloader_jobs_active {len(self._jobs)}',
+                '# TYPE downloader_retries_total counter',
+                *(f'downloader_retries_total{{reason="{escape(reason)}"}} {count}' for reason, count in self.retries_total.items()),
+                '# TYPE downloader_bytes_written_total counter',
+                f'downloader_bytes_written_total {self.bytes_total}',
+                '# TYPE downloader_extract_seconds summary',
+                f'downloader_extract_seconds_sum {self.extract_seconds_total:.3f}',
+                f'downloader_extract_seconds_count {self.extractions_total}',
+                '# TYPE downloader_extract_cache_hits_total counter',
+                f'downloader_extract_cache_hits_total {self.extract_cache_hits_total}',
+                '# TYPE downloader_ttfb_seconds summary',
+                f'downloader_ttfb_seconds_sum {self.ttfb_seconds_total:.3f}',
+                f'downloader_ttfb_seconds_count {self.ttfb_count}',
+                '# TYPE downloader_postprocess_seconds_total counter',
+                *(f'downloader_postprocess_seconds_total{{postprocessor="{escape(name)}"}} {seconds:.3f}'
+                  for name, seconds in self.postprocess_seconds_total.items()),
+                '# TYPE downloader_download_speed_bytes gauge',
+                *(f'downloader_download_speed_bytes{{job="{metrics.job_id}"}} {metrics.samples[-1][2] or 0:.0f}'
+                  for metrics in self._jobs.values() if metrics.samples),
+            ]
+        return '\n'.join(lines) + '\n'
+
+class MetricsServer:
+    """在本机提供 GET /metrics (Prometheus 抓取格式)"""
+
+    def __init__(self, recorder, port, host='127.0.0.1'):
+        recorder_ref = recorder
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = recorder_ref.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # 不在控制台刷屏
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class Profiler:
+    """可选的性能剖析：用 cProfile (墙钟时间) 记录每个任务的调用，dump() 时合并输出
+    Python 3.12+ 同一时间只能有一个 cProfile 生效，并行任务中其余任务不会被剖析"""
+
+    def __init__(self, path):
+        self.path = path # .prof 文件；同名 .txt 为按累计时间排序的摘要
+        self._lock = threading.Lock()
+        self._profiles = []
+
+    def run(self, func, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError: # 已有其他剖析器在运行
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def dump(self):
+        """合并已收集的剖析数据写入文件，返回摘要文件路径 (没有数据时返回 None)"""
+        with self._lock:
+            profiles, self._profiles = self._profiles, []
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        stats.dump_stats(self.path)
+        summary = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP_LINES)
+        summary_path = os.path.splitext(self.path)[0] + '.txt'
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        return summary_path
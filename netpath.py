@@ -0,0 +1,366 @@
+"""
+自适应网络线路 (不依赖界面)
+- 候选线路：直连 IPv4、直连 IPv6，以及配置的每个代理
+- PathSelector: 根据实际下载速度 (以及可选的主动测速) 为每个任务选择最快且健康的线路，
+  连接失败的线路暂时冷却，统计结果保存到磁盘，重启后继续使用
+- ThroughputMonitor: 统计单个任务最近一段时间的下载速度，低于阈值时由下载引擎切换线路
+- DnsCache: yt_dlp 建立连接时使用的 DNS 解析缓存，所有任务和线路复用解析结果 (不影响进程中的其他代码)
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+
+import yt_dlp
+import yt_dlp.networking._helper
+from yt_dlp.networking import Request
+
+NETWORK_AUTO = 'auto'   # 自动选择线路，速度过低时切换
+NETWORK_IPV4 = 'ipv4'   # 强制 IPv4 (原来的默认行为)
+NETWORK_IPV6 = 'ipv6'   # 强制 IPv6
+NETWORK_MODES = (NETWORK_AUTO, NETWORK_IPV4, NETWORK_IPV6)
+
+DNS_CACHE_TTL = 300             # DNS 解析结果缓存时间 (秒)
+SPEED_SMOOTHING = 0.3           # 线路速度的指数平滑系数 (越大越看重最近的测量)
+SWITCH_WINDOW = 15.0            # 统计任务速度的时间窗口 (秒)
+MAX_PATH_SWITCHES = 3           # 每个任务最多切换线路的次数 (避免来回切换)
+DEFAULT_MIN_SPEED = 200 * 1024  # 默认速度阈值 (字节/秒)，低于它且有更快的线路时切换
+SWITCH_MARGIN = 2.0             # 其他线路的速度至少是当前速度的这么多倍才切换
+PATH_RETRIES = 3                # 自动线路时在同一条线路上的重试次数，之后交给下载引擎换线路
+FAILURE_COOLDOWN = 30           # 连接失败后线路的冷却时间 (秒)，连续失败时翻倍
+MAX_FAILURE_COOLDOWN = 600
+PROBE_BYTES = 1024 * 1024       # 主动测速下载的字节数
+PROBE_INTERVAL = 600            # 主动测速的间隔 (秒)
+STATS_MAX_AGE = 24 * 3600       # 超过这个时间的速度测量不再可信 (重新探索)
+
+class _CachedSocketModule:
+    """yt_dlp 建立连接时看到的 socket 模块：只有 getaddrinfo 经过缓存，其余属性原样转发"""
+
+    def __init__(self, getaddrinfo):
+        self.getaddrinfo = getaddrinfo
+
+    def __getattr__(self, name):
+        return getattr(socket, name)
+
+class DnsCache:
+    """缓存 yt_dlp 连接时 socket.getaddrinfo 的结果 (所有任务共享，线程安全)；解析失败不缓存
+    只替换 yt_dlp 建立连接的函数使用的 socket 模块，界面和其他库仍然直接解析"""
+
+    def __init__(self, ttl=DNS_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._original = None
+
+    def install(self):
+        with self._lock:
+            if self._original is not None:
+                return
+            self._original = socket.getaddrinfo
+            yt_dlp.networking._helper.socket = _CachedSocketModule(self.getaddrinfo)
+
+    def getaddrinfo(self, host, port, *args, **kwargs):
+        key = (host, port, args, tuple(sorted(kwargs.items())))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return list(entry[1])
+        result = self._original(host, port, *args, **kwargs)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, result)
+        return list(result)
+
+    def clear(self):
+        """线路连接失败时调用：缓存的地址可能已失效 (不知道是哪个主机的地址，全部重新解析)"""
+        with self._lock:
+            self._entries.clear()
+
+DNS_CACHE = DnsCache()
+
+class NetworkPath:
+    """一条线路：直连 IPv4 / IPv6，或某个代理"""
+
+    def __init__(self, name, family=None, proxy=None):
+        self.name = name
+        self.family = family # NETWORK_IPV4 / NETWORK_IPV6 / None (由代理决定)
+        self.proxy = proxy
+
+    def ydl_params(self, failover=False):
+        """覆盖到 yt_dlp 配置中的网络参数 (直连时显式关闭环境变量中的代理)
+        failover: 还有其他线路可换时限制重试次数，线路不通时尽快失败，由下载引擎换一条线路，
+        而不是在同一条线路上无限重试；只有一条线路时保留 yt_dlp 原来的重试设置"""
+        params = {
+            'proxy': self.proxy or '',
+            'force_ipv4': self.family == NETWORK_IPV4,
+            'force_ipv6': self.family == NETWORK_IPV6,
+        }
+        if failover:
+            params.update(retries=PATH_RETRIES, fragment_retries=PATH_RETRIES)
+        return params
+
+    def __repr__(self):
+        return f"NetworkPath({self.name!r})"
+
+def build_paths(network_config=None, proxy=None):
+    """根据 config.json 的 network 配置生成候选线路：
+    {"direct": ["ipv4", "ipv6"], "proxies": ["socks5://127.0.0.1:1080"]}
+    proxy 为下载选项中的代理 (默认来自 http_proxy 环境变量)，同样作为一条候选线路"""
+    config = network_config or {}
+    paths = []
+    for family in config.get('direct', [NETWORK_IPV4, NETWORK_IPV6]):
+        if family not in (NETWORK_IPV4, NETWORK_IPV6):
+            raise ValueError(f"未知的直连线路: {family}")
+        paths.append(NetworkPath(family, family=family))
+    proxies = [proxy] + list(config.get('proxies') or [])
+    for url in dict.fromkeys(url for url in proxies if url):
+        paths.append(NetworkPath(f"proxy:{url}", proxy=url))
+    if not paths:
+        raise ValueError("没有可用的网络线路")
+    return paths
+
+class PathStats:
+    """一条线路的测量结果"""
+
+    def __init__(self):
+        self.speed = None       # 平滑后的下载速度 (字节/秒)，None 表示尚未测量
+        self.measured_at = 0.0
+        self.failures = 0       # 连续失败次数
+        self.cooldown_until = 0.0
+        self.active = 0         # 正在使用这条线路的任务数
+
+    def to_dict(self):
+        return {'speed': self.speed, 'measured_at': self.measured_at, 'failures': self.failures,
+                'cooldown_until': self.cooldown_until}
+
+class PathSelector:
+    """为任务选择线路 (所有任务共享，线程安全)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.paths = [NetworkPath(NETWORK_IPV4, family=NETWORK_IPV4)]
+        self._stats = {}
+        self.state_path = None
+        self.min_speed = DEFAULT_MIN_SPEED
+        self.probe_url = None
+        self._probed_at = 0.0
+
+    def configure(self, paths, min_speed=None, probe_url=None, state_path=None):
+        """设置候选线路 (保留同名线路的统计)"""
+        with self._lock:
+            self.paths = list(paths)
+            if min_speed is not None:
+                self.min_speed = min_speed
+            if probe_url is not None:
+                self.probe_url = probe_url or None
+            if state_path is not None and state_path != self.state_path:
+                self.state_path = state_path
+                self._load_locked()
+
+    def _stats_locked(self, path):
+        stats = self._stats.get(path.name)
+        if stats is None:
+            stats = self._stats[path.name] = PathStats()
+        return stats
+
+    def choose(self, exclude=()):
+        """选择线路：优先尝试从未用过的线路，其余按速度选最快的；失败过且从未测出速度的线路排在最后，
+        全部在冷却时选最早恢复的"""
+        now = time.time()
+        with self._lock:
+            candidates = [path for path in self.paths if path.name not in exclude] or list(self.paths)
+            healthy = [path for path in candidates if self._stats_locked(path).cooldown_until <= now]
+            if not healthy:
+                return min(candidates, key=lambda path: self._stats_locked(path).cooldown_until)
+            unknown = [path for path in healthy if self._is_unknown(self._stats_locked(path), now)]
+            if unknown:
+                # 探索：同时开始的任务分散到不同的未测线路上
+                return min(unknown, key=lambda path: self._stats_locked(path).active)
+            measured = [path for path in healthy if self._is_measured(self._stats_locked(path), now)]
+            if measured:
+                return max(measured, key=lambda path: (self._stats_locked(path).speed,
+                                                       -self._stats_locked(path).active))
+            # 只剩失败过的线路 (冷却已结束)：选失败次数最少的再试一次
+            return min(healthy, key=lambda path: self._stats_locked(path).failures)
+
+    @staticmethod
+    def _is_measured(stats, now):
+        return stats.speed is not None and now - stats.measured_at < STATS_MAX_AGE
+
+    @classmethod
+    def _is_unknown(cls, stats, now):
+        """尚未测量且没有失败记录 (值得探索)；失败过却从未测出速度的线路视为测量结果很差"""
+        return not cls._is_measured(stats, now) and not stats.failures
+
+    def acquire(self, path):
+        """任务开始使用线路 (未测线路的探索按使用数分散)"""
+        with self._lock:
+            self._stats_locked(path).active += 1
+
+    def release(self, path):
+        with self._lock:
+            stats = self._stats_locked(path)
+            stats.active = max(0, stats.active - 1)
+
+    def report_speed(self, path, speed):
+        """记录一次速度测量 (下载中的窗口速度、完成时的平均速度或主动测速)"""
+        with self._lock:
+            stats = self._stats_locked(path)
+            if stats.speed is None or time.time() - stats.measured_at >= STATS_MAX_AGE:
+                stats.speed = speed
+            else:
+                stats.speed = SPEED_SMOOTHING * speed + (1 - SPEED_SMOOTHING) * stats.speed
+            stats.measured_at = time.time()
+            stats.failures = 0
+            stats.cooldown_until = 0.0
+
+    def report_failure(self, path):
+        """连接失败：线路进入冷却，连续失败时冷却时间翻倍"""
+        with self._lock:
+            stats = self._stats_locked(path)
+            stats.failures += 1
+            cooldown = min(MAX_FAILURE_COOLDOWN, FAILURE_COOLDOWN * 2 ** (stats.failures - 1))
+            stats.cooldown_until = time.time() + cooldown
+        self.save()
+
+    def alternative(self, path, speed):
+        """当前线路只有 speed 字节/秒时，返回明显更快 (或尚未测量) 的健康线路，没有则返回 None"""
+        now = time.time()
+        with self._lock:
+            best = None
+            for other in self.paths:
+                stats = self._stats_locked(other)
+                if other.name == path.name or stats.cooldown_until > now:
+                    continue
+                if self._is_unknown(stats, now):
+                    return other
+                if not self._is_measured(stats, now):
+                    continue # 失败过且没有速度记录
+                if stats.speed >= speed * SWITCH_MARGIN and (best is None or stats.speed > best[1]):
+                    best = (other, stats.speed)
+            return best[0] if best else None
+
+    def describe(self):
+        """各线路的状态 (日志用)"""
+        now = time.time()
+        with self._lock:
+            parts = []
+            for path in self.paths:
+                stats = self._stats_locked(path)
+                if stats.cooldown_until > now:
+                    parts.append(f"{path.name}: 冷却中")
+                elif self._is_measured(stats, now):
+                    parts.append(f"{path.name}: {stats.speed / 1024 / 1024:.2f} MB/s")
+                elif stats.failures:
+                    parts.append(f"{path.name}: 连接失败 {stats.failures} 次")
+                else:
+                    parts.append(f"{path.name}: 未测速")
+            return ', '.join(parts)
+
+    def needs_probe(self):
+        return bool(self.probe_url) and time.time() - self._probed_at >= PROBE_INTERVAL
+
+    def probe(self, base_params=None):
+        """主动测速：通过每条线路下载 probe_url 的前 PROBE_BYTES 字节 (各线路并发)"""
+        if not self.probe_url:
+            return
+        self._probed_at = time.time()
+        threads = [threading.Thread(target=self._probe_path, args=(path, base_params or {}), daemon=True)
+                   for path in list(self.paths)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.save()
+
+    def _probe_path(self, path, base_params):
+        params = {**base_params, **path.ydl_params(), 'quiet': True, 'no_warnings': True}
+        started = time.time()
+        received = 0
+        try:
+            with yt_dlp.YoutubeDL(params) as ydl:
+                response = ydl.urlopen(Request(self.probe_url, headers={'Range': f'bytes=0-{PROBE_BYTES - 1}'}))
+                while received < PROBE_BYTES:
+                    chunk = response.read(64 * 1024)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                response.close()
+        except Exception:
+            self.report_failure(path)
+            return
+        elapsed = time.time() - started
+        if received and elapsed > 0:
+            self.report_speed(path, received / elapsed)
+
+    def _load_locked(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, data in saved.items():
+            stats = self._stats.setdefault(name, PathStats())
+            stats.speed = data.get('speed')
+            stats.measured_at = data.get('measured_at') or 0.0
+            stats.failures = data.get('failures') or 0
+            stats.cooldown_until = data.get('cooldown_until') or 0.0
+
+    def save(self):
+        """保存各线路的测量结果 (下次启动时直接使用，不必重新探索)"""
+        if not self.state_path:
+            return
+        with self._lock:
+            data = {name: stats.to_dict() for name, stats in self._stats.items()}
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Network path stats save failed: {e}")
+
+PATH_SELECTOR = PathSelector()
+
+class ThroughputMonitor:
+    """单个任务最近 SWITCH_WINDOW 秒的下载速度 (多路流时为各路之和，各路的进度回调可能同时到达)"""
+
+    def __init__(self, window=SWITCH_WINDOW):
+        self._lock = threading.Lock()
+        self.window = window
+        self.started = time.time()
+        self.streams = {}             # 临时文件名 -> 已下载字节
+        self.window_start = self.started
+        self.window_bytes = 0
+        self.total_bytes = 0
+
+    def update(self, stream, downloaded):
+        """记录进度；每满一个窗口返回这个窗口内的平均速度，否则返回 None"""
+        with self._lock:
+            return self._update_locked(stream, downloaded)
+
+    def _update_locked(self, stream, downloaded):
+        previous = self.streams.get(stream)
+        self.streams[stream] = downloaded
+        if previous is None and not self.total_bytes:
+            self.started = self.window_start = time.time() # 从收到数据开始计时 (不含解析和连接时间)
+        if previous is None or downloaded <= previous:
+            return None # 第一次回调只记录续传起点
+        self.window_bytes += downloaded - previous
+        self.total_bytes += downloaded - previous
+        now = time.time()
+        elapsed = now - self.window_start
+        if elapsed < self.window:
+            return None
+        speed = self.window_bytes / elapsed
+        self.window_start = now
+        self.window_bytes = 0
+        return speed
+
+    def average_speed(self):
+        with self._lock:
+            elapsed = time.time() - self.started
+            return self.total_bytes / elapsed if self.total_bytes and elapsed > 0 else None
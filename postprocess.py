@@ -0,0 +1,124 @@
+"""
+后处理池 (不依赖界面)
+下载线程只负责网络：下载完成后把合并、转封装、提取音频和字幕转换交给这里的工作线程
+(实际的编码工作在 ffmpeg 子进程中进行)，下载线程立即开始下一个视频。
+- 有界：排队和运行中的后处理任务达到上限时，提交会阻塞，下载线程不再取新任务
+- 磁盘背压：每个下载开始前按所选格式的大小预留空间；剩余空间扣除其他下载的预留和排队中的后处理
+  预计写入的字节数后低于下限时，新的下载先等待后处理释放空间，没有可等待的任务时直接报告空间不足
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import DiskSpaceError, disk_id, free_bytes
+
+DEFAULT_POSTPROCESS_WORKERS = max(2, min(4, os.cpu_count() or 2)) # 合并多为流复制，主要受磁盘限制
+POSTPROCESS_QUEUE_FACTOR = 2                  # 排队上限 = 工作线程数 × 这个倍数
+DEFAULT_MIN_FREE_BYTES = 64 * 1024 * 1024     # 下载和后处理之后至少保留的剩余空间 (更大的余量用 postprocess_min_free 开启)
+SPACE_POLL_SECONDS = 2.0                      # 等待空间时重新检查的间隔
+
+def by_disk(needs):
+    """{目录: 字节数} -> ({磁盘: 字节数}, {磁盘: 其中一个目录})"""
+    totals = {}
+    paths = {}
+    for path, needed in needs.items():
+        disk = disk_id(path)
+        totals[disk] = totals.get(disk, 0) + needed
+        paths.setdefault(disk, path)
+    return totals, paths
+
+class PostProcessPool:
+    """后处理工作线程池 (所有任务共享，线程安全)"""
+
+    def __init__(self, workers=DEFAULT_POSTPROCESS_WORKERS, min_free_bytes=DEFAULT_MIN_FREE_BYTES):
+        self.workers = max(1, int(workers))
+        self.min_free_bytes = min_free_bytes
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='postprocess')
+        self._cond = threading.Condition()
+        self._pending = 0        # 排队和运行中的任务数
+        self._pending_bytes = {} # 这些任务预计还要写入的字节数 (按磁盘)
+        self._reserved = {}      # 下载中的任务预留的字节数 (按磁盘)
+
+    def configure(self, workers=None, min_free_bytes=None):
+        """修改并行数 (新任务使用新的线程池，已提交的任务照常完成) 和空间下限"""
+        with self._cond:
+            if min_free_bytes is not None:
+                self.min_free_bytes = min_free_bytes
+            if workers is not None and max(1, int(workers)) != self.workers:
+                self.workers = max(1, int(workers))
+                old, self._executor = self._executor, ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='postprocess')
+                old.shutdown(wait=False)
+            self._cond.notify_all()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def submit(self, func, needs=None, stop_event=None):
+        """提交后处理任务，返回 Future；needs 为预计写入的字节数 {目录: 字节数}
+        队列已满时阻塞，stop_event 被设置时放弃并返回 None"""
+        pending_bytes, _ = by_disk(needs or {})
+        with self._cond:
+            while self._pending >= self.workers * POSTPROCESS_QUEUE_FACTOR:
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                self._cond.wait(SPACE_POLL_SECONDS)
+            self._pending += 1
+            for disk, needed in pending_bytes.items():
+                self._pending_bytes[disk] = self._pending_bytes.get(disk, 0) + needed
+            executor = self._executor
+
+        def run():
+            try:
+                return func()
+            finally:
+                with self._cond:
+                    self._pending -= 1
+                    for disk, needed in pending_bytes.items():
+                        self._pending_bytes[disk] -= needed
+                    self._cond.notify_all()
+
+        return executor.submit(run)
+
+    def reserve_space(self, needs, stop_event=None, on_wait=None):
+        """开始下载前为预计写入的字节数预留空间 (needs: {目录: 字节数})，返回交给 release_space 的预留记录。
+        空间不足时等待排队中的后处理或其他下载结束；没有可等待的任务时抛出 DiskSpaceError，
+        stop_event 被设置时返回 None。on_wait(目录, 需要的字节数, 可用字节数) 只在开始等待时调用一次"""
+        reservation, paths = by_disk(needs)
+
+        notified = False
+        with self._cond:
+            while True:
+                short = None
+                for disk, needed in reservation.items():
+                    free = (free_bytes(paths[disk]) - self._pending_bytes.get(disk, 0)
+                            - self._reserved.get(disk, 0))
+                    if free - needed < self.min_free_bytes:
+                        short = (paths[disk], needed, free)
+                        break
+                if short is None:
+                    for disk, needed in reservation.items():
+                        self._reserved[disk] = self._reserved.get(disk, 0) + needed
+                    return reservation
+                if not self._pending and not any(self._reserved.values()):
+                    raise DiskSpaceError(*short, self.min_free_bytes) # 等下去也不会有空间释放出来
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                if on_wait and not notified:
+                    notified = True
+                    on_wait(*short)
+                self._cond.wait(SPACE_POLL_SECONDS)
+
+    def release_space(self, reservation):
+        """下载结束 (完成、失败或暂停)：已写入的数据由剩余空间体现，不再需要预留"""
+        if not reservation:
+            return
+        with self._cond:
+            for disk, needed in reservation.items():
+                self._reserved[disk] -= needed
+            self._cond.notify_all()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,83 @@
+"""
+磁盘与存储位置 (不依赖界面)
+- 剩余空间查询、判断两个目录是否在同一磁盘
+- 识别磁盘已满的错误 (重试无济于事，任务直接失败)
+- 预分配文件：真正占用磁盘块，空间不足在下载开始时就会报错，而不是下载到一半
+- 原子移动：临时目录 -> 最终目录，跨磁盘时也不会在最终目录留下只复制了一半的文件
+"""
+
+import contextlib
+import errno
+import os
+import shutil
+
+from yt_dlp.utils import format_bytes
+
+MOVING_SUFFIX = '.moving' # 跨磁盘复制时在最终目录中使用的临时文件后缀
+DISK_FULL_MESSAGES = ('No space left on device', 'There is not enough space on the disk', f'[Errno {errno.ENOSPC}]')
+
+class DiskSpaceError(OSError):
+    """剩余空间不足以开始下载 (errno 为 ENOSPC，与写入时磁盘已满同样处理)"""
+
+    def __init__(self, path, needed, free, reserve):
+        super().__init__(errno.ENOSPC, f"磁盘空间不足: {path} 需要 {format_bytes(needed)}，"
+                                       f"可用 {format_bytes(max(0, free))} (保留 {format_bytes(reserve)})")
+        self.path = path
+
+def existing_parent(path):
+    """path 本身或最近的已存在的上级目录 (目录尚未创建时用来查询所在磁盘)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+def free_bytes(path):
+    """path 所在磁盘的剩余空间"""
+    return shutil.disk_usage(existing_parent(path)).free
+
+def disk_id(path):
+    """path 所在磁盘的标识 (同一磁盘内移动文件只需重命名)"""
+    return os.stat(existing_parent(path)).st_dev
+
+def is_disk_full_error(error):
+    """磁盘已满：写入失败或 ffmpeg 报告空间不足 (yt_dlp 的 DownloadError 只保留了错误信息)"""
+    exc_info = getattr(error, 'exc_info', None)
+    cause = exc_info[1] if exc_info and exc_info[1] else error
+    if isinstance(cause, OSError) and cause.errno == errno.ENOSPC:
+        return True
+    message = str(error)
+    return any(text in message for text in DISK_FULL_MESSAGES)
+
+def preallocate(f, size):
+    """把已打开的文件扩展到 size 字节并分配磁盘块 (不支持时退回到 truncate，生成稀疏文件)"""
+    f.flush()
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL):
+                raise # ENOSPC 等
+    if f.seek(0, os.SEEK_END) < size:
+        f.truncate(size) # Windows 的 NTFS 上会直接分配空间
+
+def move_file(src, dst):
+    """移动完成的文件：同一磁盘直接重命名；跨磁盘时先复制为最终目录中的临时文件，复制完成后再重命名"""
+    try:
+        os.replace(src, dst)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    temp = dst + MOVING_SUFFIX
+    try:
+        shutil.copy2(src, temp)
+        os.replace(temp, dst)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp)
+        raise
+    os.remove(src)
@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest
+from engine import DownloadArchive, InfoCache, video_key_from_url
+
+BV = 'BV1xx411c7mD'
+
+class ArchiveKeyTest(unittest.TestCase):
+    """下载前从链接推断的键必须与下载后从解析结果记录的键一致"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.archive = DownloadArchive(os.path.join(self.dir.name, 'download_archive.json'))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def download(self, video_id, extractor_key='BiliBili'):
+        """模拟 yt_dlp 下载完成后的 info"""
+        path = os.path.join(self.dir.name, f'{video_id}.mp4')
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        self.archive.add_info({'id': video_id, 'extractor_key': extractor_key, 'title': video_id,
+                               'requested_downloads': [{'filepath': path}]})
+
+    def assert_round_trip(self, url, extracted_id):
+        self.download(extracted_id)
+        key = video_key_from_url(url)
+        self.assertTrue(self.archive.contains(key), (url, key))
+        self.assertEqual(ingest.classify_url(url).key, key)
+        self.assertEqual(InfoCache.key_for(url), key)
+
+    def test_bilibili_video(self):
+        self.assert_round_trip(f'https://www.bilibili.com/video/{BV}', BV)
+
+    def test_bilibili_part(self):
+        self.assert_round_trip(f'https://www.bilibili.com/video/{BV}?p=2', f'{BV}_p2')
+        self.assertFalse(self.archive.contains(video_key_from_url(f'https://www.bilibili.com/video/{BV}')))
+
+    def test_bilibili_first_part_is_the_video(self):
+        # 带 ?p=1 解析出的 ID 是 BV..._p1，与不带分 P 的链接是同一个视频
+        self.assert_round_trip(f'https://www.bilibili.com/video/{BV}?p=1', f'{BV}_p1')
+        self.assertTrue(self.archive.contains(video_key_from_url(f'https://www.bilibili.com/video/{BV}')))
+
+    def test_youtube(self):
+        self.download('dQw4w9WgXcQ', 'Youtube')
+        for url in ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'https://youtu.be/dQw4w9WgXcQ'):
+            self.assertTrue(self.archive.contains(video_key_from_url(url)))
+            self.assertEqual(ingest.classify_url(url).key, video_key_from_url(url))
+
+    def test_old_archive_keys_are_normalized(self):
+        path = os.path.join(self.dir.name, 'old.json')
+        media = os.path.join(self.dir.name, 'old.mp4')
+        with open(media, 'wb') as f:
+            f.write(b'x')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({f'bilibili {BV}_p1': {'path': media}}, f)
+        archive = DownloadArchive(path)
+        self.assertTrue(archive.contains(video_key_from_url(f'https://www.bilibili.com/video/{BV}')))
+
+if __name__ == '__main__':
+    unittest.main()
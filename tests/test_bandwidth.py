@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import downloaders
+from downloaders import BandwidthLimiter, parse_rate, parse_rate_profiles
+
+class ParseRateTest(unittest.TestCase):
+
+    def test_values(self):
+        self.assertEqual(parse_rate('2M'), 2 * 1024 * 1024)
+        self.assertEqual(parse_rate('500K'), 500 * 1024)
+        self.assertEqual(parse_rate(1048576), 1048576)
+        for unlimited in (None, '', 0, '0'):
+            self.assertEqual(parse_rate(unlimited), 0)
+        with self.assertRaises(ValueError):
+            parse_rate('5Q')
+
+    def test_profiles(self):
+        profiles = parse_rate_profiles([{'from': '09:00', 'to': '18:30', 'limit': '1M'},
+                                        {'from': '23:00', 'to': '7', 'limit': 0}])
+        self.assertEqual(profiles, [(9 * 60, 18 * 60 + 30, 1024 * 1024), (23 * 60, 7 * 60, 0)])
+        self.assertEqual(parse_rate_profiles(None), [])
+
+class BandwidthLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.limiter = BandwidthLimiter()
+
+    def test_global_limit_is_split_between_active_jobs(self):
+        self.limiter.configure(global_limit='1M')
+        self.assertEqual(self.limiter.rate_for('a'), 1024 * 1024)
+        self.limiter.throttle('a', 1)
+        self.limiter.throttle('b', 1)
+        self.assertEqual(self.limiter.rate_for('a'), 512 * 1024)
+        # b 空闲超过窗口后，a 独享全局带宽
+        self.limiter._buckets['b']['active_at'] -= downloaders.BANDWIDTH_ACTIVE_WINDOW + 1
+        self.assertEqual(self.limiter.rate_for('a'), 1024 * 1024)
+        self.limiter.release('a')
+        self.assertNotIn('a', self.limiter._buckets)
+
+    def test_job_limit(self):
+        self.limiter.configure(global_limit='1M', job_limit='100K')
+        self.assertEqual(self.limiter.rate_for('a'), 100 * 1024)
+        self.limiter.configure(global_limit=0)
+        self.assertEqual(self.limiter.rate_for('a'), 100 * 1024)
+
+    def test_profile_overrides_global_limit(self):
+        self.limiter.configure(global_limit='1M', profiles=[(9 * 60, 18 * 60, 200 * 1024), (22 * 60, 6 * 60, 0)])
+        noon = time.struct_time((2026, 1, 1, 12, 0, 0, 3, 1, 0))
+        midnight = time.struct_time((2026, 1, 1, 23, 30, 0, 3, 1, 0))
+        evening = time.struct_time((2026, 1, 1, 20, 0, 0, 3, 1, 0))
+        with mock.patch.object(downloaders.time, 'localtime', return_value=noon):
+            self.assertEqual(self.limiter.current_global_limit(), 200 * 1024)
+        with mock.patch.object(downloaders.time, 'localtime', return_value=midnight):
+            self.assertEqual(self.limiter.current_global_limit(), 0) # 跨越午夜的时段
+        with mock.patch.object(downloaders.time, 'localtime', return_value=evening):
+            self.assertEqual(self.limiter.current_global_limit(), 1024 * 1024)
+
+    def test_throttle_waits_for_tokens(self):
+        self.limiter.configure(global_limit=100 * 1024)
+        started = time.monotonic()
+        self.limiter.throttle('a', 20 * 1024)
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+    def test_unlimited_does_not_wait(self):
+        started = time.monotonic()
+        self.limiter.throttle('a', 100 * 1024 * 1024)
+        self.assertLess(time.monotonic() - started, 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yt_dlp.utils import LazyList
+
+from engine import InfoCache
+
+URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+def video_info(**fields):
+    expire = int(time.time()) + 3600
+    return {'id': 'dQw4w9WgXcQ', 'extractor_key': 'Youtube', 'title': 'x',
+            'formats': [{'format_id': '18', 'url': f'https://example.com/v?expire={expire}', **fields}]}
+
+class InfoCacheTest(unittest.TestCase):
+    """缓存命中时 (重试、继续、下一批) 拿到的解析结果必须和第一次一样能用于下载"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = InfoCache(self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_live_objects_survive_in_memory(self):
+        fragments = lambda ctx: iter([{'url': 'https://example.com/1'}])
+        self.cache.put(URL, video_info(fragments=fragments, entries=LazyList(iter([1, 2]))))
+        fmt = self.cache.get(URL)['formats'][0]
+        self.assertIs(fmt['fragments'], fragments)
+        self.assertEqual(list(fmt['entries']), [1, 2])
+        # 无法写成 JSON，只留在内存中
+        self.assertEqual(os.listdir(self.dir.name), [])
+        self.assertIsNone(InfoCache(self.dir.name).get(URL))
+
+    def test_json_safe_info_persists(self):
+        self.cache.put(URL, video_info(fragments=[{'url': 'https://example.com/1'}]))
+        info = InfoCache(self.dir.name).get(URL)
+        self.assertEqual(info['formats'][0]['fragments'], [{'url': 'https://example.com/1'}])
+
+    def test_get_returns_a_copy(self):
+        self.cache.put(URL, video_info())
+        self.cache.get(URL)['formats'].clear() # process_ie_result 会修改传入的结果
+        self.assertEqual(len(self.cache.get(URL)['formats']), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest
+from ingest import KIND_CHANNEL, KIND_PLAYLIST, KIND_VIDEO, classify_url, parse_text
+
+VIDEO = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+class ClassifyUrlTest(unittest.TestCase):
+
+    def test_youtube_video_forms(self):
+        for url in ('https://youtu.be/dQw4w9WgXcQ', 'https://m.youtube.com/watch?v=dQw4w9WgXcQ&t=10',
+                    'https://music.youtube.com/watch?v=dQw4w9WgXcQ', 'https://www.youtube.com/shorts/dQw4w9WgXcQ',
+                    'https://www.youtube.com/embed/dQw4w9WgXcQ', 'https://www.youtube.com/live/dQw4w9WgXcQ/',
+                    f'{VIDEO}).'):
+            item = classify_url(url)
+            self.assertEqual((item.url, item.kind), (VIDEO, KIND_VIDEO), url)
+
+    def test_playlist(self):
+        item = classify_url('https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123')
+        self.assertEqual((item.url, item.key, item.kind),
+                         ('https://www.youtube.com/playlist?list=PL123', 'playlist:PL123', KIND_PLAYLIST))
+        # 自动生成的合辑按单视频处理
+        self.assertEqual(classify_url('https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=RDdQw4w9WgXcQ').kind, KIND_VIDEO)
+
+    def test_channel_keys(self):
+        self.assertEqual(classify_url('https://www.YouTube.com/@SomeHandle').key,
+                         classify_url('https://youtube.com/@somehandle/videos').key)
+        # 频道 ID 区分大小写，大小写不同的是两个频道
+        first = classify_url('https://www.youtube.com/channel/UCabcDEF123')
+        second = classify_url('https://www.youtube.com/channel/UCABCdef123')
+        self.assertEqual(first.kind, KIND_CHANNEL)
+        self.assertNotEqual(first.key, second.key)
+        self.assertEqual(classify_url('https://space.bilibili.com/123/dynamic').url, 'https://space.bilibili.com/123/video')
+
+    def test_bilibili(self):
+        self.assertEqual(classify_url('BV1xx411c7mD').url, 'https://www.bilibili.com/video/BV1xx411c7mD')
+        self.assertEqual(classify_url('https://m.bilibili.com/video/BV1xx411c7mD?p=1&share=x').url,
+                         'https://www.bilibili.com/video/BV1xx411c7mD')
+        self.assertEqual(classify_url('https://www.bilibili.com/video/BV1xx411c7mD?p=3').url,
+                         'https://www.bilibili.com/video/BV1xx411c7mD?p=3')
+
+    def test_not_a_url(self):
+        self.assertIsNone(classify_url('ftp://example.com/a'))
+
+class ParseTextTest(unittest.TestCase):
+
+    def test_dedup_and_invalid(self):
+        result = parse_text(f"# 注释\n{VIDEO}\nhttps://youtu.be/dQw4w9WgXcQ 和 BV1xx411c7mD\nnot a link\nfoo, bar\n")
+        self.assertEqual([item.url for item in result.items], [VIDEO, 'https://www.bilibili.com/video/BV1xx411c7mD'])
+        self.assertEqual(result.duplicates, 1)
+        self.assertEqual(result.invalid, ['not a link', 'foo, bar'])
+
+    def test_csv_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write(f"title,url\nRick,{VIDEO}\n")
+        try:
+            result = parse_text(ingest.read_file(f.name))
+        finally:
+            os.remove(f.name)
+        self.assertEqual([item.url for item in result.items], [VIDEO])
+        self.assertEqual(result.invalid, []) # 表头和其他列不算无效行
+
+if __name__ == '__main__':
+    unittest.main()
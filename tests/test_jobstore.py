@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobstore import JobStore
+
+class JobStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'jobs.db')
+        self.store = JobStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def test_transition_only_from_expected_states(self):
+        job = self.store.add('https://example.com/a', {'quality': 'best'})
+        self.assertTrue(self.store.transition(job, ('queued',), 'running'))
+        self.assertFalse(self.store.transition(job, ('queued',), 'running')) # 已不在排队中
+        self.assertTrue(self.store.transition(job, ('running', 'paused'), 'failed'))
+        self.assertEqual(self.store.unfinished(), [])
+
+    def test_unfinished_survives_reopen(self):
+        first = self.store.add('https://example.com/a', {'quality': '720p'})
+        second = self.store.add('https://example.com/b', {})
+        done = self.store.add('https://example.com/c', {})
+        self.store.update(first, state='paused', attempts=2, tmpfilename='/tmp/a.mp4.part', downloaded_bytes=1000)
+        self.store.update(second, state='processing')
+        self.store.remove(done) # 完成的任务在完成时删除
+        self.store.close()
+
+        self.store = JobStore(self.path) # 模拟重启
+        rows = self.store.unfinished()
+        self.assertEqual([row['url'] for row in rows], ['https://example.com/a', 'https://example.com/b'])
+        self.assertEqual(rows[0]['options'], {'quality': '720p'})
+        self.assertEqual((rows[0]['state'], rows[0]['attempts'], rows[0]['tmpfilename'], rows[0]['downloaded_bytes']),
+                         ('paused', 2, '/tmp/a.mp4.part', 1000))
+        self.assertEqual(self.store.count_unfinished(), 2)
+
+    def test_purge_and_discard(self):
+        failed = self.store.add('https://example.com/a', {}, state='failed')
+        self.store.add('https://example.com/b', {})
+        self.store.purge_finished()
+        self.assertEqual(self.store.count_unfinished(), 1)
+        self.assertFalse(self.store.transition(failed, ('failed',), 'queued')) # 已删除
+        self.store.discard_unfinished()
+        self.assertEqual(self.store.count_unfinished(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import socket
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+import yt_dlp.networking._helper
+from yt_dlp.networking.exceptions import TransportError
+
+from engine import is_network_error
+from netpath import PATH_RETRIES, DnsCache, NetworkPath
+from storage import DiskSpaceError
+
+class NetworkErrorTest(unittest.TestCase):
+    """只有传输错误让线路冷却，文件系统错误与线路无关"""
+
+    def test_transport_errors(self):
+        for error in (TransportError('reset'), ConnectionResetError(), socket.timeout(), socket.gaierror(-2, 'dns'),
+                      yt_dlp.utils.DownloadError('Got error: reset. Giving up after 3 retries')):
+            self.assertTrue(is_network_error(error), error)
+
+    def test_filesystem_errors(self):
+        for error in (DiskSpaceError('/tmp', 100, 0, 0), PermissionError(13, 'denied'), FileNotFoundError(2, 'missing'),
+                      yt_dlp.utils.DownloadError('Got error: [Errno 28] No space left on device. Giving up after 3 retries'),
+                      yt_dlp.utils.DownloadError('x', (None, PermissionError(13, 'denied'), None))):
+            self.assertFalse(is_network_error(error), error)
+
+class DnsCacheTest(unittest.TestCase):
+
+    def test_only_yt_dlp_connections_are_cached(self):
+        cache = DnsCache()
+        original = yt_dlp.networking._helper.socket
+        try:
+            cache.install()
+            self.assertIsNot(socket.getaddrinfo, cache.getaddrinfo)
+            yt_dlp.networking._helper.socket.getaddrinfo('127.0.0.1', 80)
+            self.assertEqual(len(cache._entries), 1)
+            cache.clear()
+            self.assertEqual(len(cache._entries), 0)
+        finally:
+            yt_dlp.networking._helper.socket = original
+
+class PathParamsTest(unittest.TestCase):
+
+    def test_retries_limited_only_with_failover(self):
+        path = NetworkPath('ipv4', family='ipv4')
+        self.assertNotIn('retries', path.ydl_params())
+        self.assertEqual(path.ydl_params(failover=True)['retries'], PATH_RETRIES)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+import engine
+from engine import PlaylistCache, PlaylistPager, expand_playlist
+
+class StubPlaylistIE(InfoExtractor):
+    """stub://list/<条目数>：逐条生成的惰性播放列表，记录已生成的条目数"""
+    _VALID_URL = r'stub://list/(?P<id>\d+)'
+    produced = 0
+
+    def _real_extract(self, url):
+        count = int(self._match_id(url))
+
+        def entries():
+            for index in range(count):
+                StubPlaylistIE.produced += 1
+                yield self.url_result(f'https://www.youtube.com/watch?v=video{index:06d}', 'Youtube',
+                                      f'video{index:06d}', f'Video {index}')
+
+        return self.playlist_result(entries(), f'list{count}', 'Stub List')
+
+class StubYoutubeDL(yt_dlp.YoutubeDL):
+
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init)
+        self.add_info_extractor(StubPlaylistIE(self))
+
+    def extract_info(self, url, *args, **kwargs):
+        if url.startswith('stub://'):
+            kwargs['ie_key'] = 'StubPlaylist'
+        return super().extract_info(url, *args, **kwargs)
+
+class PlaylistPagerTest(unittest.TestCase):
+    """播放列表按页读取：只请求需要的条目，结果写入分页缓存"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = PlaylistCache(self.dir.name)
+        StubPlaylistIE.produced = 0
+        patcher = mock.patch.object(engine.yt_dlp, 'YoutubeDL', StubYoutubeDL)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_pages_are_lazy(self):
+        pager = PlaylistPager('stub://list/25', self.cache, page_size=10)
+        chunks = []
+        first = pager.fetch_next(chunks.append)
+        self.assertEqual([entry['id'] for entry in first], [f'video{index:06d}' for index in range(10)])
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 10)
+        self.assertEqual(pager.title, 'Stub List')
+        self.assertTrue(pager.has_more)
+        self.assertEqual(StubPlaylistIE.produced, 11) # 本页 + 预读的一条
+        self.assertEqual(len(pager.fetch_next(lambda chunk: None)), 10)
+        self.assertEqual(len(pager.fetch_next(lambda chunk: None)), 5)
+        self.assertFalse(pager.has_more)
+
+    def test_cached_pages(self):
+        self.assertEqual(len(expand_playlist('stub://list/25', self.cache)), 25)
+        StubPlaylistIE.produced = 0
+        pager = PlaylistPager('stub://list/25', self.cache)
+        urls = [entry['url'] for entry in pager.fetch_next(lambda chunk: None)]
+        self.assertEqual(urls[0], 'https://www.youtube.com/watch?v=video000000')
+        self.assertEqual(StubPlaylistIE.produced, 0) # 全部来自缓存，不再请求
+
+    def test_collections_remember_position(self):
+        collections = {}
+        pager = PlaylistPager('stub://list/5', self.cache, page_size=2, collections=collections)
+        pager.fetch_next(lambda chunk: None)
+        pager.fetch_next(lambda chunk: None)
+        self.assertEqual(collections['youtube video000003'],
+                         {'playlist': 'Stub List', 'playlist_title': 'Stub List', 'playlist_index': 4})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postprocess import POSTPROCESS_QUEUE_FACTOR, PostProcessPool
+
+class PostProcessPoolTest(unittest.TestCase):
+    """排队和运行中的后处理达到上限时提交阻塞，下载线程不再取新任务"""
+
+    def setUp(self):
+        self.pool = PostProcessPool(workers=1)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.limit = self.pool.workers * POSTPROCESS_QUEUE_FACTOR
+        self.futures = [self.pool.submit(self.release.wait) for _ in range(self.limit)]
+
+    def test_submit_blocks_when_full(self):
+        self.assertEqual(self.pool.pending, self.limit)
+        submitted = threading.Event()
+        threading.Thread(target=lambda: (self.pool.submit(lambda: None), submitted.set()), daemon=True).start()
+        self.assertFalse(submitted.wait(0.3))
+        self.release.set()
+        self.assertTrue(submitted.wait(5))
+        for future in self.futures:
+            future.result(5)
+
+    def test_stop_event_abandons_submit(self):
+        stop = threading.Event()
+        threading.Timer(0.1, stop.set).start()
+        started = time.time()
+        self.assertIsNone(self.pool.submit(lambda: None, stop_event=stop))
+        self.assertLess(time.time() - started, 5)
+        self.assertEqual(self.pool.pending, self.limit)
+
+    def test_pending_drops_after_completion(self):
+        self.release.set()
+        for future in self.futures:
+            future.result(5)
+        self.assertEqual(self.pool.pending, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import postprocess
+from postprocess import PostProcessPool
+from storage import DiskSpaceError
+
+MB = 1024 * 1024
+
+class ReserveSpaceTest(unittest.TestCase):
+    """默认余量很小：剩余不到 1G 的磁盘上放得下的任务也要能下载"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.pool = PostProcessPool()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def reserve(self, needed, free):
+        with mock.patch.object(postprocess, 'free_bytes', return_value=free):
+            return self.pool.reserve_space({self.dir.name: needed})
+
+    def test_small_disk(self):
+        reservation = self.reserve(200 * MB, 500 * MB)
+        self.assertEqual(sum(reservation.values()), 200 * MB)
+        self.pool.release_space(reservation)
+
+    def test_not_enough_space(self):
+        with self.assertRaises(DiskSpaceError):
+            self.reserve(480 * MB, 500 * MB)
+
+    def test_configured_floor(self):
+        self.pool.configure(min_free_bytes=1024 * MB)
+        with self.assertRaises(DiskSpaceError):
+            self.reserve(200 * MB, 500 * MB)
+
+    def test_pending_postprocess_counts_only_on_its_disk(self):
+        release = threading.Event()
+        stop = threading.Event()
+        stop.set()
+        with mock.patch.object(postprocess, 'disk_id', side_effect=lambda path: path), \
+                mock.patch.object(postprocess, 'free_bytes', return_value=500 * MB):
+            future = self.pool.submit(release.wait, {'temp': 400 * MB})
+            try:
+                # 临时目录上排队的合并不影响另一块磁盘上的保存目录
+                self.assertIsNotNone(self.pool.reserve_space({'home': 200 * MB}, stop))
+                self.assertIsNone(self.pool.reserve_space({'temp': 200 * MB}, stop))
+            finally:
+                release.set()
+                future.result(5)
+
+if __name__ == '__main__':
+    unittest.main()
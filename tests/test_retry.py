@@ -0,0 +1,44 @@
+import errno
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+
+from engine import RETRY_BASE_DELAY, RETRY_MAX_DELAY, is_retryable_error, retry_delay
+
+def download_error(cause):
+    return yt_dlp.utils.DownloadError(f'ERROR: {cause}', (type(cause), cause, None))
+
+class RetryDelayTest(unittest.TestCase):
+
+    def test_exponential_with_jitter(self):
+        for attempt in range(1, 6):
+            delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            for _ in range(50):
+                self.assertTrue(delay / 2 <= retry_delay(attempt) <= delay, attempt)
+
+    def test_capped(self):
+        for _ in range(50):
+            self.assertLessEqual(retry_delay(30), RETRY_MAX_DELAY)
+            self.assertGreaterEqual(retry_delay(30), RETRY_MAX_DELAY / 2)
+
+class RetryableErrorTest(unittest.TestCase):
+
+    def test_network_errors_are_retried(self):
+        self.assertTrue(is_retryable_error(download_error(ConnectionResetError('reset'))))
+        self.assertTrue(is_retryable_error(download_error(yt_dlp.utils.ExtractorError('HTTP Error 503'))))
+        self.assertTrue(is_retryable_error(ValueError('unexpected')))
+
+    def test_expected_extractor_errors_are_not(self):
+        # 视频不存在/私有等：重试也不会成功
+        self.assertFalse(is_retryable_error(download_error(yt_dlp.utils.ExtractorError('Private video', expected=True))))
+
+    def test_disk_full_is_not(self):
+        self.assertFalse(is_retryable_error(OSError(errno.ENOSPC, 'No space left on device')))
+        self.assertFalse(is_retryable_error(yt_dlp.utils.DownloadError('ERROR: [Errno 28] No space left on device')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import queue
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import JOB_DONE, JOB_RUNNING, DownloadScheduler
+
+class SlowEmptyQueue(queue.Queue):
+    """第一次取空时通知测试并停顿一下，模拟最后一个工作线程正在退出"""
+
+    def __init__(self):
+        super().__init__()
+        self.exiting = threading.Event()
+
+    def get_nowait(self):
+        try:
+            return super().get_nowait()
+        except queue.Empty:
+            if not self.exiting.is_set():
+                self.exiting.set()
+                time.sleep(0.2)
+            raise
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_submit_while_last_worker_exits(self):
+        idle = threading.Event()
+        scheduler = DownloadScheduler(run_job=lambda job: None, max_workers=1, on_idle=lambda jobs: idle.set())
+        scheduler._queue = SlowEmptyQueue()
+
+        scheduler.submit(['a'])
+        self.assertTrue(scheduler._queue.exiting.wait(5))
+        idle.clear()
+        scheduler.submit(['b']) # 工作线程此时已取空队列，正在退出
+
+        deadline = time.time() + 5
+        while scheduler.count_active() and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual([job.state for job in scheduler.jobs], [JOB_DONE, JOB_DONE])
+        self.assertTrue(idle.wait(5))
+
+    def test_resume_after_all_workers_exit(self):
+        idle = threading.Event()
+        scheduler = DownloadScheduler(run_job=lambda job: None, max_workers=2, on_idle=lambda jobs: idle.set())
+        scheduler.submit(['a', 'b'])
+        self.assertTrue(idle.wait(5))
+        idle.clear()
+        scheduler.submit(['c'])
+        self.assertTrue(idle.wait(5))
+        self.assertEqual(scheduler.count(JOB_DONE), 3)
+    def test_pause_resume_does_not_run_a_job_twice(self):
+        release = threading.Event()
+        runs = []
+        lock = threading.Lock()
+
+        def run_job(job):
+            with lock:
+                runs.append(job.url)
+            release.wait(5)
+
+        idle = threading.Event()
+        scheduler = DownloadScheduler(run_job=run_job, max_workers=3, on_idle=lambda jobs: idle.set())
+        scheduler.submit(['a', 'b', 'c', 'd', 'e', 'f'])
+        deadline = time.time() + 5
+        while scheduler.count(JOB_RUNNING) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        for _ in range(5): # 排队中的任务暂停后留在队列中，继续时不能再入队一次
+            scheduler.pause_all()
+            scheduler.resume_all()
+        self.assertEqual(scheduler._queue.qsize(), 3)
+        release.set()
+        self.assertTrue(idle.wait(5))
+        self.assertEqual(sorted(runs), ['a', 'b', 'c', 'd', 'e', 'f'])
+        self.assertEqual(scheduler.count(JOB_DONE), 6)
+
+if __name__ == '__main__':
+    unittest.main()
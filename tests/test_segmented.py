@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import SegmentedHttpFD
+
+class SegmentedStateTest(unittest.TestCase):
+    """分段下载的续传状态 (<文件>.part.segments)"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.part = os.path.join(self.dir.name, 'video.mp4.part')
+        self.state = self.part + '.segments'
+        self.fd = SegmentedHttpFD.__new__(SegmentedHttpFD) # _load_state 不需要 yt_dlp 实例
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write_part(self, size):
+        with open(self.part, 'wb') as f:
+            f.write(b'x' * size)
+
+    def test_missing_ranges(self):
+        missing = SegmentedHttpFD._missing_ranges
+        self.assertEqual(list(missing([], 100)), [(0, 100)])
+        self.assertEqual(list(missing([[0, 100]], 100)), [])
+        self.assertEqual(list(missing([[40, 60], [0, 20]], 100)), [(20, 40), (60, 100)])
+        self.assertEqual(list(missing([[0, 30], [10, 50]], 100)), [(50, 100)]) # 重叠的范围
+
+    def test_new_download_is_preallocated(self):
+        self.assertEqual(self.fd._load_state(self.part, self.state, 1000), [])
+        self.assertEqual(os.path.getsize(self.part), 1000)
+        with open(self.state, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'total': 1000, 'done': []})
+
+    def test_resume_from_state(self):
+        self.write_part(1000)
+        SegmentedHttpFD._save_state(self.state, 1000, [[0, 200], [500, 700]])
+        self.assertEqual(self.fd._load_state(self.part, self.state, 1000), [[0, 200], [500, 700]])
+        # 文件大小变了：状态作废，从头下载
+        self.assertEqual(self.fd._load_state(self.part, self.state, 2000), [])
+
+    def test_adopt_single_connection_part(self):
+        self.write_part(300)
+        self.assertEqual(self.fd._load_state(self.part, self.state, 1000), [[0, 300]])
+        self.assertEqual(os.path.getsize(self.part), 1000)
+
+    def test_single_connection_after_segmented(self):
+        # 关闭分段后单连接下载只能从开头连续完成的部分续传
+        self.write_part(1000)
+        SegmentedHttpFD._save_state(self.state, 1000, [[0, 200], [500, 700]])
+        SegmentedHttpFD.discard_state(self.part)
+        self.assertEqual(os.path.getsize(self.part), 200)
+        self.assertFalse(os.path.exists(self.state))
+
+    def test_discard_without_state_keeps_part(self):
+        self.write_part(300)
+        SegmentedHttpFD.discard_state(self.part)
+        self.assertEqual(os.path.getsize(self.part), 300)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcripts import normalize_cues, parse_json3, parse_text_cues, parse_timestamp, parse_track
+
+VTT = """WEBVTT
+Kind: captions
+
+00:00:01.000 --> 00:00:02.500 align:start position:0%
+<c>Hello</c> <00:00:01.500><c>world</c>
+
+00:00:02.500 --> 00:00:04.000
+Hello world
+second line
+
+bad --> timing
+ignored
+"""
+
+SRT = """1
+00:00:01,000 --> 00:00:02,000
+Line &amp; one
+
+2
+01:00:02,5 --> 01:00:03,000
+{\\an8}Line two
+"""
+
+class ParserTest(unittest.TestCase):
+
+    def test_timestamp(self):
+        self.assertEqual(parse_timestamp('01:02:03.456'), 3723.456)
+        self.assertEqual(parse_timestamp('02:03,5'), 123.5)
+        with self.assertRaises(ValueError):
+            parse_timestamp('abc')
+
+    def test_vtt(self):
+        cues = parse_text_cues(VTT)
+        self.assertEqual([(cue['start'], cue['end']) for cue in cues], [(1.0, 2.5), (2.5, 4.0)])
+        self.assertEqual(cues[1]['text'], 'Hello world\nsecond line')
+
+    def test_srt(self):
+        cues = parse_track('srt', SRT)
+        self.assertEqual(cues, [{'start': 1.0, 'end': 2.0, 'text': 'Line & one'},
+                                {'start': 3602.5, 'end': 3603.0, 'text': 'Line two'}])
+
+    def test_json3(self):
+        text = json.dumps({'events': [
+            {'tStartMs': 0, 'dDurationMs': 1500, 'segs': [{'utf8': 'Hi '}, {'utf8': 'there'}]},
+            {'tStartMs': 1500, 'dDurationMs': 10}, # 没有文字的事件
+            {'tStartMs': 2000, 'segs': [{'utf8': 'end'}]},
+        ]})
+        self.assertEqual(parse_json3(text), [{'start': 0.0, 'end': 1.5, 'text': 'Hi there'},
+                                             {'start': 2.0, 'end': 2.0, 'text': 'end'}])
+
+    def test_bilibili_json(self):
+        text = json.dumps({'body': [{'from': 0.5, 'to': 1.25, 'content': '你好'}]})
+        self.assertEqual(parse_track('json', text), [{'start': 0.5, 'end': 1.25, 'text': '你好'}])
+
+class NormalizeCuesTest(unittest.TestCase):
+
+    def test_rolling_captions_keep_new_lines(self):
+        cues = [{'start': 0, 'end': 2, 'text': 'one'},
+                {'start': 2, 'end': 4, 'text': 'one\ntwo'},
+                {'start': 4, 'end': 6, 'text': 'two\nthree'}]
+        self.assertEqual([cue['text'] for cue in normalize_cues(cues)], ['one', 'two', 'three'])
+
+    def test_merge_adjacent_duplicates_and_drop_empty(self):
+        cues = [{'start': 0, 'end': 1, 'text': '<b>same</b>'},
+                {'start': 1, 'end': 2, 'text': ' '},
+                {'start': 1.01, 'end': 3, 'text': 'other\nsame'},
+                {'start': 5, 'end': 4, 'text': 'negative duration'}]
+        self.assertEqual(normalize_cues(cues), [{'start': 0, 'end': 1, 'text': 'same'},
+                                                {'start': 1.01, 'end': 3, 'text': 'other same'}])
+
+    def test_adjacent_identical_cues_merge(self):
+        cues = [{'start': 0, 'end': 1, 'text': 'a'}, {'start': 1, 'end': 2, 'text': 'b'},
+                {'start': 2, 'end': 3, 'text': 'c'}, {'start': 3, 'end': 4, 'text': 'c'}]
+        merged = normalize_cues(cues)
+        self.assertEqual(merged[-1], {'start': 2, 'end': 4, 'text': 'c'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,387 @@
+"""
+仅字幕 / 仅元数据模式 (不依赖界面)
+不下载音视频：并发解析视频信息并下载字幕轨道，统一转换成 [{"start", "end", "text"}] 的字幕条目，
+写入 JSONL 或 SQLite 语料库，或每个视频一个 JSON 文件。已导出的链接再次运行时跳过。
+"""
+
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import yt_dlp
+from yt_dlp.networking import Request
+
+from engine import SUBTITLE_PRESETS, EngineYoutubeDL, is_retryable_error, retry_delay
+from netpath import NETWORK_AUTO
+
+CONTENT_SUBTITLES = 'subtitles' # 字幕 + 元数据
+CONTENT_METADATA = 'metadata'   # 只要元数据
+CONTENT_MODES = (CONTENT_SUBTITLES, CONTENT_METADATA)
+
+CORPUS_JSONL = 'jsonl'   # 一个 .jsonl 文件，每行一个视频
+CORPUS_SQLITE = 'sqlite' # 一个 SQLite 数据库 (videos + cues 两张表)
+CORPUS_FILES = 'files'   # 一个目录，每个视频一个 <id>.json
+CORPUS_FORMATS = (CORPUS_JSONL, CORPUS_SQLITE, CORPUS_FILES)
+
+EXPORT_WORKERS = 8        # 并发解析/下载字幕的线程数
+EXPORT_ATTEMPTS = 3       # 每个视频最多尝试的次数
+PROGRESS_EVERY = 25       # 每导出多少个视频报告一次进度
+TRACK_EXTS = ('json3', 'vtt', 'srt', 'json') # 字幕格式的优先顺序 (都能转换成统一的条目)
+
+METADATA_FIELDS = (
+    'id', 'title', 'description', 'channel', 'channel_id', 'uploader', 'uploader_id', 'upload_date',
+    'timestamp', 'duration', 'view_count', 'like_count', 'comment_count', 'tags', 'categories',
+    'language', 'chapters', 'webpage_url', 'extractor_key',
+)
+
+# --- 字幕解析 ---
+
+TIMESTAMP_RE = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})')
+CUE_TIMING_RE = re.compile(r'^\s*(\S+)\s*-->\s*(\S+)')
+TAG_RE = re.compile(r'<[^>]*>|\{\\[^}]*\}')
+
+def parse_timestamp(text):
+    """"01:02:03.456" / "02:03,456" -> 秒"""
+    match = TIMESTAMP_RE.fullmatch(text.strip())
+    if not match:
+        raise ValueError(f"无法识别的时间: {text}")
+    hours, minutes, seconds, fraction = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(fraction.ljust(3, '0')) / 1000
+
+def parse_text_cues(text):
+    """解析 WebVTT / SRT (按 "-->" 时间行分块)"""
+    cues = []
+    current = None
+    for line in text.splitlines():
+        timing = CUE_TIMING_RE.match(line)
+        if timing:
+            try:
+                current = {'start': parse_timestamp(timing.group(1)), 'end': parse_timestamp(timing.group(2)), 'lines': []}
+            except ValueError:
+                current = None
+                continue
+            cues.append(current)
+        elif not line.strip():
+            current = None
+        elif current is not None:
+            current['lines'].append(line)
+    return [{'start': cue['start'], 'end': cue['end'], 'text': '\n'.join(cue['lines'])} for cue in cues]
+
+def parse_json3(text):
+    """YouTube 的 json3 字幕"""
+    cues = []
+    for event in json.loads(text).get('events') or []:
+        segs = event.get('segs')
+        if not segs or 'tStartMs' not in event:
+            continue
+        start = event['tStartMs'] / 1000
+        cues.append({'start': start, 'end': start + (event.get('dDurationMs') or 0) / 1000,
+                     'text': ''.join(seg.get('utf8', '') for seg in segs)})
+    return cues
+
+def parse_bilibili_json(text):
+    """Bilibili 的 json 字幕 ({"body": [{"from", "to", "content"}]})"""
+    return [{'start': item['from'], 'end': item['to'], 'text': item.get('content', '')}
+            for item in json.loads(text).get('body') or []]
+
+def normalize_cues(cues):
+    """去掉样式标签和空条目，合并自动字幕中逐行滚动造成的重复"""
+    normalized = []
+    previous_lines = []
+    for cue in cues:
+        lines = [html.unescape(TAG_RE.sub('', line)).strip() for line in cue['text'].splitlines()]
+        lines = [line for line in lines if line]
+        # 滚动字幕：新条目的开头几行与上一条的结尾相同，只保留新出现的行
+        overlap = 0
+        for size in range(min(len(lines), len(previous_lines)), 0, -1):
+            if lines[:size] == previous_lines[-size:]:
+                overlap = size
+                break
+        new_lines = lines[overlap:]
+        repeated = bool(lines) and lines == previous_lines
+        if lines:
+            previous_lines = lines
+        if cue['end'] < cue['start']:
+            continue
+        if repeated and normalized and cue['start'] - normalized[-1]['end'] < 0.05:
+            # 同一条字幕被拆成相邻的几条：延长上一条
+            normalized[-1]['end'] = round(max(normalized[-1]['end'], cue['end']), 3)
+            continue
+        if not new_lines:
+            continue
+        text = ' '.join(new_lines)
+        if normalized and normalized[-1]['text'] == text and cue['start'] - normalized[-1]['end'] < 0.05:
+            normalized[-1]['end'] = round(cue['end'], 3) # 相邻的相同文本合并成一条
+            continue
+        normalized.append({'start': round(cue['start'], 3), 'end': round(cue['end'], 3), 'text': text})
+    return normalized
+
+def parse_track(ext, text):
+    if ext == 'json3':
+        cues = parse_json3(text)
+    elif ext == 'json':
+        cues = parse_bilibili_json(text)
+    else:
+        cues = parse_text_cues(text)
+    return normalize_cues(cues)
+
+# --- 选择字幕轨道 ---
+
+def choose_tracks(info, preset):
+    """按字幕预设选择轨道，返回 {语言: (轨道格式, 是否自动字幕)}；优先人工字幕，没有时用自动字幕"""
+    langs = SUBTITLE_PRESETS.get(preset) or ['all'] # 仅字幕模式下 "不下载" 视为全部
+    manual = {lang: formats for lang, formats in (info.get('subtitles') or {}).items()
+              if lang != 'live_chat' and formats}
+    automatic = {lang: formats for lang, formats in (info.get('automatic_captions') or {}).items() if formats}
+
+    def best_format(formats):
+        for ext in TRACK_EXTS:
+            for fmt in formats:
+                if fmt.get('ext') == ext and (fmt.get('url') or fmt.get('data')):
+                    return fmt
+        return None
+
+    chosen = {}
+    if langs == ['all']:
+        for lang, formats in manual.items():
+            chosen[lang] = (best_format(formats), False)
+        if not chosen:
+            # 没有人工字幕时只取原始语言的自动字幕 (不要上百种自动翻译)
+            for lang, formats in automatic.items():
+                if lang.endswith('-orig'):
+                    chosen[lang[:-len('-orig')]] = (best_format(formats), True)
+    else:
+        for wanted in langs:
+            for source, is_auto in ((manual, False), (automatic, True)):
+                matches = [lang for lang in source if re.fullmatch(wanted, lang)]
+                if matches:
+                    chosen.setdefault(matches[0], (best_format(source[matches[0]]), is_auto))
+                    break
+    return {lang: track for lang, track in chosen.items() if track[0] is not None}
+
+def metadata_of(info):
+    return {field: info[field] for field in METADATA_FIELDS if info.get(field) is not None}
+
+# --- 语料库输出 ---
+
+class JsonlCorpus:
+    """一个 .jsonl 文件 (追加写入)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._done.add(json.loads(line)['url'])
+                    except (ValueError, KeyError):
+                        continue # 上次中断时写了一半的行
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def contains(self, url):
+        return url in self._done
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._done.add(record['url'])
+
+    def close(self):
+        self._file.close()
+
+class SqliteCorpus:
+    """SQLite 数据库：videos (每个视频一行，元数据为 JSON) 和 cues (每条字幕一行，便于全文检索)"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS videos (
+        url TEXT PRIMARY KEY,
+        id TEXT,
+        title TEXT,
+        metadata TEXT NOT NULL,
+        fetched_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS cues (
+        url TEXT NOT NULL,
+        lang TEXT NOT NULL,
+        automatic INTEGER NOT NULL,
+        seq INTEGER NOT NULL,
+        start REAL NOT NULL,
+        end REAL NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (url, lang, seq)
+    );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def contains(self, url):
+        return self._conn.execute("SELECT 1 FROM videos WHERE url = ?", (url,)).fetchone() is not None
+
+    def write(self, record):
+        with self._conn: # 一个视频一个事务
+            self._conn.execute("DELETE FROM cues WHERE url = ?", (record['url'],))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO videos (url, id, title, metadata, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (record['url'], record['metadata'].get('id'), record['metadata'].get('title'),
+                 json.dumps(record['metadata'], ensure_ascii=False), record['fetched_at']))
+            for lang, track in (record.get('subtitles') or {}).items():
+                self._conn.executemany(
+                    "INSERT INTO cues (url, lang, automatic, seq, start, end, text) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(record['url'], lang, int(track['automatic']), seq, cue['start'], cue['end'], cue['text'])
+                     for seq, cue in enumerate(track['cues'])])
+
+    def close(self):
+        self._conn.close()
+
+class FilesCorpus:
+    """一个目录，每个视频一个 <extractor>_<id>.json"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._done = set()
+        for name in os.listdir(path):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(path, name), encoding='utf-8') as f:
+                        self._done.add(json.load(f)['url'])
+                except (OSError, ValueError, KeyError):
+                    continue
+
+    def contains(self, url):
+        return url in self._done
+
+    def write(self, record):
+        metadata = record['metadata']
+        name = yt_dlp.utils.sanitize_filename(
+            f"{metadata.get('extractor_key', 'video')}_{metadata.get('id') or len(self._done)}", restricted=True)
+        tmp_path = os.path.join(self.path, name + '.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, os.path.join(self.path, name + '.json'))
+        self._done.add(record['url'])
+
+    def close(self):
+        pass
+
+def open_corpus(corpus_format, path):
+    if corpus_format == CORPUS_JSONL:
+        return JsonlCorpus(path)
+    if corpus_format == CORPUS_SQLITE:
+        return SqliteCorpus(path)
+    if corpus_format == CORPUS_FILES:
+        return FilesCorpus(path)
+    raise ValueError(f"未知的输出格式: {corpus_format}")
+
+def default_corpus_path(output_dir, content, corpus_format):
+    name = 'transcripts' if content == CONTENT_SUBTITLES else 'metadata'
+    return os.path.join(output_dir, name + {CORPUS_JSONL: '.jsonl', CORPUS_SQLITE: '.db', CORPUS_FILES: ''}[corpus_format])
+
+# --- 导出 ---
+
+class CorpusExporter:
+    """并发导出字幕/元数据：每个工作线程复用一个 YoutubeDL，解析结果与下载共用 InfoCache"""
+
+    def __init__(self, engine, options, content=CONTENT_SUBTITLES, workers=EXPORT_WORKERS):
+        if content not in CONTENT_MODES:
+            raise ValueError(f"未知的导出内容: {content}")
+        self.engine = engine
+        self.options = options
+        self.content = content
+        self.workers = workers
+        self.ydl_opts = {**engine.build_ydl_opts(options), 'quiet': True, 'no_warnings': True}
+        if options.network == NETWORK_AUTO:
+            self.ydl_opts.update(engine.netpaths.choose().ydl_params())
+        self._local = threading.local()
+        self._ydls = []
+        self._lock = threading.Lock()
+
+    def _ydl(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = self._local.ydl = EngineYoutubeDL(self.ydl_opts)
+            with self._lock:
+                self._ydls.append(ydl)
+        return ydl
+
+    def fetch(self, url, stop_event=None):
+        """解析一个视频并下载所选字幕，返回语料库记录 (网络错误时重试)"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return self._fetch_once(url)
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= EXPORT_ATTEMPTS:
+                    raise
+                delay = retry_delay(attempt)
+                if stop_event is None:
+                    time.sleep(delay)
+                elif stop_event.wait(delay): # 暂停时不再重试
+                    raise
+
+    def _fetch_once(self, url):
+        ydl = self._ydl()
+        info = self.engine.info_cache.get(url)
+        if info is None:
+            info = ydl.extract_info(url, download=False, process=False)
+            self.engine.info_cache.put(url, info)
+        record = {'url': url, 'metadata': metadata_of(info), 'fetched_at': round(time.time(), 3)}
+        record['metadata']['subtitle_languages'] = sorted((info.get('subtitles') or {}).keys() - {'live_chat'})
+        if self.content == CONTENT_METADATA:
+            return record
+
+        record['subtitles'] = {}
+        for lang, (fmt, automatic) in choose_tracks(info, self.options.subtitles).items():
+            text = fmt.get('data')
+            if text is None:
+                response = ydl.urlopen(Request(fmt['url'], headers=fmt.get('http_headers') or {}))
+                text = response.read().decode('utf-8', 'replace')
+            record['subtitles'][lang] = {'automatic': automatic, 'ext': fmt['ext'],
+                                         'cues': parse_track(fmt['ext'], text)}
+        return record
+
+    def run(self, urls, corpus, stop_event=None):
+        """导出全部链接 (跳过语料库中已有的)，返回 (导出数, [(链接, 错误)])"""
+        pending = [url for url in dict.fromkeys(urls) if not corpus.contains(url)]
+        skipped = len(urls) - len(pending)
+        if skipped:
+            self.engine.log(f"⏭️ 跳过 {skipped} 个已导出的视频。")
+        self.engine.log(f"📝 开始导出 {len(pending)} 个视频的{'字幕' if self.content == CONTENT_SUBTITLES else '元数据'}"
+                        f" (并发 {self.workers})...")
+        exported = 0
+        failed = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export') as pool:
+                futures = {pool.submit(self.fetch, url, stop_event): url for url in pending}
+                for done, future in enumerate(as_completed(futures), 1):
+                    url = futures[future]
+                    try:
+                        corpus.write(future.result()) # 只在这个线程中写入，语料库不需要加锁
+                        exported += 1
+                    except Exception as e:
+                        failed.append((url, str(e)))
+                        self.engine.log(f"❌ {url}: {e}")
+                    if done % PROGRESS_EVERY == 0 or done == len(futures):
+                        self.engine.log(f"📝 已处理 {done}/{len(futures)} 个视频")
+                    if stop_event is not None and stop_event.is_set():
+                        for other in futures:
+                            other.cancel()
+                        self.engine.log("🛑 导出已停止，再次运行会从未完成的视频继续。")
+                        break
+        finally:
+            for ydl in self._ydls:
+                ydl.close()
+        return exported, failed